@@ -6,7 +6,7 @@ from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.orm import Session
 
 from config.database import get_db
-from api.routers import search, listings, reports
+from api.routers import search, listings, reports, valuation
 
 # Create FastAPI app
 app = FastAPI(
@@ -28,6 +28,7 @@ app.add_middleware(
 app.include_router(search.router, prefix="/api", tags=["search"])
 app.include_router(listings.router, prefix="/api", tags=["listings"])
 app.include_router(reports.router, prefix="/api", tags=["reports"])
+app.include_router(valuation.router, prefix="/api", tags=["valuation"])
 
 
 @app.get("/")
@@ -1,5 +1,9 @@
 """Models package"""
-from .database import Base, Property, Agent, ListingRaw, ListingEnriched, School, Airport, ConservationArea, UserSearch, PurchasedReport
+from .database import (
+    Base, Property, Agent, ListingRaw, ListingEnriched, School, Airport, Station, ConservationArea,
+    SoldPrice, PropertyConservationArea, PropertyEnrichmentCache, AddressMatchCache,
+    UserSearch, PurchasedReport
+)
 from .schemas import (
     Questionnaire, SearchResponse, ListingSummary, ListingDetail,
     ReportPurchaseRequest, ReportPurchaseResponse, PropertyFeatures, AVMEstimate
@@ -7,7 +11,9 @@ from .schemas import (
 
 __all__ = [
     'Base', 'Property', 'Agent', 'ListingRaw', 'ListingEnriched',
-    'School', 'Airport', 'ConservationArea', 'UserSearch', 'PurchasedReport',
+    'School', 'Airport', 'Station', 'ConservationArea', 'SoldPrice',
+    'PropertyConservationArea', 'PropertyEnrichmentCache', 'AddressMatchCache',
+    'UserSearch', 'PurchasedReport',
     'Questionnaire', 'SearchResponse', 'ListingSummary', 'ListingDetail',
     'ReportPurchaseRequest', 'ReportPurchaseResponse', 'PropertyFeatures', 'AVMEstimate'
 ]
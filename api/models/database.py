@@ -99,6 +99,7 @@ class ListingRaw(Base):
     # Address
     raw_address = Column(Text, nullable=False)
     postcode = Column(String(10), index=True)
+    location = Column(Geography('POINT', srid=4326))
 
     # Images
     image_urls = Column(JSONB)
@@ -191,6 +192,9 @@ class ListingEnriched(Base):
     avm_confidence_score = Column(Numeric(3, 2))
     avm_value_delta_pct = Column(Numeric(5, 2))
 
+    # Raw listing fields at enrichment time (drives incremental re-enrichment)
+    source_fingerprint = Column(JSONB)
+
     # Timestamps
     enriched_at = Column(DateTime(timezone=True), server_default=func.now())
     created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -231,6 +235,16 @@ class Airport(Base):
     location = Column(Geography('POINT', srid=4326), nullable=False)
 
 
+class Station(Base):
+    __tablename__ = 'stations'
+
+    station_id = Column(Integer, primary_key=True, autoincrement=True)
+    atco_code = Column(String(20), unique=True, nullable=False)
+    name = Column(String(255), nullable=False)
+    station_type = Column(String(20), nullable=False)
+    location = Column(Geography('POINT', srid=4326), nullable=False)
+
+
 class ConservationArea(Base):
     __tablename__ = 'conservation_areas'
 
@@ -241,6 +255,87 @@ class ConservationArea(Base):
     designated_date = Column(Date)
 
 
+class SoldPrice(Base):
+    """Land Registry sold price (AVM comparable)"""
+    __tablename__ = 'sold_prices'
+
+    sale_id = Column(BigInteger, primary_key=True, autoincrement=True)
+    transaction_id = Column(String(50), unique=True, nullable=False)
+    property_id = Column(BigInteger, ForeignKey('properties.property_id', ondelete='SET NULL'), index=True)
+
+    postcode = Column(String(10), nullable=False, index=True)
+    property_type = Column(String(50))
+    bedrooms = Column(Integer)
+    price = Column(Numeric(12, 2), nullable=False)
+    sale_date = Column(Date, nullable=False, index=True)
+    location = Column(Geography('POINT', srid=4326))
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class PropertyConservationArea(Base):
+    """Precomputed property -> conservation area membership (NULL area = not in one)"""
+    __tablename__ = 'property_conservation_area'
+
+    property_id = Column(BigInteger, ForeignKey('properties.property_id', ondelete='CASCADE'), primary_key=True)
+    conservation_area_id = Column(
+        Integer, ForeignKey('conservation_areas.conservation_area_id', ondelete='SET NULL'), index=True
+    )
+    computed_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class PropertyEnrichmentCache(Base):
+    """Listing-independent enrichment per property and feature snapshot version"""
+    __tablename__ = 'property_enrichment_cache'
+
+    property_id = Column(BigInteger, ForeignKey('properties.property_id', ondelete='CASCADE'), primary_key=True)
+    feature_snapshot_version = Column(String(50), primary_key=True)
+
+    # EPC
+    epc_rating = Column(String(1))
+    epc_score = Column(Integer)
+    epc_potential_rating = Column(String(1))
+    epc_co2_emissions_current = Column(Numeric(8, 2))
+    epc_energy_consumption_current = Column(Numeric(8, 2))
+
+    # Conservation & Planning
+    in_conservation_area = Column(Boolean)
+    conservation_area_name = Column(String(255))
+    recent_planning_apps = Column(Integer)
+    planning_refusals = Column(Integer)
+
+    # Location quality
+    school_quality_score = Column(Numeric(3, 2))
+    distance_to_nearest_primary_m = Column(Integer)
+    distance_to_nearest_secondary_m = Column(Integer)
+
+    # Transport
+    distance_to_nearest_station_m = Column(Integer)
+    distance_to_nearest_airport_m = Column(Integer)
+    nearest_airport_code = Column(String(10))
+
+    # Area quality
+    imd_decile = Column(Integer)
+    crime_rate_percentile = Column(Integer)
+    flood_risk = Column(String(20))
+    max_download_speed_mbps = Column(Integer)
+
+    computed_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class AddressMatchCache(Base):
+    """Cached address match result (NULL property_id = cached miss)"""
+    __tablename__ = 'address_match_cache'
+
+    address_key = Column(String(64), primary_key=True)
+    postcode = Column(String(10), nullable=False)
+    property_id = Column(BigInteger, ForeignKey('properties.property_id', ondelete='CASCADE'))
+    match_confidence = Column(Numeric(3, 2))
+    match_method = Column(String(50))
+    retry_after = Column(DateTime(timezone=True))
+    matched_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
 class UserSearch(Base):
     __tablename__ = 'user_searches'
 
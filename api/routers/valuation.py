@@ -0,0 +1,60 @@
+"""
+Property valuation (AVM) endpoints
+"""
+from decimal import Decimal
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+
+from config.database import get_db
+from api.models.schemas import AVMEstimate
+from api.models.database import Property
+from enrichment.avm import get_avm_engine
+from enrichment.spatial_index import point_coordinates
+
+router = APIRouter()
+
+
+@router.get("/property/{property_id}/valuation", response_model=AVMEstimate)
+def get_property_valuation(
+    property_id: int,
+    bedrooms: Optional[int] = Query(None, ge=0, le=20, description="Bedrooms, if known"),
+    property_type: Optional[str] = Query(None, description="Overrides the recorded property type"),
+    db: Session = Depends(get_db)
+):
+    """
+    Value a property from nearby sold prices and asking prices.
+
+    Returns the estimate with a 90% confidence interval, a 0-1
+    confidence score and the weighted comparables used.
+    """
+    prop = db.query(Property).filter(Property.property_id == property_id).first()
+    if not prop:
+        raise HTTPException(status_code=404, detail="Property not found")
+
+    latitude, longitude = point_coordinates(prop.location)
+    valuation = get_avm_engine(db).value_batch([{
+        'property_id': prop.property_id,
+        'postcode': prop.postcode,
+        'property_type': property_type or prop.property_type,
+        'bedrooms': bedrooms,
+        'latitude': latitude,
+        'longitude': longitude,
+    }], include_comparables=True)[0]
+
+    if valuation['estimate'] is None:
+        raise HTTPException(status_code=404, detail="No comparables available for this property")
+
+    def money(value: float) -> Decimal:
+        return Decimal(str(value)).quantize(Decimal('0.01'))
+
+    return AVMEstimate(
+        property_id=prop.property_id,
+        estimate=money(valuation['estimate']),
+        confidence_interval_lower=money(valuation['interval_lower']),
+        confidence_interval_upper=money(valuation['interval_upper']),
+        confidence_score=money(valuation['confidence_score']),
+        comparable_count=valuation['comparable_count'],
+        comparables=valuation['comparables']
+    )
@@ -4,9 +4,8 @@ CLI for running common tasks
 import click
 from config.database import SessionLocal
 from ingestion.scrapers.orchestrator import run_scraping_job
-from enrichment.enricher import enrich_all_unmatched_listings
-from api.models.database import ListingRaw
-from matching.matchers.address_matcher import match_listing_to_property
+from enrichment.enricher import enrich_all_unmatched_listings, DEFAULT_BATCH_SIZE
+from matching.matchers.batch_matcher import match_unmatched_listings, DEFAULT_MATCH_BATCH_SIZE
 
 
 @click.group()
@@ -29,53 +28,125 @@ def scrape():
         click.echo(f"  Total listings scraped: {stats['total_listings_scraped']}")
         click.echo(f"  New: {stats['total_listings_new']}")
         click.echo(f"  Updated: {stats['total_listings_updated']}")
+        click.echo(f"  Matched: {stats['total_listings_matched']}")
     finally:
         db.close()
 
 
 @cli.command()
-def match():
+@click.option('--batch-size', default=DEFAULT_MATCH_BATCH_SIZE, help='Listings matched per batch')
+@click.option('--epc-uprn/--no-epc-uprn', default=True, help='Resolve UPRNs via the EPC register first')
+def match(batch_size, epc_uprn):
     """Match unmatched raw listings to properties"""
     click.echo("Matching raw listings to properties...")
     db = SessionLocal()
     try:
-        unmatched = db.query(ListingRaw).filter(
-            ListingRaw.matched_property_id.is_(None),
-            ListingRaw.postcode.isnot(None)
-        ).all()
+        feature_store = None
+        if epc_uprn:
+            from ingestion.loaders.s3_feature_loader import get_feature_store
+            feature_store = get_feature_store()
 
-        click.echo(f"Found {len(unmatched)} unmatched listings")
-
-        matched_count = 0
-        for raw in unmatched:
-            result = match_listing_to_property(db, raw.raw_address, raw.postcode)
-            if result:
-                raw.matched_property_id = result[0]
-                raw.match_confidence = result[1]
-                raw.match_method = result[2]
-                matched_count += 1
-
-                if matched_count % 100 == 0:
-                    click.echo(f"  Matched {matched_count} listings...")
-
-        db.commit()
-        click.echo(f"\nMatching completed: {matched_count} / {len(unmatched)} matched")
+        stats = match_unmatched_listings(db, batch_size=batch_size, feature_store=feature_store)
+        click.echo(f"\nMatching completed: {stats['matched']} / {stats['unmatched']} matched")
 
     finally:
         db.close()
 
 
 @cli.command()
-def enrich():
+@click.option('--batch-size', default=DEFAULT_BATCH_SIZE, help='Listings per set-based batch')
+@click.option('--workers', default=1, help='Worker processes (1 = run in this process)')
+def enrich(batch_size, workers):
     """Enrich matched listings"""
     click.echo("Enriching matched listings...")
     db = SessionLocal()
     try:
-        count = enrich_all_unmatched_listings(db)
-        click.echo(f"Enriched {count} listings")
+        if workers > 1:
+            from enrichment.worker_pool import enrich_with_workers
+
+            stats = enrich_with_workers(db, workers, batch_size=batch_size)
+            click.echo(f"Enriched {stats['enriched']} / {stats['pending']} listings with {workers} workers")
+            if stats['failed']:
+                click.echo(f"  Failed: {len(stats['failed'])} listings")
+            if stats['failed_partitions']:
+                click.echo(f"  Crashed workers: {stats['failed_partitions']}")
+        else:
+            count = enrich_all_unmatched_listings(db, batch_size=batch_size)
+            click.echo(f"Enriched {count} listings")
+    finally:
+        db.close()
+
+
+@cli.command('enrich-daemon')
+@click.option('--batch-size', default=DEFAULT_BATCH_SIZE, help='Maximum listings per batch')
+@click.option('--max-delay', default=1.0, help='Seconds a notified listing waits for its batch to fill')
+def enrich_daemon(batch_size, max_delay):
+    """Enrich listings as they change (LISTEN/NOTIFY), until interrupted"""
+    from config.database import engine
+    from enrichment.daemon import EnrichmentDaemon
+
+    click.echo("Starting enrichment daemon (Ctrl+C to stop)...")
+    EnrichmentDaemon(engine, SessionLocal, batch_size=batch_size, max_delay=max_delay).run()
+
+
+@cli.command('bench-match')
+@click.option('--postcodes', default=200, help='Synthetic postcodes to generate')
+@click.option('--per-postcode', default=15, help='Properties per postcode')
+@click.option('--cases', default=2000, help='Address variants to match')
+@click.option('--seed', default=0, help='Random seed')
+@click.option('--matcher', 'matchers', multiple=True, help='Matcher to run (default: all)')
+@click.option('--min-precision', type=float, help='Fail if any matcher\'s precision is below this')
+@click.option('--min-recall', type=float, help='Fail if any matcher\'s recall is below this')
+def bench_match(postcodes, per_postcode, cases, seed, matchers, min_precision, min_recall):
+    """Benchmark address matchers on synthetic data (local database, rolled back)"""
+    from matching.benchmark import run_benchmark
+
+    db = SessionLocal()
+    try:
+        report = run_benchmark(db, postcodes, per_postcode, cases, seed, list(matchers) or None)
     finally:
         db.close()
 
+    failed = False
+    for name, result in report.items():
+        click.echo(f"\n{name}")
+        click.echo(f"  Throughput: {result['matches_per_s']:.0f} matches/s ({result['elapsed_s']:.2f}s)")
+        click.echo(f"  Queries: {result['queries']} ({result['queries_per_case']:.2f} per address)")
+        click.echo(f"  Precision: {result['precision']:.3f}  Recall: {result['recall']:.3f}")
+        for method, counts in result['by_method'].items():
+            click.echo(f"    {method:<16} precision {counts['precision']:.3f} ({counts['correct']}/{counts['predicted']})")
+        for kind, counts in result['by_kind'].items():
+            click.echo(f"    {kind:<16} correct {counts['rate']:.3f} ({counts['correct']}/{counts['cases']})")
+
+        if min_precision is not None and result['precision'] < min_precision:
+            click.echo(f"  FAIL: precision below {min_precision}")
+            failed = True
+        if min_recall is not None and result['recall'] < min_recall:
+            click.echo(f"  FAIL: recall below {min_recall}")
+            failed = True
+
+    if failed:
+        raise SystemExit(1)
+
+
+@cli.command('bench-avm')
+@click.option('--comparables', default=50_000, help='Synthetic comparables in the index')
+@click.option('--subjects', default=5_000, help='Properties to value in one batch')
+@click.option('--seed', default=1, help='Random seed')
+@click.option('--min-rate', type=float, help='Fail below this many valuations per second')
+def bench_avm(comparables, subjects, seed, min_rate):
+    """Benchmark batch AVM valuation on synthetic comparables (in memory)"""
+    from matching.benchmark import run_avm_benchmark
+
+    report = run_avm_benchmark(comparables, subjects, seed)
+    click.echo(f"Index: {comparables} comparables in {report['index_s']:.2f}s")
+    click.echo(f"Throughput: {report['valuations_per_s']:.0f} valuations/s ({report['elapsed_s']:.2f}s)")
+    click.echo(f"Valued: {report['valued']} / {subjects}")
+
+    if min_rate is not None and report['valuations_per_s'] < min_rate:
+        click.echo(f"FAIL: throughput below {min_rate}")
+        raise SystemExit(1)
+
 
 @cli.command()
 def pipeline():
@@ -106,6 +177,106 @@ def pipeline():
     click.echo("=" * 50)
 
 
+@cli.command('refresh-conservation')
+@click.option('--missing-only', is_flag=True, help='Only compute properties without membership')
+def refresh_conservation(missing_only):
+    """Recompute property -> conservation area membership"""
+    from enrichment.conservation import refresh_conservation_memberships
+
+    click.echo("Refreshing conservation area membership...")
+    db = SessionLocal()
+    try:
+        count = refresh_conservation_memberships(db, missing_only=missing_only)
+        db.commit()
+        click.echo(f"Refreshed {count} properties")
+    finally:
+        db.close()
+
+
+@cli.command('load-sold-prices')
+@click.argument('csv_path', type=click.Path(exists=True, dir_okay=False))
+def load_sold_prices(csv_path):
+    """Load a Land Registry Price Paid CSV (AVM comparables)"""
+    from ingestion.loaders.price_paid_loader import load_price_paid
+
+    click.echo(f"Loading sold prices from {csv_path}...")
+    db = SessionLocal()
+    try:
+        stats = load_price_paid(db, csv_path)
+        click.echo(f"Loaded {stats['loaded']} sales ({stats['matched']} matched, {stats['skipped']} skipped)")
+    finally:
+        db.close()
+
+
+@cli.command('load-stations')
+@click.argument('csv_path', type=click.Path(exists=True, dir_okay=False))
+def load_stations(csv_path):
+    """Load rail and metro stations from a NaPTAN Stops.csv"""
+    from ingestion.loaders.naptan_loader import load_naptan_stations
+
+    click.echo(f"Loading stations from {csv_path}...")
+    db = SessionLocal()
+    try:
+        stats = load_naptan_stations(db, csv_path)
+        click.echo(f"Loaded {stats['loaded']} stations ({stats['skipped']} stops skipped)")
+    finally:
+        db.close()
+
+
+@cli.command('sync-features')
+@click.option('--dataset', 'datasets', multiple=True, help='Dataset to sync (default: all)')
+def sync_features(datasets):
+    """Mirror the feature parquet files from S3 into the local cache"""
+    import os
+    from ingestion.loaders.feature_mirror import FeatureMirror, FEATURE_DATASETS
+
+    mirror = FeatureMirror(os.getenv("FEATURE_S3_BUCKET", "uk-property-features"))
+    click.echo(f"Syncing feature files into {mirror.cache_dir}...")
+    stats = mirror.sync(datasets or FEATURE_DATASETS)
+    click.echo(
+        f"Downloaded {stats['downloaded']}, unchanged {stats['unchanged']}, removed {stats['removed']}"
+    )
+    if stats['downloaded'] or stats['removed']:
+        click.echo("Feature files changed: bump FEATURE_SNAPSHOT_VERSION to recompute cached enrichment")
+
+
+@cli.command('build-features')
+@click.option('--db-path', default=None, help='DuckDB file (default: FEATURE_DB_PATH)')
+@click.option('--dataset', 'datasets', multiple=True, help='Dataset to build (default: all)')
+@click.option('--force', is_flag=True, help='Rebuild even if the files are unchanged')
+def build_features(db_path, datasets, force):
+    """Materialise feature sets into indexed tables in a DuckDB file (served read-only)"""
+    import os
+    from ingestion.loaders.feature_mirror import FEATURE_DATASETS
+    from ingestion.loaders.s3_feature_loader import build_feature_database
+
+    db_path = db_path or os.getenv("FEATURE_DB_PATH")
+    if not db_path:
+        raise click.UsageError("Set FEATURE_DB_PATH or pass --db-path")
+
+    rebuilt = build_feature_database(db_path, datasets or FEATURE_DATASETS, force=force)
+    if rebuilt:
+        click.echo(f"Rebuilt: {', '.join(rebuilt)} (running services pick it up when they reopen the store)")
+    else:
+        click.echo("Feature tables are up to date")
+
+
+@cli.command('build-snapshot')
+@click.option('--source', default='savills_properties.json', help='Scraped properties JSON')
+@click.option('--output', default='savills_enriched.parquet', help='Parquet snapshot to write')
+def build_snapshot(source, output):
+    """Build the enriched snapshot that smart_api boots from"""
+    from enrichment.snapshot import build_enriched_snapshot
+
+    click.echo(f"Building enriched snapshot from {source}...")
+    db = SessionLocal()
+    try:
+        path = build_enriched_snapshot(db, source, output)
+        click.echo(f"Snapshot written to {path}")
+    finally:
+        db.close()
+
+
 @cli.command()
 @click.option('--host', default='0.0.0.0', help='Host to bind')
 @click.option('--port', default=8000, help='Port to bind')
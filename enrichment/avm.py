@@ -0,0 +1,355 @@
+"""
+Comparable-based automated valuation model (AVM).
+
+Recent sold prices and current asking prices are held in memory as numpy
+arrays grouped by postcode district and property type. A batch of subject
+properties is valued per group with one distance matrix: the nearest
+comparables are weighted by distance, bedroom similarity, age and source
+(sales count more than asking prices), and the estimate is the weighted
+geometric mean of their prices. The weighted spread of log prices gives
+the confidence interval; comparable count, spread and distance give the
+confidence score.
+"""
+import math
+import logging
+import threading
+from collections import defaultdict
+from datetime import date
+from typing import List, Dict, Any, Optional, Tuple
+
+import numpy as np
+from geoalchemy2 import Geometry
+from sqlalchemy import func, cast
+from sqlalchemy.orm import Session
+
+from api.models.database import SoldPrice, ListingEnriched, Property
+
+logger = logging.getLogger(__name__)
+
+# Comparable sources and their weight relative to a completed sale
+SOLD = 'sold'
+LISTING = 'listing'
+SOURCE_WEIGHTS = {SOLD: 1.0, LISTING: 0.6}
+
+# Metres per degree of latitude (equirectangular distances within a district)
+METRES_PER_DEGREE = 111_195.0
+
+# Nearest comparables used per valuation
+DEFAULT_K = 10
+
+# Fewer (district, type) comparables than this falls back to the whole district
+MIN_COMPARABLES = 3
+
+# Distance (m) at which a comparable's weight halves
+DISTANCE_SCALE_M = 750.0
+
+# Age (years) at which a comparable's weight halves
+HALF_LIFE_YEARS = 2.0
+
+# Sales older than this are not loaded
+MAX_SALE_AGE_YEARS = 5
+
+# 90% interval on log price; floor on spread so tight clusters keep a sane interval
+INTERVAL_Z = 1.645
+MIN_LOG_SPREAD = 0.03
+
+# Bound on subjects x comparables evaluated per distance matrix
+MAX_MATRIX_CELLS = 2_000_000
+
+# Property type synonyms -> canonical type (scrapers emit the canonical forms)
+PROPERTY_TYPES = {
+    'flat': 'flat', 'apartment': 'flat', 'maisonette': 'flat', 'f': 'flat',
+    'terraced': 'terraced', 'terrace': 'terraced', 'end_terrace': 'terraced', 't': 'terraced',
+    'semi_detached': 'semi_detached', 'semi-detached': 'semi_detached', 's': 'semi_detached',
+    'detached': 'detached', 'd': 'detached',
+    'bungalow': 'bungalow',
+}
+
+
+def postcode_district(postcode: Optional[str]) -> Optional[str]:
+    """Outward code of a UK postcode ('SW1A 1AA' -> 'SW1A')"""
+    if not postcode:
+        return None
+    postcode = postcode.strip().upper()
+    if ' ' in postcode:
+        return postcode.split()[0]
+    # Unspaced: the inward code is always the last three characters
+    return postcode[:-3] if len(postcode) > 4 else postcode
+
+
+def normalise_property_type(property_type: Optional[str]) -> Optional[str]:
+    """Canonical property type, or None if unknown"""
+    if not property_type:
+        return None
+    key = property_type.strip().lower().replace(' ', '_')
+    return PROPERTY_TYPES.get(key)
+
+
+class ComparableSet:
+    """Comparables for one (district, property type) group as parallel arrays"""
+
+    __slots__ = ('property_ids', 'latitudes', 'longitudes', 'log_prices', 'prices',
+                 'bedrooms', 'base_weights', 'sources')
+
+    def __init__(self, rows: List[Tuple], as_of: date):
+        # rows: (property_id, latitude, longitude, price, bedrooms, observed_date, source)
+        self.property_ids = np.array([r[0] if r[0] is not None else -1 for r in rows], dtype=np.int64)
+        self.latitudes = np.array([r[1] for r in rows], dtype=np.float64)
+        self.longitudes = np.array([r[2] for r in rows], dtype=np.float64)
+        self.prices = np.array([r[3] for r in rows], dtype=np.float64)
+        self.log_prices = np.log(self.prices)
+        self.bedrooms = np.array([r[4] if r[4] is not None else np.nan for r in rows], dtype=np.float64)
+        self.sources = [r[6] for r in rows]
+
+        ages = np.array([
+            max(0, (as_of - r[5]).days) / 365.25 if r[5] is not None else HALF_LIFE_YEARS
+            for r in rows
+        ], dtype=np.float64)
+        source_weights = np.array([SOURCE_WEIGHTS[r[6]] for r in rows], dtype=np.float64)
+        self.base_weights = source_weights * np.power(0.5, ages / HALF_LIFE_YEARS)
+
+    def __len__(self) -> int:
+        return len(self.prices)
+
+
+class AVMEngine:
+    """Values batches of properties against an in-memory comparables index"""
+
+    def __init__(self, comparables: List[Tuple], k: int = DEFAULT_K, as_of: Optional[date] = None):
+        """
+        Build the comparables index.
+
+        Args:
+            comparables: Rows of (property_id, postcode, property_type, latitude,
+                longitude, price, bedrooms, observed_date, source)
+            k: Nearest comparables used per valuation
+            as_of: Reference date for comparable ages (default today)
+        """
+        self.k = k
+        as_of = as_of or date.today()
+
+        by_type: Dict[Tuple[str, Optional[str]], List[Tuple]] = defaultdict(list)
+        by_district: Dict[str, List[Tuple]] = defaultdict(list)
+
+        for property_id, postcode, property_type, lat, lon, price, bedrooms, observed, source in comparables:
+            district = postcode_district(postcode)
+            if district is None or lat is None or lon is None or not price or price <= 0:
+                continue
+            row = (property_id, lat, lon, float(price), bedrooms, observed, source)
+            by_type[(district, normalise_property_type(property_type))].append(row)
+            by_district[district].append(row)
+
+        self.by_type = {key: ComparableSet(rows, as_of) for key, rows in by_type.items()}
+        self.by_district = {key: ComparableSet(rows, as_of) for key, rows in by_district.items()}
+        self.size = sum(len(s) for s in self.by_district.values())
+
+    @classmethod
+    def load(cls, db: Session, k: int = DEFAULT_K) -> 'AVMEngine':
+        """Load recent sold prices and current asking prices from the database"""
+        sold_location = func.coalesce(SoldPrice.location, Property.location)
+        sold_geom = cast(sold_location, Geometry)
+        sold = db.query(
+            SoldPrice.property_id,
+            SoldPrice.postcode,
+            func.coalesce(SoldPrice.property_type, Property.property_type),
+            func.ST_Y(sold_geom),
+            func.ST_X(sold_geom),
+            SoldPrice.price,
+            SoldPrice.bedrooms,
+            SoldPrice.sale_date,
+        ).outerjoin(
+            Property, Property.property_id == SoldPrice.property_id
+        ).filter(
+            sold_location.isnot(None),
+            SoldPrice.sale_date >= func.current_date() - MAX_SALE_AGE_YEARS * 365
+        ).all()
+
+        listing_geom = cast(ListingEnriched.location, Geometry)
+        listings = db.query(
+            ListingEnriched.property_id,
+            ListingEnriched.postcode,
+            ListingEnriched.property_type,
+            func.ST_Y(listing_geom),
+            func.ST_X(listing_geom),
+            ListingEnriched.price,
+            ListingEnriched.bedrooms,
+            func.coalesce(ListingEnriched.listed_date, func.date(ListingEnriched.created_at)),
+        ).filter(
+            ListingEnriched.price > 0,
+            ListingEnriched.status != 'withdrawn'
+        ).all()
+
+        comparables = [(*row, SOLD) for row in sold] + [(*row, LISTING) for row in listings]
+        engine = cls(comparables, k=k)
+        logger.info(
+            f"Loaded AVM comparables: {len(sold)} sales, {len(listings)} listings "
+            f"across {len(engine.by_district)} districts"
+        )
+        return engine
+
+    def _comparables_for(self, district: Optional[str], property_type: Optional[str]) -> Optional[ComparableSet]:
+        """Same-type comparables in the district, else the whole district"""
+        same_type = self.by_type.get((district, property_type))
+        if same_type is not None and len(same_type) >= MIN_COMPARABLES:
+            return same_type
+        return self.by_district.get(district)
+
+    def value_batch(
+        self,
+        subjects: List[Dict[str, Any]],
+        include_comparables: bool = False
+    ) -> List[Dict[str, Any]]:
+        """
+        Value a batch of properties.
+
+        Args:
+            subjects: Dicts with 'property_id', 'postcode', 'property_type',
+                'bedrooms', 'latitude' and 'longitude'
+            include_comparables: Also return the weighted comparables used
+
+        Returns:
+            One dict per subject (same order) with 'estimate',
+            'interval_lower', 'interval_upper', 'confidence_score' and
+            'comparable_count'; values are None where no comparables exist
+        """
+        results: List[Optional[Dict[str, Any]]] = [None] * len(subjects)
+
+        groups: Dict[int, Tuple[ComparableSet, List[int]]] = {}
+        for i, subject in enumerate(subjects):
+            if subject.get('latitude') is None or subject.get('longitude') is None:
+                continue
+            comps = self._comparables_for(
+                postcode_district(subject.get('postcode')),
+                normalise_property_type(subject.get('property_type'))
+            )
+            if comps is not None:
+                groups.setdefault(id(comps), (comps, []))[1].append(i)
+
+        for comps, indices in groups.values():
+            chunk = max(1, MAX_MATRIX_CELLS // len(comps))
+            for start in range(0, len(indices), chunk):
+                batch = indices[start:start + chunk]
+                valuations = self._value_group(comps, [subjects[i] for i in batch], include_comparables)
+                for i, valuation in zip(batch, valuations):
+                    results[i] = valuation
+
+        return [result or self._no_valuation() for result in results]
+
+    def _value_group(
+        self,
+        comps: ComparableSet,
+        subjects: List[Dict[str, Any]],
+        include_comparables: bool
+    ) -> List[Dict[str, Any]]:
+        """Value subjects sharing one comparable set with a single distance matrix"""
+        lat = np.array([s['latitude'] for s in subjects], dtype=np.float64)[:, None]
+        lon = np.array([s['longitude'] for s in subjects], dtype=np.float64)[:, None]
+        beds = np.array([
+            s['bedrooms'] if s.get('bedrooms') is not None else np.nan for s in subjects
+        ], dtype=np.float64)[:, None]
+        pids = np.array([
+            s['property_id'] if s.get('property_id') is not None else -2 for s in subjects
+        ], dtype=np.int64)[:, None]
+
+        # Equirectangular distances (m): accurate to well under 1% within a district
+        dy = (comps.latitudes[None, :] - lat) * METRES_PER_DEGREE
+        dx = (comps.longitudes[None, :] - lon) * METRES_PER_DEGREE * np.cos(np.radians(lat))
+        distances = np.hypot(dx, dy)
+
+        # A property is never its own comparable
+        distances[comps.property_ids[None, :] == pids] = np.inf
+
+        k = min(self.k, len(comps))
+        nearest = np.argpartition(distances, k - 1, axis=1)[:, :k]
+        near_dist = np.take_along_axis(distances, nearest, axis=1)
+
+        bed_diff = np.abs(comps.bedrooms[nearest] - beds)
+        bed_weight = np.where(np.isnan(bed_diff), 0.75, np.power(0.5, bed_diff))
+
+        weights = (
+            comps.base_weights[nearest]
+            * bed_weight
+            / (1.0 + (near_dist / DISTANCE_SCALE_M) ** 2)
+        )
+        weights[~np.isfinite(near_dist)] = 0.0
+
+        total = weights.sum(axis=1)
+        valid = total > 0
+        safe_total = np.where(valid, total, 1.0)
+
+        log_prices = comps.log_prices[nearest]
+        mean = (weights * log_prices).sum(axis=1) / safe_total
+        spread = np.sqrt((weights * (log_prices - mean[:, None]) ** 2).sum(axis=1) / safe_total)
+        half_width = INTERVAL_Z * np.maximum(spread, MIN_LOG_SPREAD)
+
+        # Kish effective sample size: how many comparables really carry the estimate
+        effective_n = total ** 2 / np.maximum((weights ** 2).sum(axis=1), 1e-12)
+        mean_distance = (weights * np.where(np.isfinite(near_dist), near_dist, 0.0)).sum(axis=1) / safe_total
+
+        confidence = (
+            np.minimum(1.0, effective_n / min(self.k, 5))
+            / (1.0 + 4.0 * spread)
+            / (1.0 + mean_distance / (4 * DISTANCE_SCALE_M))
+        )
+        counts = (weights > 0).sum(axis=1)
+
+        results = []
+        for row in range(len(subjects)):
+            if not valid[row]:
+                results.append(self._no_valuation())
+                continue
+
+            result = {
+                'estimate': math.exp(mean[row]),
+                'interval_lower': math.exp(mean[row] - half_width[row]),
+                'interval_upper': math.exp(mean[row] + half_width[row]),
+                'confidence_score': float(np.clip(confidence[row], 0.0, 1.0)),
+                'comparable_count': int(counts[row]),
+            }
+            if include_comparables:
+                result['comparables'] = [
+                    {
+                        'property_id': int(comps.property_ids[c]) if comps.property_ids[c] >= 0 else None,
+                        'price': float(comps.prices[c]),
+                        'distance_m': int(near_dist[row, j]),
+                        'source': comps.sources[c],
+                        'weight': round(float(weights[row, j] / total[row]), 4),
+                    }
+                    for j, c in ((j, nearest[row, j]) for j in np.argsort(-weights[row]))
+                    if weights[row, j] > 0
+                ]
+            results.append(result)
+
+        return results
+
+    @staticmethod
+    def _no_valuation() -> Dict[str, Any]:
+        return {
+            'estimate': None,
+            'interval_lower': None,
+            'interval_upper': None,
+            'confidence_score': None,
+            'comparable_count': 0,
+        }
+
+
+# Singleton instance
+_avm_engine: Optional[AVMEngine] = None
+_avm_engine_lock = threading.Lock()
+
+
+def get_avm_engine(db: Session) -> AVMEngine:
+    """Get or load the global AVM engine"""
+    global _avm_engine
+    if _avm_engine is None:
+        with _avm_engine_lock:
+            if _avm_engine is None:
+                _avm_engine = AVMEngine.load(db)
+    return _avm_engine
+
+
+def reset_avm_engine():
+    """Drop the global engine so the next call reloads comparables"""
+    global _avm_engine
+    with _avm_engine_lock:
+        _avm_engine = None
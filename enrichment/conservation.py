@@ -0,0 +1,89 @@
+"""
+Property -> conservation area membership.
+
+Point-in-polygon tests against detailed conservation area boundaries are
+among the slowest calls in enrichment, so membership is precomputed into
+`property_conservation_area` with one bulk spatial join and then read by
+property_id. Triggers in schema.sql keep the table current as properties
+and boundaries change; `refresh_conservation_memberships` backfills it
+through the same SQL function.
+"""
+import logging
+from typing import Dict, Optional, Iterable, List
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from api.models.database import PropertyConservationArea, ConservationArea
+
+logger = logging.getLogger(__name__)
+
+# Properties that have no membership row yet
+MISSING_MEMBERSHIP_IDS_SQL = """
+    ARRAY(
+        SELECT p.property_id FROM properties p
+        WHERE NOT EXISTS (SELECT 1 FROM property_conservation_area m WHERE m.property_id = p.property_id)
+    )
+"""
+
+
+def refresh_conservation_memberships(
+    db: Session,
+    property_ids: Optional[List[int]] = None,
+    missing_only: bool = False
+) -> int:
+    """
+    Recompute conservation area membership in bulk.
+
+    Runs the refresh_property_conservation_areas() function from schema.sql
+    (the one the triggers use) in the caller's transaction; the caller commits.
+
+    Args:
+        db: Database session
+        property_ids: Properties to refresh (None = all properties)
+        missing_only: Only compute properties without a membership row
+            (ignored when property_ids is given)
+
+    Returns:
+        Number of membership rows written
+    """
+    if property_ids is not None:
+        written = db.execute(
+            text("SELECT refresh_property_conservation_areas(CAST(:ids AS BIGINT[]))"),
+            {'ids': list(property_ids)}
+        ).scalar()
+    elif missing_only:
+        written = db.execute(
+            text(f"SELECT refresh_property_conservation_areas({MISSING_MEMBERSHIP_IDS_SQL})")
+        ).scalar()
+    else:
+        written = db.execute(text("SELECT refresh_property_conservation_areas(NULL)")).scalar()
+
+    logger.info(f"Refreshed conservation area membership for {written} properties")
+    return written
+
+
+def get_conservation_areas(db: Session, property_ids: Iterable[int]) -> Dict[int, Optional[str]]:
+    """
+    Look up the conservation area name for each property.
+
+    Read-only: membership rows are maintained by the schema.sql triggers.
+    A property without a row yet is reported as not in an area.
+
+    Returns:
+        Mapping of property_id -> conservation area name (None if not in one)
+    """
+    property_ids = list(set(property_ids))
+    if not property_ids:
+        return {}
+
+    rows = db.query(
+        PropertyConservationArea.property_id,
+        ConservationArea.name
+    ).outerjoin(
+        ConservationArea,
+        ConservationArea.conservation_area_id == PropertyConservationArea.conservation_area_id
+    ).filter(
+        PropertyConservationArea.property_id.in_(property_ids)
+    ).all()
+
+    return {property_id: name for property_id, name in rows}
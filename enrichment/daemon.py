@@ -0,0 +1,248 @@
+"""
+Event-driven enrichment daemon.
+
+A trigger on listings_raw (schema.sql) sends NOTIFY listing_enrichment
+with the raw_listing_id whenever a listing is matched or its price or
+status changes. The daemon LISTENs on that channel and micro-batches the
+notified IDs into the set-based enricher: a batch is flushed when it is
+full or when its oldest ID has waited `max_delay` seconds, so listings
+become searchable within seconds of being scraped without polling.
+
+Notifications sent while the daemon is down are lost, so on every
+(re)connect it first catches up on everything get_pending_listings finds.
+
+The daemon runs for days, so the process-wide reference index, AVM engine
+and feature store are dropped every `reload_interval` seconds and reloaded
+by the next batch: new schools, stations, sales and feature rebuilds are
+picked up without a restart.
+"""
+import time
+import select
+import signal
+import logging
+from collections import OrderedDict
+from typing import Iterable, List, Callable
+
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import sessionmaker
+
+from enrichment.avm import reset_avm_engine
+from enrichment.enricher import (
+    ListingEnricher, enrich_listing_ids, get_pending_listings, DEFAULT_BATCH_SIZE
+)
+from enrichment.spatial_index import reset_reference_index
+from ingestion.loaders.s3_feature_loader import reset_feature_store
+
+logger = logging.getLogger(__name__)
+
+# Channel the listings_raw trigger notifies on
+NOTIFY_CHANNEL = 'listing_enrichment'
+
+# Longest a notified listing waits for its batch to fill (seconds)
+DEFAULT_MAX_DELAY_S = 1.0
+
+# Wake-up interval while idle, so shutdown requests are noticed (seconds)
+IDLE_WAKEUP_S = 5.0
+
+# Wait before reconnecting after a lost connection (seconds)
+RECONNECT_DELAY_S = 5.0
+
+# How often the reference index, AVM engine and feature store are reloaded (seconds)
+DEFAULT_RELOAD_INTERVAL_S = 15 * 60.0
+
+
+class MicroBatcher:
+    """
+    Collects IDs and decides when to flush them.
+
+    A batch is due when it holds `batch_size` IDs or its oldest ID has
+    waited `max_delay` seconds. IDs drain in arrival order; a duplicate
+    keeps its first place.
+    """
+
+    def __init__(
+        self,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        max_delay: float = DEFAULT_MAX_DELAY_S,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.batch_size = batch_size
+        self.max_delay = max_delay
+        self.clock = clock
+        # raw_listing_id -> time it was first added, in arrival order
+        self.pending: "OrderedDict[int, float]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self.pending)
+
+    @property
+    def oldest(self) -> float:
+        """When the longest-waiting ID was added"""
+        return next(iter(self.pending.values()))
+
+    def add(self, ids: Iterable[int]):
+        now = self.clock()
+        for raw_listing_id in ids:
+            self.pending.setdefault(raw_listing_id, now)
+
+    def due(self) -> bool:
+        """Whether the current batch should be flushed now"""
+        if not self.pending:
+            return False
+        return len(self.pending) >= self.batch_size or self.clock() - self.oldest >= self.max_delay
+
+    def timeout(self) -> float:
+        """Seconds to wait for more notifications before the batch is due"""
+        if not self.pending:
+            return IDLE_WAKEUP_S
+        return max(0.0, self.oldest + self.max_delay - self.clock())
+
+    def drain(self) -> List[int]:
+        """Take up to batch_size IDs, first-in first-out"""
+        ids = []
+        while self.pending and len(ids) < self.batch_size:
+            ids.append(self.pending.popitem(last=False)[0])
+        return ids
+
+
+class EnrichmentDaemon:
+    """Listens for listing change notifications and enriches in micro-batches"""
+
+    def __init__(
+        self,
+        engine: Engine,
+        session_factory: sessionmaker,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        max_delay: float = DEFAULT_MAX_DELAY_S,
+        channel: str = NOTIFY_CHANNEL,
+        reload_interval: float = DEFAULT_RELOAD_INTERVAL_S,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        """
+        Args:
+            engine: Engine to take the dedicated LISTEN connection from
+            session_factory: Session factory for enrichment work
+            batch_size: Maximum listings per enrichment batch
+            max_delay: Longest a notified listing waits for its batch (seconds)
+            channel: NOTIFY channel to listen on
+            reload_interval: Seconds between reloads of the reference index,
+                AVM engine and feature store
+        """
+        self.engine = engine
+        self.session_factory = session_factory
+        self.channel = channel
+        self.batcher = MicroBatcher(batch_size, max_delay, clock)
+        self.reload_interval = reload_interval
+        self.clock = clock
+        self.loaded_at = clock()
+        self.stopped = False
+        self.stats = {'notifications': 0, 'batches': 0, 'enriched': 0, 'failed': 0}
+
+    def stop(self, *_args):
+        """Request shutdown (also installed as the SIGINT/SIGTERM handler)"""
+        logger.info("Enrichment daemon stopping...")
+        self.stopped = True
+
+    def run(self):
+        """Listen and enrich until stopped, reconnecting on connection loss"""
+        signal.signal(signal.SIGINT, self.stop)
+        signal.signal(signal.SIGTERM, self.stop)
+
+        while not self.stopped:
+            try:
+                self._listen()
+            except Exception as e:
+                if self.stopped:
+                    break
+                logger.error(f"Enrichment daemon connection lost: {e}", exc_info=True)
+                time.sleep(RECONNECT_DELAY_S)
+
+        # Finish what was already notified before exiting
+        while len(self.batcher):
+            self._flush()
+
+        logger.info(f"Enrichment daemon stopped: {self.stats}")
+
+    def _listen(self):
+        """Hold a dedicated autocommit connection and process notifications"""
+        raw = self.engine.raw_connection()
+        # Never hand the LISTEN connection (autocommit, subscribed) back to the pool
+        raw.detach()
+        conn = raw.driver_connection
+        try:
+            conn.autocommit = True
+            with conn.cursor() as cursor:
+                cursor.execute(f"LISTEN {self.channel}")
+            logger.info(f"Listening on '{self.channel}'")
+
+            # Catch up on changes made while nothing was listening
+            self._catch_up()
+
+            while not self.stopped:
+                if select.select([conn], [], [], self.batcher.timeout()) != ([], [], []):
+                    conn.poll()
+                    self._receive(conn.notifies)
+                    conn.notifies.clear()
+
+                while self.batcher.due():
+                    self._flush()
+        finally:
+            raw.close()
+
+    def _catch_up(self):
+        db = self.session_factory()
+        try:
+            pending = [raw_listing_id for raw_listing_id, _ in get_pending_listings(db)]
+        finally:
+            db.close()
+
+        if pending:
+            logger.info(f"Catching up on {len(pending)} pending listings")
+            self.batcher.add(pending)
+            while len(self.batcher):
+                self._flush()
+
+    def _receive(self, notifies):
+        ids = []
+        for notify in notifies:
+            try:
+                ids.append(int(notify.payload))
+            except ValueError:
+                logger.warning(f"Ignoring malformed notification payload: {notify.payload!r}")
+        self.stats['notifications'] += len(ids)
+        self.batcher.add(ids)
+
+    def _reload_if_stale(self):
+        """Drop the process-wide singletons once they are reload_interval old"""
+        if self.clock() - self.loaded_at < self.reload_interval:
+            return
+
+        reset_reference_index()
+        reset_avm_engine()
+        reset_feature_store()
+        self.loaded_at = self.clock()
+        logger.info("Reloading reference index, AVM engine and feature store")
+
+    def _flush(self):
+        """Enrich the next batch of notified listings"""
+        self._reload_if_stale()
+        ids = self.batcher.drain()
+        start = time.monotonic()
+
+        db = self.session_factory()
+        try:
+            result = enrich_listing_ids(ListingEnricher(db), ids, self.batcher.batch_size)
+        except Exception as e:
+            logger.error(f"Enrichment batch of {len(ids)} listings failed: {e}", exc_info=True)
+            result = {'enriched': 0, 'failed': ids}
+        finally:
+            db.close()
+
+        self.stats['batches'] += 1
+        self.stats['enriched'] += result['enriched']
+        self.stats['failed'] += len(result['failed'])
+
+        elapsed_ms = (time.monotonic() - start) * 1000
+        logger.info(f"Enriched {result['enriched']} / {len(ids)} notified listings in {elapsed_ms:.0f}ms")
+        if result['failed']:
+            logger.warning(f"Failed to enrich listings: {result['failed']}")
@@ -8,25 +8,90 @@ Takes a matched raw listing and enriches it with:
 - Derived scores and flags
 """
 import logging
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, List, Set, Tuple
 from decimal import Decimal
-from sqlalchemy import func
+import pyarrow as pa
+from sqlalchemy import func, or_
 from sqlalchemy.orm import Session
-
-from api.models.database import (
-    ListingRaw, ListingEnriched, Property, School, Airport, ConservationArea
+from sqlalchemy.dialects.postgresql import insert
+
+from api.models.database import ListingRaw, ListingEnriched, Property
+from ingestion.loaders.s3_feature_loader import S3FeatureStore, get_feature_store, current_snapshot_version
+from enrichment.conservation import get_conservation_areas
+from enrichment.property_cache import get_cached_property_data, store_property_data
+from enrichment.avm import AVMEngine, get_avm_engine
+from enrichment.spatial_index import (
+    ReferenceDataIndex, get_reference_index, point_coordinates,
+    PRIMARY_SCHOOL, SECONDARY_SCHOOL, AIRPORT, STATION
 )
-from ingestion.loaders.s3_feature_loader import get_feature_store
 
 logger = logging.getLogger(__name__)
 
+# Listings enriched per set-based batch
+DEFAULT_BATCH_SIZE = 500
+
+# Raw listing fields recorded at enrichment time (listings_enriched.source_fingerprint),
+# and the enrichment groups to recompute when they change. Listing fields copied
+# verbatim (title, status, ...) are refreshed on every run; unchanged groups are
+# reused from the previous enriched row. The fingerprint also records the feature
+# snapshot version: a new snapshot recomputes every property group.
+TRACKED_FIELDS = ('matched_property_id', 'price_numeric', 'bedrooms', 'property_type')
+
+GROUP_DEPENDENCIES = {
+    'features': {'matched_property_id'},
+    'conservation': {'matched_property_id'},
+    'schools': {'matched_property_id'},
+    'transport': {'matched_property_id'},
+    'avm': {'matched_property_id', 'bedrooms', 'property_type'},
+    'avm_delta': {'matched_property_id', 'price_numeric'},
+}
+
+GROUP_COLUMNS = {
+    'features': (
+        'epc_rating', 'epc_score', 'epc_potential_rating', 'epc_co2_emissions_current',
+        'epc_energy_consumption_current', 'imd_decile', 'crime_rate_percentile', 'flood_risk',
+        'max_download_speed_mbps', 'recent_planning_apps', 'planning_refusals'
+    ),
+    'conservation': ('in_conservation_area', 'conservation_area_name'),
+    'schools': ('school_quality_score', 'distance_to_nearest_primary_m', 'distance_to_nearest_secondary_m'),
+    'transport': ('distance_to_nearest_station_m', 'distance_to_nearest_airport_m', 'nearest_airport_code'),
+    'avm': (
+        'avm_estimate', 'avm_confidence_interval_lower', 'avm_confidence_interval_upper',
+        'avm_confidence_score', 'avm_value_delta_pct'
+    ),
+    'avm_delta': ('avm_value_delta_pct',),
+}
+
+ALL_GROUPS = frozenset(GROUP_DEPENDENCIES)
+
+# Groups that depend only on the property and reference data (property_enrichment_cache)
+PROPERTY_GROUPS = frozenset({'features', 'conservation', 'schools', 'transport'})
+
+# source_fingerprint key holding the feature snapshot version
+SNAPSHOT_VERSION_KEY = 'feature_snapshot_version'
+
 
 class ListingEnricher:
     """Enriches matched listings with all available data"""
 
-    def __init__(self, db: Session):
+    def __init__(
+        self,
+        db: Session,
+        feature_store: Optional[S3FeatureStore] = None,
+        reference_index: Optional[ReferenceDataIndex] = None,
+        avm: Optional[AVMEngine] = None
+    ):
+        """
+        Args:
+            db: Database session
+            feature_store: Feature store (default: the process-wide store)
+            reference_index: Reference POI index (default: the process-wide index)
+            avm: AVM engine (default: the process-wide engine)
+        """
         self.db = db
-        self.feature_store = get_feature_store()
+        self.feature_store = feature_store if feature_store is not None else get_feature_store()
+        self.reference_index = reference_index if reference_index is not None else get_reference_index(db)
+        self.avm = avm if avm is not None else get_avm_engine(db)
 
     def enrich_listing(self, raw_listing_id: int) -> Optional[int]:
         """
@@ -61,8 +126,14 @@ class ListingEnricher:
             return None
 
         try:
-            # Gather all enrichment data
-            enrichment_data = self._gather_enrichment_data(raw, prop)
+            # Only recompute what depends on fields changed since the last run
+            previous = self.db.query(ListingEnriched).filter(
+                ListingEnriched.raw_listing_id == raw_listing_id
+            ).first()
+            groups = self._dirty_groups(raw, previous)
+
+            # Gather enrichment data
+            enrichment_data = self._gather_enrichment_data(raw, prop, groups, previous)
 
             # Create or update enriched listing
             listing_id = self._upsert_enriched_listing(raw, enrichment_data)
@@ -74,160 +145,217 @@ class ListingEnricher:
             logger.error(f"Failed to enrich listing {raw_listing_id}: {e}", exc_info=True)
             return None
 
-    def _gather_enrichment_data(self, raw: ListingRaw, prop: Property) -> Dict[str, Any]:
-        """Gather all enrichment data for a listing"""
+    def _gather_enrichment_data(
+        self,
+        raw: ListingRaw,
+        prop: Property,
+        groups: Set[str] = ALL_GROUPS,
+        previous: Optional[ListingEnriched] = None
+    ) -> Dict[str, Any]:
+        """
+        Gather enrichment data for a listing.
 
-        data = {}
+        Args:
+            raw: Raw listing
+            prop: Matched property
+            groups: Enrichment groups to recompute
+            previous: Previous enriched row, reused for all other groups
+        """
 
-        # 1. Feature store data (EPC, planning, IMD, flood, broadband)
-        feature_data = self.feature_store.get_property_features(
-            uprn=prop.uprn,
-            postcode=prop.postcode
-        )
-        data.update(feature_data)
+        data = self._reused_values(previous, groups)
 
-        # 2. Conservation area check
-        conservation = self._check_conservation_area(prop)
-        data.update(conservation)
+        # 1-4. Feature store, conservation, school and transport data
+        # (property-level, served from the enrichment cache when present)
+        if PROPERTY_GROUPS & groups:
+            data.update(self._get_property_data({prop.property_id: prop})[prop.property_id])
 
-        # 3. School proximity and quality
-        schools = self._calculate_school_metrics(prop)
-        data.update(schools)
+        # 5. AVM valuation (listing-dependent, always computed here)
+        data.update(self._avm_values(raw, prop, groups, previous))
 
-        # 4. Transport (station, airport)
-        transport = self._calculate_transport_metrics(prop)
-        data.update(transport)
+        data['source_fingerprint'] = self._source_fingerprint(raw)
+        return data
 
-        # 5. AVM valuation
-        avm = self._get_avm_estimate(prop, raw.price_numeric)
-        data.update(avm)
+    # =====================================================
+    # DIRTY-FIELD TRACKING
+    # =====================================================
 
-        return data
+    def _source_fingerprint(self, raw: ListingRaw) -> Dict[str, Any]:
+        """JSON-serialisable snapshot of the tracked raw fields and the feature snapshot"""
+        fingerprint = {
+            field: str(value) if isinstance(value, Decimal) else value
+            for field, value in ((f, getattr(raw, f)) for f in TRACKED_FIELDS)
+        }
+        fingerprint[SNAPSHOT_VERSION_KEY] = self.feature_store.snapshot_version
+        return fingerprint
+
+    def _dirty_groups(self, raw: ListingRaw, previous: Optional[ListingEnriched]) -> Set[str]:
+        """Enrichment groups affected by raw fields changed since the previous run"""
+        if previous is None or not previous.source_fingerprint:
+            return set(ALL_GROUPS)
+
+        current = self._source_fingerprint(raw)
+        changed = {
+            field for field in TRACKED_FIELDS
+            if previous.source_fingerprint.get(field) != current[field]
+        }
 
-    def _check_conservation_area(self, prop: Property) -> Dict[str, Any]:
-        """Check if property is in a conservation area"""
+        groups = {group for group, deps in GROUP_DEPENDENCIES.items() if deps & changed}
+        if previous.source_fingerprint.get(SNAPSHOT_VERSION_KEY) != current[SNAPSHOT_VERSION_KEY]:
+            groups |= PROPERTY_GROUPS
+        return groups
 
-        # PostGIS ST_Contains query
-        ca = self.db.query(ConservationArea).filter(
-            func.ST_Contains(
-                ConservationArea.boundary,
-                prop.location
-            )
-        ).first()
+    @staticmethod
+    def _reused_values(previous: Optional[ListingEnriched], groups: Set[str]) -> Dict[str, Any]:
+        """Copy columns of the groups that are not being recomputed"""
+        if previous is None:
+            return {}
 
-        if ca:
-            return {
-                'in_conservation_area': True,
-                'conservation_area_name': ca.name
-            }
-        else:
+        recomputed = {column for group in groups for column in GROUP_COLUMNS[group]}
+        return {
+            column: getattr(previous, column)
+            for group, columns in GROUP_COLUMNS.items() if group not in groups
+            for column in columns if column not in recomputed
+        }
+
+    @staticmethod
+    def _needs_estimate(groups: Set[str], previous: Optional[ListingEnriched]) -> bool:
+        """Whether the valuation itself (not just the price delta) must be recomputed"""
+        return 'avm' in groups or (
+            'avm_delta' in groups and (previous is None or previous.avm_estimate is None)
+        )
+
+    def _avm_values(
+        self,
+        raw: ListingRaw,
+        prop: Property,
+        groups: Set[str],
+        previous: Optional[ListingEnriched],
+        estimate: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """
+        Recompute the full valuation, or only the price delta against it.
+
+        Args:
+            estimate: Valuation already computed for this listing in a batch
+        """
+        if self._needs_estimate(groups, previous):
+            if estimate is None:
+                estimate = self._get_avm_estimates([(prop, raw.bedrooms, raw.property_type)])[0]
             return {
-                'in_conservation_area': False,
-                'conservation_area_name': None
+                **estimate,
+                'avm_value_delta_pct': self._avm_delta_pct(raw.price_numeric, estimate['avm_estimate'])
             }
 
+        if 'avm_delta' in groups:
+            return {'avm_value_delta_pct': self._avm_delta_pct(raw.price_numeric, previous.avm_estimate)}
+
+        return {}
+
+    @staticmethod
+    def _avm_delta_pct(listing_price: Optional[Decimal], estimate: Optional[Decimal]) -> Optional[Decimal]:
+        """(price - estimate) / estimate * 100"""
+        if not listing_price or not estimate:
+            return None
+        delta = (((listing_price - estimate) / estimate) * 100).quantize(Decimal('0.01'))
+        # Outside NUMERIC(5, 2): a mis-scraped price (e.g. weekly rent), not a real delta
+        return delta if abs(delta) < 1000 else None
+
     def _calculate_school_metrics(self, prop: Property) -> Dict[str, Any]:
         """Calculate school quality and distance metrics"""
 
-        # Find nearest primary school
-        primary = self.db.query(
-            School.school_id,
-            School.ofsted_rating_score,
-            func.ST_Distance(School.location, prop.location).label('distance')
-        ).filter(
-            School.school_type == 'primary'
-        ).order_by(
-            func.ST_Distance(School.location, prop.location)
-        ).first()
+        lat, lon = point_coordinates(prop.location)
 
-        # Find nearest secondary school
-        secondary = self.db.query(
-            School.school_id,
-            School.ofsted_rating_score,
-            func.ST_Distance(School.location, prop.location).label('distance')
-        ).filter(
-            School.school_type == 'secondary'
-        ).order_by(
-            func.ST_Distance(School.location, prop.location)
-        ).first()
+        # Nearest primary and secondary schools (in-process index)
+        primary_distance, primary = self.reference_index.nearest_one(PRIMARY_SCHOOL, lat, lon)
+        secondary_distance, secondary = self.reference_index.nearest_one(SECONDARY_SCHOOL, lat, lon)
+
+        return self._school_metrics(
+            primary['ofsted_rating_score'] if primary else None,
+            primary_distance,
+            secondary['ofsted_rating_score'] if secondary else None,
+            secondary_distance
+        )
+
+    @staticmethod
+    def _school_metrics(
+        primary_score: Optional[int],
+        primary_distance: Optional[float],
+        secondary_score: Optional[int],
+        secondary_distance: Optional[float]
+    ) -> Dict[str, Any]:
+        """Build school metrics from the nearest primary and secondary schools"""
 
         # Calculate aggregate school quality score (0-1)
         # Average of nearest primary and secondary Ofsted scores (normalized)
         scores = []
-        if primary and primary.ofsted_rating_score:
-            scores.append(primary.ofsted_rating_score / 4.0)  # 4 = outstanding
-        if secondary and secondary.ofsted_rating_score:
-            scores.append(secondary.ofsted_rating_score / 4.0)
+        if primary_score:
+            scores.append(primary_score / 4.0)  # 4 = outstanding
+        if secondary_score:
+            scores.append(secondary_score / 4.0)
 
         school_quality_score = Decimal(str(sum(scores) / len(scores))) if scores else None
 
         return {
             'school_quality_score': school_quality_score,
-            'distance_to_nearest_primary_m': int(primary.distance) if primary else None,
-            'distance_to_nearest_secondary_m': int(secondary.distance) if secondary else None
+            'distance_to_nearest_primary_m': int(primary_distance) if primary_distance is not None else None,
+            'distance_to_nearest_secondary_m': int(secondary_distance) if secondary_distance is not None else None
         }
 
     def _calculate_transport_metrics(self, prop: Property) -> Dict[str, Any]:
         """Calculate distance to nearest station and airports"""
 
-        # Nearest airport
-        airport = self.db.query(
-            Airport.iata_code,
-            func.ST_Distance(Airport.location, prop.location).label('distance')
-        ).order_by(
-            func.ST_Distance(Airport.location, prop.location)
-        ).first()
+        lat, lon = point_coordinates(prop.location)
 
-        # For station, we'd query a stations table (not in schema yet)
-        # Placeholder:
-        distance_to_station = None  # TODO: implement stations table
+        # Nearest station and airport (in-process index)
+        station_distance, station = self.reference_index.nearest_one(STATION, lat, lon)
+        airport_distance, airport = self.reference_index.nearest_one(AIRPORT, lat, lon)
 
         return {
-            'distance_to_nearest_station_m': distance_to_station,
-            'distance_to_nearest_airport_m': int(airport.distance) if airport else None,
-            'nearest_airport_code': airport.iata_code if airport else None
+            'distance_to_nearest_station_m': int(station_distance) if station else None,
+            'distance_to_nearest_airport_m': int(airport_distance) if airport else None,
+            'nearest_airport_code': airport['iata_code'] if airport else None
         }
 
-    def _get_avm_estimate(self, prop: Property, listing_price: Optional[Decimal]) -> Dict[str, Any]:
+    def _get_avm_estimates(
+        self,
+        subjects: List[Tuple[Property, Optional[int], Optional[str]]]
+    ) -> List[Dict[str, Any]]:
         """
-        Get AVM valuation estimate.
+        Value properties in one vectorised AVM call.
 
-        MOCK IMPLEMENTATION: Replace with real AVM API call.
+        Args:
+            subjects: (property, bedrooms, listing property type) tuples; the
+                listing's type is preferred over the property's
+
+        Returns:
+            avm_estimate / confidence interval / confidence score columns per
+            subject, in order
         """
-        # Mock AVM - uses listing price with some noise
-        if not listing_price:
-            return {
-                'avm_estimate': None,
-                'avm_confidence_interval_lower': None,
-                'avm_confidence_interval_upper': None,
-                'avm_confidence_score': None,
-                'avm_value_delta_pct': None
+        batch = []
+        for prop, bedrooms, property_type in subjects:
+            lat, lon = point_coordinates(prop.location) or (None, None)
+            batch.append({
+                'property_id': prop.property_id,
+                'postcode': prop.postcode,
+                'property_type': property_type or prop.property_type,
+                'bedrooms': bedrooms,
+                'latitude': lat,
+                'longitude': lon,
+            })
+        valuations = self.avm.value_batch(batch)
+
+        def money(value: Optional[float]) -> Optional[Decimal]:
+            return Decimal(str(value)).quantize(Decimal('0.01')) if value is not None else None
+
+        return [
+            {
+                'avm_estimate': money(v['estimate']),
+                'avm_confidence_interval_lower': money(v['interval_lower']),
+                'avm_confidence_interval_upper': money(v['interval_upper']),
+                'avm_confidence_score': money(v['confidence_score']),
             }
-
-        # Simulate AVM estimate (±10% of listing price)
-        import random
-        random.seed(prop.property_id)  # Deterministic for demo
-
-        noise_factor = Decimal(str(random.uniform(0.92, 1.08)))
-        estimate = listing_price * noise_factor
-
-        # Confidence interval (±5%)
-        ci_lower = estimate * Decimal('0.95')
-        ci_upper = estimate * Decimal('1.05')
-
-        # Confidence score (0-1)
-        confidence = Decimal(str(random.uniform(0.75, 0.95)))
-
-        # Value delta percentage
-        delta_pct = ((listing_price - estimate) / estimate) * 100
-
-        return {
-            'avm_estimate': estimate.quantize(Decimal('0.01')),
-            'avm_confidence_interval_lower': ci_lower.quantize(Decimal('0.01')),
-            'avm_confidence_interval_upper': ci_upper.quantize(Decimal('0.01')),
-            'avm_confidence_score': confidence.quantize(Decimal('0.01')),
-            'avm_value_delta_pct': delta_pct.quantize(Decimal('0.01'))
-        }
+            for v in valuations
+        ]
 
     def _upsert_enriched_listing(
         self,
@@ -246,8 +374,31 @@ class ListingEnricher:
             Property.property_id == raw.matched_property_id
         ).first()
 
-        # Build enriched record
-        enriched_values = {
+        enriched_values = self._build_enriched_values(raw, prop, enrichment_data)
+
+        if existing:
+            # Update (always touched, so unchanged re-scrapes aren't picked up again)
+            for key, value in enriched_values.items():
+                setattr(existing, key, value)
+            existing.enriched_at = func.now()
+            self.db.commit()
+            return existing.listing_id
+        else:
+            # Insert
+            new_listing = ListingEnriched(**enriched_values)
+            self.db.add(new_listing)
+            self.db.commit()
+            self.db.refresh(new_listing)
+            return new_listing.listing_id
+
+    @staticmethod
+    def _build_enriched_values(
+        raw: ListingRaw,
+        prop: Property,
+        enrichment_data: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """Build the listings_enriched column values for a listing"""
+        return {
             'raw_listing_id': raw.raw_listing_id,
             'property_id': raw.matched_property_id,
             'agent_id': raw.agent_id,
@@ -274,42 +425,262 @@ class ListingEnricher:
             **enrichment_data
         }
 
-        if existing:
-            # Update
-            for key, value in enriched_values.items():
-                setattr(existing, key, value)
-            self.db.commit()
-            return existing.listing_id
-        else:
-            # Insert
-            new_listing = ListingEnriched(**enriched_values)
-            self.db.add(new_listing)
-            self.db.commit()
-            self.db.refresh(new_listing)
-            return new_listing.listing_id
+    # =====================================================
+    # SET-BASED BATCH ENRICHMENT
+    # =====================================================
+
+    def enrich_batch(self, raw_listing_ids: List[int]) -> Dict[int, int]:
+        """
+        Enrich a batch of raw listings with set-based queries.
+
+        One query fetches the listings with their properties, one cache
+        lookup serves properties enriched before, one feature store batch
+        join and the spatial index cover the rest, and a single multi-row
+        upsert writes the results.
+
+        Args:
+            raw_listing_ids: IDs of raw listings
+
+        Returns:
+            Mapping of raw_listing_id -> listing_id for enriched listings
+        """
+        if not raw_listing_ids:
+            return {}
+
+        # 1. Raw listings with their matched properties
+        pairs = self.db.query(ListingRaw, Property).join(
+            Property, Property.property_id == ListingRaw.matched_property_id
+        ).filter(
+            ListingRaw.raw_listing_id.in_(raw_listing_ids)
+        ).all()
+
+        missing = len(raw_listing_ids) - len(pairs)
+        if missing:
+            logger.warning(f"{missing} raw listings in batch are missing or unmatched")
+
+        if not pairs:
+            return {}
+
+        # Previous enriched rows, to recompute only what changed
+        previous = {
+            row.raw_listing_id: row
+            for row in self.db.query(ListingEnriched).filter(
+                ListingEnriched.raw_listing_id.in_([raw.raw_listing_id for raw, _ in pairs])
+            ).all()
+        }
+        groups = {
+            raw.raw_listing_id: self._dirty_groups(raw, previous.get(raw.raw_listing_id))
+            for raw, _ in pairs
+        }
+
+        # 2-3. Property-level data (cached or computed) for properties that need it
+        property_props = {
+            prop.property_id: prop for raw, prop in pairs
+            if PROPERTY_GROUPS & groups[raw.raw_listing_id]
+        }
+        property_data = self._get_property_data(property_props)
+
+        # 4. AVM valuations for listings that need one, in one vectorised call
+        to_value = [
+            (raw, prop) for raw, prop in pairs
+            if self._needs_estimate(groups[raw.raw_listing_id], previous.get(raw.raw_listing_id))
+        ]
+        estimates = dict(zip(
+            (raw.raw_listing_id for raw, _ in to_value),
+            self._get_avm_estimates([(prop, raw.bedrooms, raw.property_type) for raw, prop in to_value])
+        ))
+
+        # 5. Build enriched rows
+        rows = []
+        for raw, prop in pairs:
+            dirty = groups[raw.raw_listing_id]
+            prev = previous.get(raw.raw_listing_id)
+
+            data = self._reused_values(prev, dirty)
+            if PROPERTY_GROUPS & dirty:
+                data.update(property_data[prop.property_id])
+            data.update(self._avm_values(raw, prop, dirty, prev, estimates.get(raw.raw_listing_id)))
+            data['source_fingerprint'] = self._source_fingerprint(raw)
+
+            rows.append(self._build_enriched_values(raw, prop, data))
+
+        # 6. Single multi-row upsert
+        return self._upsert_enriched_listings(rows)
+
+    def _get_property_data(self, props: Dict[int, Property]) -> Dict[int, Dict[str, Any]]:
+        """
+        Listing-independent enrichment keyed by property_id.
 
+        Reads property_enrichment_cache for the current feature snapshot
+        first; misses are computed in one batch and written back, so
+        relistings and other agents' listings of a property reuse them.
+        """
+        if not props:
+            return {}
+
+        version = self.feature_store.snapshot_version
+        data = get_cached_property_data(self.db, props.keys(), version)
+
+        misses = {property_id: prop for property_id, prop in props.items() if property_id not in data}
+        if misses:
+            features = self._get_batch_features(misses.values())
+            spatial = self._get_batch_spatial_metrics(misses)
+            computed = {
+                property_id: {**features.get(property_id, {}), **spatial[property_id]}
+                for property_id in misses
+            }
+            store_property_data(self.db, computed, version)
+            data.update(computed)
 
-def enrich_all_unmatched_listings(db: Session) -> int:
+        logger.debug(f"Property enrichment: {len(props) - len(misses)} cached, {len(misses)} computed")
+        return data
+
+    def _get_batch_features(self, props) -> Dict[int, Dict[str, Any]]:
+        """Feature store data keyed by property_id"""
+        props = list(props)
+        table = self.feature_store.get_batch_feature_table(pa.table({
+            'property_id': pa.array([p.property_id for p in props], pa.int64()),
+            'uprn': pa.array([p.uprn for p in props], pa.int64()),
+            'postcode': pa.array([p.postcode for p in props], pa.string()),
+        }))
+
+        property_ids = table.column('property_id').to_pylist()
+        columns = {
+            name: table.column(name).to_pylist()
+            for name in table.column_names if name not in ('property_id', 'uprn')
+        }
+
+        features = {}
+        for i, property_id in enumerate(property_ids):
+            # Keep the first row per property
+            if property_id not in features:
+                features[property_id] = {name: values[i] for name, values in columns.items()}
+        return features
+
+    def _get_batch_spatial_metrics(self, props: Dict[int, Property]) -> Dict[int, Dict[str, Any]]:
+        """Conservation, school and transport metrics keyed by property_id"""
+        conservation = get_conservation_areas(self.db, props.keys())
+
+        metrics = {}
+        for property_id, prop in props.items():
+            area_name = conservation.get(property_id)
+            data = {
+                'in_conservation_area': area_name is not None,
+                'conservation_area_name': area_name
+            }
+            data.update(self._calculate_school_metrics(prop))
+            data.update(self._calculate_transport_metrics(prop))
+            metrics[property_id] = data
+
+        return metrics
+
+    def _upsert_enriched_listings(self, rows: List[Dict[str, Any]]) -> Dict[int, int]:
+        """
+        Insert or update enriched listings with one INSERT ... ON CONFLICT.
+
+        Returns:
+            Mapping of raw_listing_id -> listing_id
+        """
+        columns = set().union(*(row.keys() for row in rows))
+        rows = [{col: row.get(col) for col in columns} for row in rows]
+
+        stmt = insert(ListingEnriched).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['raw_listing_id'],
+            set_={
+                **{col: stmt.excluded[col] for col in columns if col != 'raw_listing_id'},
+                'enriched_at': func.now(),
+                'updated_at': func.now()
+            }
+        ).returning(ListingEnriched.raw_listing_id, ListingEnriched.listing_id)
+
+        result = self.db.execute(stmt).fetchall()
+        self.db.commit()
+
+        return {raw_listing_id: listing_id for raw_listing_id, listing_id in result}
+
+
+def get_pending_listings(db: Session, snapshot_version: Optional[str] = None) -> List[tuple]:
     """
-    Enrich all raw listings that are matched but not yet enriched.
+    Find raw listings that are matched but not yet enriched, that have
+    been re-scraped since they were last enriched, or that were enriched
+    from another feature snapshot.
+
+    Args:
+        db: Database session
+        snapshot_version: Feature snapshot being served (default: this
+            deployment's FEATURE_SNAPSHOT_VERSION)
 
     Returns:
-        Count of enriched listings
+        List of (raw_listing_id, matched_property_id), ordered by raw_listing_id
     """
-    enricher = ListingEnricher(db)
-
-    # Find matched but not enriched listings
-    unmatched = db.query(ListingRaw).filter(
+    snapshot_version = snapshot_version or current_snapshot_version()
+    return db.query(ListingRaw.raw_listing_id, ListingRaw.matched_property_id).outerjoin(
+        ListingEnriched, ListingEnriched.raw_listing_id == ListingRaw.raw_listing_id
+    ).filter(
         ListingRaw.matched_property_id.isnot(None),
-        ~ListingRaw.raw_listing_id.in_(
-            db.query(ListingEnriched.raw_listing_id)
+        or_(
+            ListingEnriched.listing_id.is_(None),
+            ListingRaw.updated_at > ListingEnriched.updated_at,
+            ListingEnriched.source_fingerprint[SNAPSHOT_VERSION_KEY].astext.is_distinct_from(snapshot_version)
         )
-    ).all()
+    ).order_by(ListingRaw.raw_listing_id).all()
+
+
+def enrich_listing_ids(
+    enricher: ListingEnricher,
+    raw_listing_ids: List[int],
+    batch_size: int = DEFAULT_BATCH_SIZE
+) -> Dict[str, Any]:
+    """
+    Enrich the given raw listings in set-based batches.
+
+    If a batch fails, its listings are retried one at a time so a single
+    bad row doesn't sink the rest.
+
+    Returns:
+        Dict with 'enriched' count and 'failed' raw listing IDs
+    """
+    enriched = 0
+    failed = []
+
+    for start in range(0, len(raw_listing_ids), batch_size):
+        batch = raw_listing_ids[start:start + batch_size]
+        try:
+            result = enricher.enrich_batch(batch)
+            enriched += len(result)
+            failed.extend(i for i in batch if i not in result)
+        except Exception as e:
+            logger.error(f"Batch enrichment failed, retrying listings individually: {e}", exc_info=True)
+            enricher.db.rollback()
+            for raw_listing_id in batch:
+                if enricher.enrich_listing(raw_listing_id):
+                    enriched += 1
+                else:
+                    failed.append(raw_listing_id)
+
+    return {'enriched': enriched, 'failed': failed}
+
+
+def enrich_all_unmatched_listings(db: Session, batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+    """
+    Enrich all raw listings that are matched but not yet enriched, and
+    incrementally re-enrich listings changed since their last enrichment.
+
+    Args:
+        db: Database session
+        batch_size: Listings per batch
+
+    Returns:
+        Count of enriched listings
+    """
+    enricher = ListingEnricher(db)
 
-    count = 0
-    for raw in unmatched:
-        if enricher.enrich_listing(raw.raw_listing_id):
-            count += 1
+    pending_ids = [
+        raw_listing_id
+        for raw_listing_id, _ in get_pending_listings(db, enricher.feature_store.snapshot_version)
+    ]
+    result = enrich_listing_ids(enricher, pending_ids, batch_size)
 
-    logger.info(f"Enriched {count} listings")
-    return count
+    logger.info(f"Enriched {result['enriched']} listings ({len(result['failed'])} failed)")
+    return result['enriched']
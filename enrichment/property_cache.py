@@ -0,0 +1,93 @@
+"""
+Property-level enrichment cache.
+
+EPC, IMD, flood, broadband, planning, conservation, school and transport
+data depend only on the property and the reference data, not on the
+listing. They are cached in `property_enrichment_cache` keyed by
+(property_id, feature_snapshot_version), so relistings and cross-agent
+duplicates of a property reuse them and only the listing-dependent AVM is
+recomputed. Bumping FEATURE_SNAPSHOT_VERSION when reference data is
+refreshed makes every property miss the cache once.
+"""
+import logging
+from typing import Dict, Any, Iterable
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from sqlalchemy.dialects.postgresql import insert
+
+from api.models.database import PropertyEnrichmentCache
+
+logger = logging.getLogger(__name__)
+
+# Cached enrichment columns (everything except the key and metadata)
+CACHED_COLUMNS = tuple(
+    column.name for column in PropertyEnrichmentCache.__table__.columns
+    if column.name not in ('property_id', 'feature_snapshot_version', 'computed_at')
+)
+
+
+def get_cached_property_data(
+    db: Session,
+    property_ids: Iterable[int],
+    snapshot_version: str
+) -> Dict[int, Dict[str, Any]]:
+    """
+    Look up cached enrichment data for properties.
+
+    Returns:
+        Mapping of property_id -> enrichment column values (cache hits only)
+    """
+    property_ids = list(set(property_ids))
+    if not property_ids:
+        return {}
+
+    rows = db.query(PropertyEnrichmentCache).filter(
+        PropertyEnrichmentCache.feature_snapshot_version == snapshot_version,
+        PropertyEnrichmentCache.property_id.in_(property_ids)
+    ).all()
+
+    return {
+        row.property_id: {column: getattr(row, column) for column in CACHED_COLUMNS}
+        for row in rows
+    }
+
+
+def store_property_data(
+    db: Session,
+    property_data: Dict[int, Dict[str, Any]],
+    snapshot_version: str
+) -> int:
+    """
+    Write enrichment data for properties with one multi-row upsert.
+
+    The caller owns the transaction (rows are committed with the enriched
+    listings that use them).
+
+    Returns:
+        Number of cache rows written
+    """
+    if not property_data:
+        return 0
+
+    rows = [
+        {
+            'property_id': property_id,
+            'feature_snapshot_version': snapshot_version,
+            **{column: data.get(column) for column in CACHED_COLUMNS}
+        }
+        for property_id, data in property_data.items()
+    ]
+
+    stmt = insert(PropertyEnrichmentCache).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['property_id', 'feature_snapshot_version'],
+        set_={
+            **{column: stmt.excluded[column] for column in CACHED_COLUMNS},
+            'computed_at': func.now()
+        }
+    )
+    result = db.execute(stmt)
+
+    logger.debug(f"Cached enrichment for {result.rowcount} properties (snapshot {snapshot_version})")
+    return result.rowcount
@@ -0,0 +1,188 @@
+"""
+Offline enrichment snapshot for the smart search API.
+
+Joins the scraped JSON against the property base, the S3 feature store and the
+spatial reference tables once, and writes the result to a Parquet snapshot.
+smart_api boots from that snapshot instead of generating random enrichment,
+so startup is a single file read and scores are real and reproducible.
+
+Usage:
+    python cli.py build-snapshot --source savills_properties.json --output savills_enriched.parquet
+"""
+import json
+import logging
+from decimal import Decimal
+from typing import List, Dict, Any, Optional
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from geoalchemy2 import Geometry
+from sqlalchemy import func, cast
+from sqlalchemy.orm import Session
+
+from api.models.database import Property
+from enrichment.enricher import ListingEnricher
+from matching.matchers.batch_matcher import BatchAddressMatcher
+from search.property_dataset import DEFAULT_SNAPSHOT_PATH, rows_to_table
+
+logger = logging.getLogger(__name__)
+
+
+def _to_float(value) -> Optional[float]:
+    return float(value) if value is not None else None
+
+
+def _to_int(value) -> Optional[int]:
+    return int(value) if value is not None else None
+
+
+def _to_decimal(value) -> Optional[Decimal]:
+    return Decimal(str(value)) if value else None
+
+
+class SnapshotBuilder:
+    """Builds an enriched snapshot of scraped properties"""
+
+    def __init__(self, db: Session, agent_name: str = 'Savills'):
+        self.db = db
+        self.agent_name = agent_name
+        self.enricher = ListingEnricher(db)
+        self.matcher = BatchAddressMatcher(db, self.enricher.feature_store)
+
+    def build(self, properties: List[Dict[str, Any]]) -> pa.Table:
+        """
+        Enrich scraped properties and return them as a dataset table.
+
+        Works like ListingEnricher.enrich_batch: one batch match, one
+        property query, property-level data from the enrichment cache (misses
+        computed in one feature store join) and one vectorised AVM call.
+        Properties that cannot be matched to the property base keep their
+        listing data with null enrichment fields.
+        """
+        # 1. Match scraped addresses to properties in one batch
+        matches = {
+            i: result[0]
+            for i, result in self.matcher.match_addresses([
+                (i, scraped.get('address') or '', scraped.get('postcode'))
+                for i, scraped in enumerate(properties)
+            ]).items()
+        }
+
+        logger.info(f"Matched {len(matches)} / {len(properties)} scraped properties")
+
+        # 2. Fetch matched properties with coordinates in one query
+        props = self._fetch_properties(set(matches.values()))
+
+        # 3. Features, conservation, schools and transport per property (cached or computed)
+        property_data = self.enricher._get_property_data({
+            property_id: prop for property_id, (prop, _, _) in props.items()
+        })
+
+        # 4. AVM valuations for all matched listings in one vectorised call
+        matched = [i for i in range(len(properties)) if matches.get(i) in props]
+        estimates = dict(zip(matched, self.enricher._get_avm_estimates([
+            (props[matches[i]][0], _to_int(properties[i].get('bedrooms')), properties[i].get('property_type'))
+            for i in matched
+        ])))
+
+        # Keep the match and property cache entries written above
+        self.db.commit()
+
+        # 5. Build rows
+        rows = []
+        for i, scraped in enumerate(properties):
+            row = dict(scraped)
+            row['listing_id'] = i + 1
+            row['agent_name'] = self.agent_name
+            image_urls = scraped.get('image_urls') or []
+            row['image_urls'] = image_urls
+            row['image_url'] = image_urls[0] if image_urls else 'property-front.jpg'
+
+            if i in estimates:
+                prop, latitude, longitude = props[matches[i]]
+                row.update(self._enriched_columns(
+                    scraped, prop, latitude, longitude, property_data[prop.property_id], estimates[i]
+                ))
+
+            rows.append(row)
+
+        return rows_to_table(rows)
+
+    def _fetch_properties(self, property_ids) -> Dict[int, tuple]:
+        """Fetch (Property, latitude, longitude) keyed by property_id"""
+        if not property_ids:
+            return {}
+
+        geom = cast(Property.location, Geometry)
+        results = self.db.query(
+            Property,
+            func.ST_Y(geom).label('latitude'),
+            func.ST_X(geom).label('longitude')
+        ).filter(
+            Property.property_id.in_(property_ids)
+        ).all()
+
+        return {prop.property_id: (prop, lat, lon) for prop, lat, lon in results}
+
+    @staticmethod
+    def _enriched_columns(
+        scraped: Dict[str, Any],
+        prop: Property,
+        latitude: float,
+        longitude: float,
+        data: Dict[str, Any],
+        estimate: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """Build the enrichment columns for one matched property"""
+        delta = ListingEnricher._avm_delta_pct(_to_decimal(scraped.get('price')), estimate['avm_estimate'])
+
+        return {
+            'postcode': scraped.get('postcode') or prop.postcode,
+            'latitude': latitude,
+            'longitude': longitude,
+
+            'epc_rating': data.get('epc_rating'),
+            'epc_score': _to_int(data.get('epc_score')),
+            'imd_decile': _to_int(data.get('imd_decile')),
+            'crime_rate_percentile': _to_int(data.get('crime_rate_percentile')),
+            'flood_risk': data.get('flood_risk'),
+            'max_download_speed_mbps': _to_int(data.get('max_download_speed_mbps')),
+            'planning_refusals': _to_int(data.get('planning_refusals')),
+
+            'in_conservation_area': bool(data.get('in_conservation_area')),
+            'school_quality_score': _to_float(data.get('school_quality_score')),
+            'distance_to_nearest_primary_m': _to_int(data.get('distance_to_nearest_primary_m')),
+            'distance_to_nearest_station_m': _to_int(data.get('distance_to_nearest_station_m')),
+            'distance_to_nearest_airport_m': _to_int(data.get('distance_to_nearest_airport_m')),
+            'nearest_airport_code': data.get('nearest_airport_code'),
+
+            'avm_estimate': _to_float(estimate['avm_estimate']),
+            # Same rule as listings_enriched.is_undervalued
+            'is_undervalued': bool(delta is not None and delta < -5),
+        }
+
+
+def build_enriched_snapshot(
+    db: Session,
+    source_path: str,
+    output_path: str = DEFAULT_SNAPSHOT_PATH
+) -> str:
+    """
+    Build the enriched Parquet snapshot from a scraped JSON file.
+
+    Args:
+        db: Database session
+        source_path: Scraped properties JSON (list of dicts)
+        output_path: Destination Parquet file
+
+    Returns:
+        Path of the written snapshot
+    """
+    with open(source_path, 'r', encoding='utf-8') as f:
+        properties = json.load(f)
+
+    table = SnapshotBuilder(db).build(properties)
+    pq.write_table(table, output_path)
+
+    logger.info(f"Wrote enriched snapshot of {table.num_rows} properties to {output_path}")
+    return output_path
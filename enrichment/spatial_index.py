@@ -0,0 +1,298 @@
+"""
+In-process spatial index over reference points of interest.
+
+Schools, stations, airports and other reference POIs change rarely, so they are loaded
+from PostGIS once and held in memory in a lat/lon grid per POI type. Nearest-k
+queries walk the grid outwards ring by ring and return great-circle distances,
+so enrichment needs no database round trips for POI distances.
+"""
+import math
+import struct
+import logging
+import threading
+from collections import defaultdict
+from typing import List, Dict, Any, Optional, Tuple, Iterable
+
+from geoalchemy2 import Geometry
+from sqlalchemy import func, cast
+from sqlalchemy.orm import Session
+
+from api.models.database import School, Airport, Station
+
+logger = logging.getLogger(__name__)
+
+# Mean Earth radius (metres), as used by the haversine formula
+EARTH_RADIUS_M = 6371008.8
+
+# Metres per degree of latitude
+METRES_PER_DEGREE = math.pi * EARTH_RADIUS_M / 180.0
+
+# POI types held by the reference index
+PRIMARY_SCHOOL = 'primary_school'
+SECONDARY_SCHOOL = 'secondary_school'
+AIRPORT = 'airport'
+STATION = 'station'
+
+
+def haversine_m(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Great-circle distance in metres between two WGS84 points"""
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
+
+
+def point_coordinates(location) -> Optional[Tuple[float, float]]:
+    """
+    Extract (latitude, longitude) from a PostGIS point without a DB round trip.
+
+    Accepts the WKBElement geoalchemy2 returns for GEOGRAPHY(POINT) columns,
+    or raw (E)WKB bytes / hex.
+    """
+    if location is None:
+        return None
+
+    data = getattr(location, 'data', location)
+    if isinstance(data, str):
+        data = bytes.fromhex(data)
+    data = bytes(data)
+
+    byte_order = '<' if data[0] == 1 else '>'
+    geom_type, = struct.unpack(byte_order + 'I', data[1:5])
+
+    offset = 5
+    if geom_type & 0x20000000:  # EWKB SRID flag
+        offset += 4
+
+    if (geom_type & 0xFFFF) % 1000 != 1:
+        raise ValueError("Location is not a point")
+
+    lon, lat = struct.unpack(byte_order + 'dd', data[offset:offset + 16])
+    return lat, lon
+
+
+class PointOfInterest:
+    """A reference point with an attribute payload"""
+
+    __slots__ = ('latitude', 'longitude', 'attributes')
+
+    def __init__(self, latitude: float, longitude: float, attributes: Optional[Dict[str, Any]] = None):
+        self.latitude = latitude
+        self.longitude = longitude
+        self.attributes = attributes or {}
+
+    def __getitem__(self, key):
+        return self.attributes[key]
+
+    def get(self, key, default=None):
+        return self.attributes.get(key, default)
+
+
+class GridIndex:
+    """
+    Uniform lat/lon grid answering nearest-k queries.
+
+    The cell size adapts to point density so sparse sets (airports) and
+    dense sets (schools) both resolve within a few rings.
+    """
+
+    MIN_CELL_DEGREES = 0.01
+
+    def __init__(self, points: Iterable[PointOfInterest], cell_degrees: Optional[float] = None):
+        self.points = list(points)
+        self.cells: Dict[Tuple[int, int], List[PointOfInterest]] = defaultdict(list)
+
+        if not self.points:
+            self.cell_degrees = 1.0
+            return
+
+        lats = [p.latitude for p in self.points]
+        lons = [p.longitude for p in self.points]
+        lat_span = max(lats) - min(lats)
+        lon_span = max(lons) - min(lons)
+
+        if cell_degrees is None:
+            # Aim for a handful of points per cell
+            area = max(lat_span, self.MIN_CELL_DEGREES) * max(lon_span, self.MIN_CELL_DEGREES)
+            cell_degrees = max(self.MIN_CELL_DEGREES, math.sqrt(area * 4 / len(self.points)))
+        self.cell_degrees = cell_degrees
+
+        for p in self.points:
+            self.cells[self._cell(p.latitude, p.longitude)].append(p)
+
+        rows = [key[0] for key in self.cells]
+        cols = [key[1] for key in self.cells]
+        self._row_range = (min(rows), max(rows))
+        self._col_range = (min(cols), max(cols))
+
+    def __len__(self) -> int:
+        return len(self.points)
+
+    def _cell(self, lat: float, lon: float) -> Tuple[int, int]:
+        return (math.floor(lat / self.cell_degrees), math.floor(lon / self.cell_degrees))
+
+    def _ring(self, row: int, col: int, r: int):
+        """Cells at Chebyshev distance r from (row, col)"""
+        if r == 0:
+            yield (row, col)
+            return
+        for c in range(col - r, col + r + 1):
+            yield (row - r, c)
+            yield (row + r, c)
+        for rr in range(row - r + 1, row + r):
+            yield (rr, col - r)
+            yield (rr, col + r)
+
+    def _ring_lower_bound(self, lat: float, r: int) -> float:
+        """
+        Lower bound (metres) on the distance to any point outside rings 0..r.
+
+        Such points are at least r cells away in latitude or longitude;
+        longitude spacing is scaled by the cosine of the most poleward
+        latitude those cells can reach, with a 1% margin for the gap between
+        distance along a parallel and along the great circle.
+        """
+        if r == 0:
+            return 0.0
+        offset = r * self.cell_degrees
+        poleward = min(89.9, abs(lat) + offset + self.cell_degrees)
+        return 0.99 * offset * METRES_PER_DEGREE * math.cos(math.radians(poleward))
+
+    def nearest(self, lat: float, lon: float, k: int = 1) -> List[Tuple[float, PointOfInterest]]:
+        """
+        Find the k nearest points.
+
+        Returns:
+            List of (distance_m, point), nearest first
+        """
+        if not self.points:
+            return []
+
+        k = min(k, len(self.points))
+        row, col = self._cell(lat, lon)
+
+        # Rings needed to cover every occupied cell from the query cell
+        max_ring = max(
+            abs(row - self._row_range[0]), abs(row - self._row_range[1]),
+            abs(col - self._col_range[0]), abs(col - self._col_range[1])
+        )
+
+        found: List[Tuple[float, PointOfInterest]] = []
+        for r in range(max_ring + 1):
+            if 8 * r > len(self.cells):
+                # Far from a sparse grid: scanning every point beats walking empty rings
+                found = [(haversine_m(lat, lon, p.latitude, p.longitude), p) for p in self.points]
+                break
+
+            for key in self._ring(row, col, r):
+                for p in self.cells.get(key, ()):
+                    found.append((haversine_m(lat, lon, p.latitude, p.longitude), p))
+
+            if len(found) >= k:
+                found.sort(key=lambda item: item[0])
+                del found[k:]
+                if found[-1][0] <= self._ring_lower_bound(lat, r):
+                    break
+
+        found.sort(key=lambda item: item[0])
+        return found[:k]
+
+
+class ReferenceDataIndex:
+    """Spatial indexes over reference POIs, keyed by POI type"""
+
+    def __init__(self, indexes: Optional[Dict[str, GridIndex]] = None):
+        self.indexes = indexes or {}
+
+    @classmethod
+    def load(cls, db: Session) -> 'ReferenceDataIndex':
+        """Load all reference POIs from the database"""
+        points: Dict[str, List[PointOfInterest]] = defaultdict(list)
+
+        school_geom = cast(School.location, Geometry)
+        schools = db.query(
+            School.school_id,
+            School.school_type,
+            School.ofsted_rating_score,
+            func.ST_Y(school_geom),
+            func.ST_X(school_geom)
+        ).filter(
+            School.school_type.in_(['primary', 'secondary'])
+        ).all()
+
+        for school_id, school_type, ofsted_score, lat, lon in schools:
+            kind = PRIMARY_SCHOOL if school_type == 'primary' else SECONDARY_SCHOOL
+            points[kind].append(PointOfInterest(lat, lon, {
+                'school_id': school_id,
+                'ofsted_rating_score': ofsted_score
+            }))
+
+        airport_geom = cast(Airport.location, Geometry)
+        airports = db.query(
+            Airport.iata_code,
+            func.ST_Y(airport_geom),
+            func.ST_X(airport_geom)
+        ).all()
+
+        for iata_code, lat, lon in airports:
+            points[AIRPORT].append(PointOfInterest(lat, lon, {'iata_code': iata_code}))
+
+        station_geom = cast(Station.location, Geometry)
+        stations = db.query(
+            Station.atco_code,
+            Station.name,
+            Station.station_type,
+            func.ST_Y(station_geom),
+            func.ST_X(station_geom)
+        ).all()
+
+        for atco_code, name, station_type, lat, lon in stations:
+            points[STATION].append(PointOfInterest(lat, lon, {
+                'atco_code': atco_code,
+                'name': name,
+                'station_type': station_type
+            }))
+
+        index = cls({kind: GridIndex(pois) for kind, pois in points.items()})
+        logger.info(
+            "Loaded reference index: " +
+            ", ".join(f"{kind}={len(idx)}" for kind, idx in index.indexes.items())
+        )
+        return index
+
+    def nearest(self, kind: str, lat: float, lon: float, k: int = 1) -> List[Tuple[float, PointOfInterest]]:
+        """Find the k nearest POIs of a type (empty if none loaded)"""
+        index = self.indexes.get(kind)
+        if index is None:
+            return []
+        return index.nearest(lat, lon, k)
+
+    def nearest_one(self, kind: str, lat: float, lon: float) -> Tuple[Optional[float], Optional[PointOfInterest]]:
+        """Nearest POI of a type as (distance_m, point), or (None, None)"""
+        result = self.nearest(kind, lat, lon, 1)
+        return result[0] if result else (None, None)
+
+
+# Singleton instance
+_reference_index: Optional[ReferenceDataIndex] = None
+_reference_index_lock = threading.Lock()
+
+
+def get_reference_index(db: Session) -> ReferenceDataIndex:
+    """Get or load the global reference data index"""
+    global _reference_index
+    if _reference_index is None:
+        with _reference_index_lock:
+            if _reference_index is None:
+                _reference_index = ReferenceDataIndex.load(db)
+    return _reference_index
+
+
+def reset_reference_index():
+    """Drop the global index so the next call reloads reference data"""
+    global _reference_index
+    with _reference_index_lock:
+        _reference_index = None
@@ -0,0 +1,110 @@
+"""
+Multi-process enrichment.
+
+Pending raw listings are partitioned by property_id hash across a process
+pool, so listings of the same property always land on the same worker.
+Each worker opens its own database session and feature store connection
+(neither is safe to share across processes) and runs the set-based batch
+enrichment over its partition. Counts and failures are aggregated back to
+the caller.
+"""
+import os
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import List, Dict, Any, Tuple
+
+from sqlalchemy.orm import Session
+
+from enrichment.enricher import get_pending_listings, DEFAULT_BATCH_SIZE
+
+logger = logging.getLogger(__name__)
+
+
+def partition_listings(pending: List[Tuple[int, int]], partitions: int) -> List[List[int]]:
+    """
+    Split (raw_listing_id, property_id) pairs into partitions by property_id.
+
+    Returns:
+        List of raw listing ID lists (empty partitions are dropped)
+    """
+    buckets: List[List[int]] = [[] for _ in range(partitions)]
+    for raw_listing_id, property_id in pending:
+        buckets[hash(property_id) % partitions].append(raw_listing_id)
+    return [bucket for bucket in buckets if bucket]
+
+
+def _enrich_partition(raw_listing_ids: List[int], batch_size: int) -> Dict[str, Any]:
+    """Worker entrypoint: enrich one partition with its own connections"""
+    # Imported in the worker so each process builds its own engine and feature store
+    from config.database import SessionLocal
+    from enrichment.enricher import ListingEnricher, enrich_listing_ids
+
+    db = SessionLocal()
+    try:
+        enricher = ListingEnricher(db)
+        result = enrich_listing_ids(enricher, raw_listing_ids, batch_size)
+        result['pid'] = os.getpid()
+        return result
+    finally:
+        db.close()
+
+
+def enrich_with_workers(
+    db: Session,
+    workers: int,
+    batch_size: int = DEFAULT_BATCH_SIZE
+) -> Dict[str, Any]:
+    """
+    Enrich all pending listings across a pool of worker processes.
+
+    Args:
+        db: Database session (used only to find pending listings)
+        workers: Number of worker processes
+        batch_size: Listings per set-based batch within a worker
+
+    Returns:
+        Statistics dict with 'pending', 'enriched', 'failed' (IDs) and
+        'failed_partitions' (partitions whose worker crashed)
+    """
+    pending = get_pending_listings(db)
+    partitions = partition_listings(pending, workers)
+
+    stats = {
+        'pending': len(pending),
+        'workers': workers,
+        'enriched': 0,
+        'failed': [],
+        'failed_partitions': 0
+    }
+
+    if not partitions:
+        return stats
+
+    logger.info(f"Enriching {len(pending)} listings across {len(partitions)} workers")
+
+    # Spawn (not fork) so no DuckDB or psycopg2 connection state is inherited
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+        futures = {
+            executor.submit(_enrich_partition, partition, batch_size): partition
+            for partition in partitions
+        }
+
+        for future in as_completed(futures):
+            partition = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                logger.error(f"Enrichment worker failed on {len(partition)} listings: {e}", exc_info=True)
+                stats['failed'].extend(partition)
+                stats['failed_partitions'] += 1
+                continue
+
+            stats['enriched'] += result['enriched']
+            stats['failed'].extend(result['failed'])
+            logger.info(
+                f"Worker {result['pid']}: enriched={result['enriched']}, failed={len(result['failed'])}"
+            )
+
+    return stats
@@ -0,0 +1,137 @@
+"""
+Bounded pool of DuckDB cursors for concurrent feature lookups.
+
+A DuckDB connection must not be used from several threads at once, so the
+feature store's single connection serialised (or corrupted) concurrent
+lookups from FastAPI threadpool workers and background tasks. Each cursor
+is a separate connection to the same database instance: it sees the same
+tables and views, and cursors run queries in parallel. Cursors are created
+on demand up to `size` and handed out one thread at a time; callers beyond
+that wait for a free cursor.
+"""
+import time
+import queue
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Dict, Any, Iterator
+
+import duckdb
+
+logger = logging.getLogger(__name__)
+
+# Cursors per feature store (env FEATURE_STORE_POOL_SIZE)
+DEFAULT_POOL_SIZE = 8
+
+# How long a lookup waits for a free cursor before giving up
+DEFAULT_ACQUIRE_TIMEOUT_S = 30.0
+
+
+class CursorPoolTimeout(RuntimeError):
+    """No cursor became free within the acquire timeout"""
+
+
+class CursorPool:
+    """Hands out cursors of one DuckDB connection, at most one thread per cursor"""
+
+    def __init__(
+        self,
+        conn: duckdb.DuckDBPyConnection,
+        size: int = DEFAULT_POOL_SIZE,
+        acquire_timeout_s: float = DEFAULT_ACQUIRE_TIMEOUT_S
+    ):
+        """
+        Args:
+            conn: Connection whose database the cursors share
+            size: Maximum number of cursors
+            acquire_timeout_s: Maximum wait for a free cursor
+        """
+        if size < 1:
+            raise ValueError(f"Cursor pool size must be at least 1, got {size}")
+
+        self.conn = conn
+        self.size = size
+        self.acquire_timeout_s = acquire_timeout_s
+        self._idle: "queue.LifoQueue[duckdb.DuckDBPyConnection]" = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+        self._in_use = 0
+
+        # Metrics
+        self.acquisitions = 0
+        self.waits = 0
+        self.wait_seconds = 0.0
+        self.timeouts = 0
+        self.peak_in_use = 0
+
+    def _checkout(self) -> duckdb.DuckDBPyConnection:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            if self._created < self.size:
+                self._created += 1
+                return self.conn.cursor()
+
+        start = time.perf_counter()
+        try:
+            cursor = self._idle.get(timeout=self.acquire_timeout_s)
+        except queue.Empty:
+            with self._lock:
+                self.timeouts += 1
+            raise CursorPoolTimeout(
+                f"No feature store cursor free after {self.acquire_timeout_s}s (pool size {self.size})"
+            )
+
+        with self._lock:
+            self.waits += 1
+            self.wait_seconds += time.perf_counter() - start
+        return cursor
+
+    @contextmanager
+    def cursor(self) -> Iterator[duckdb.DuckDBPyConnection]:
+        """
+        Borrow a cursor for the duration of the block.
+
+        Raises:
+            CursorPoolTimeout: If none is free within acquire_timeout_s
+        """
+        cursor = self._checkout()
+        with self._lock:
+            self.acquisitions += 1
+            self._in_use += 1
+            self.peak_in_use = max(self.peak_in_use, self._in_use)
+        try:
+            yield cursor
+        finally:
+            with self._lock:
+                self._in_use -= 1
+            self._idle.put(cursor)
+
+    def stats(self) -> Dict[str, Any]:
+        """Pool size, cursors created and in use, and acquisition/wait counters"""
+        with self._lock:
+            return {
+                'size': self.size,
+                'created': self._created,
+                'in_use': self._in_use,
+                'peak_in_use': self.peak_in_use,
+                'acquisitions': self.acquisitions,
+                'waits': self.waits,
+                'wait_seconds': self.wait_seconds,
+                'timeouts': self.timeouts,
+            }
+
+    def close(self):
+        """Close the idle cursors (borrowed ones close with their connection)"""
+        closed = 0
+        while True:
+            try:
+                self._idle.get_nowait().close()
+                closed += 1
+            except queue.Empty:
+                break
+        logger.debug(f"Closed {closed} feature store cursors")
+
@@ -0,0 +1,141 @@
+"""
+Local mirror of the feature Parquet files.
+
+Views over `read_parquet('s3://...')` re-list and re-read S3 over httpfs on
+every query. The mirror copies each dataset's files into a local cache
+directory; a manifest of S3 ETags and sizes means a sync only downloads
+objects that changed and removes ones deleted upstream. S3FeatureStore
+points its views at mirrored datasets and falls back to S3 for the rest.
+
+    python cli.py sync-features
+"""
+import os
+import json
+import hashlib
+import logging
+from typing import Dict, Iterable, Optional
+
+import boto3
+
+logger = logging.getLogger(__name__)
+
+# Feature datasets, one S3 prefix (and local subdirectory) each
+FEATURE_DATASETS = ('epc', 'imd', 'flood', 'broadband', 'planning')
+
+DEFAULT_CACHE_DIR = 'data/features'
+
+MANIFEST_FILE = 'manifest.json'
+
+
+class FeatureMirror:
+    """Mirrors s3://{bucket}/{dataset}/*.parquet into {cache_dir}/{dataset}/"""
+
+    def __init__(self, bucket: str, cache_dir: Optional[str] = None, s3_client=None):
+        """
+        Args:
+            bucket: S3 bucket holding the feature datasets
+            cache_dir: Local mirror directory (env FEATURE_CACHE_DIR)
+            s3_client: boto3 S3 client (created on first sync if omitted)
+        """
+        self.bucket = bucket
+        self.cache_dir = cache_dir or os.getenv('FEATURE_CACHE_DIR', DEFAULT_CACHE_DIR)
+        self._s3 = s3_client
+        self.manifest = self._read_manifest()
+
+    @property
+    def s3(self):
+        if self._s3 is None:
+            self._s3 = boto3.client('s3')
+        return self._s3
+
+    def _manifest_path(self) -> str:
+        return os.path.join(self.cache_dir, MANIFEST_FILE)
+
+    def _read_manifest(self) -> Dict[str, Dict[str, object]]:
+        try:
+            with open(self._manifest_path()) as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def _write_manifest(self):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_path = self._manifest_path() + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.manifest, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self._manifest_path())
+
+    def _local_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, *key.split('/'))
+
+    def local_glob(self, dataset: str) -> Optional[str]:
+        """
+        Glob for a dataset's mirrored files.
+
+        Returns:
+            Local path pattern, or None if the dataset isn't fully mirrored
+        """
+        keys = [key for key in self.manifest if key.startswith(f'{dataset}/')]
+        if not keys or not all(os.path.exists(self._local_path(key)) for key in keys):
+            return None
+        return os.path.join(self.cache_dir, dataset, '*.parquet')
+
+    def signature(self, dataset: str) -> Optional[str]:
+        """
+        Fingerprint of a dataset's mirrored files (ETags and sizes).
+
+        Returns:
+            Hex digest, or None if the dataset isn't mirrored
+        """
+        if not self.local_glob(dataset):
+            return None
+        entries = {key: meta for key, meta in self.manifest.items() if key.startswith(f'{dataset}/')}
+        return hashlib.sha256(json.dumps(entries, sort_keys=True).encode()).hexdigest()
+
+    def sync(self, datasets: Iterable[str] = FEATURE_DATASETS) -> Dict[str, int]:
+        """
+        Bring the mirror up to date with S3.
+
+        Objects are downloaded when missing locally or when their ETag or
+        size changed; local files whose object was deleted are removed.
+        Downloads are written to a temporary file and renamed into place.
+
+        Returns:
+            Statistics dict with 'downloaded', 'unchanged' and 'removed' counts
+        """
+        stats = {'downloaded': 0, 'unchanged': 0, 'removed': 0}
+
+        for dataset in datasets:
+            remote = {}
+            paginator = self.s3.get_paginator('list_objects_v2')
+            for page in paginator.paginate(Bucket=self.bucket, Prefix=f'{dataset}/'):
+                for obj in page.get('Contents', []):
+                    if obj['Key'].endswith('.parquet'):
+                        remote[obj['Key']] = {'etag': obj['ETag'].strip('"'), 'size': obj['Size']}
+
+            for key, meta in remote.items():
+                local_path = self._local_path(key)
+                if self.manifest.get(key) == meta and os.path.exists(local_path):
+                    stats['unchanged'] += 1
+                    continue
+
+                os.makedirs(os.path.dirname(local_path), exist_ok=True)
+                tmp_path = local_path + '.part'
+                self.s3.download_file(self.bucket, key, tmp_path)
+                os.replace(tmp_path, local_path)
+                self.manifest[key] = meta
+                stats['downloaded'] += 1
+                logger.info(f"Mirrored s3://{self.bucket}/{key} ({meta['size']} bytes)")
+
+            for key in [k for k in self.manifest if k.startswith(f'{dataset}/') and k not in remote]:
+                local_path = self._local_path(key)
+                if os.path.exists(local_path):
+                    os.remove(local_path)
+                del self.manifest[key]
+                stats['removed'] += 1
+                logger.info(f"Removed {key} (deleted from S3)")
+
+            # Save progress per dataset so an interrupted sync isn't repeated
+            self._write_manifest()
+
+        return stats
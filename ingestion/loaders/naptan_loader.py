@@ -0,0 +1,104 @@
+"""
+Load stations from a NaPTAN Stops.csv export into the stations table.
+
+NaPTAN (National Public Transport Access Nodes) lists every public
+transport stop in Great Britain. A station has one access-area stop
+(RLY for rail, MET for Underground/metro/tram) plus entrances and
+platforms; only the access areas are loaded, so each station appears once.
+"""
+import csv
+import logging
+from typing import Dict, Any, Optional, List
+
+from sqlalchemy.orm import Session
+from sqlalchemy.dialects.postgresql import insert
+
+from api.models.database import Station
+
+logger = logging.getLogger(__name__)
+
+# NaPTAN StopType -> stations.station_type
+STATION_STOP_TYPES = {
+    'RLY': 'rail',
+    'MET': 'metro',
+}
+
+# Rows written per INSERT
+INSERT_BATCH_SIZE = 1000
+
+
+def parse_naptan_row(row: Dict[str, str]) -> Optional[Dict[str, Any]]:
+    """
+    Parse one NaPTAN Stops.csv row.
+
+    Returns:
+        stations column values, or None for non-station, inactive or
+        unlocated stops
+    """
+    station_type = STATION_STOP_TYPES.get(row.get('StopType'))
+    if not station_type:
+        return None
+
+    status = (row.get('Status') or 'active').lower()
+    if status not in ('active', 'act'):
+        return None
+
+    try:
+        latitude = float(row['Latitude'])
+        longitude = float(row['Longitude'])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+    return {
+        'atco_code': row['ATCOCode'],
+        'name': row.get('CommonName') or row['ATCOCode'],
+        'station_type': station_type,
+        'location': f'SRID=4326;POINT({longitude} {latitude})',
+    }
+
+
+def load_naptan_stations(db: Session, csv_path: str) -> Dict[str, int]:
+    """
+    Load stations from a NaPTAN Stops.csv file.
+
+    Re-loading a file updates existing stations in place.
+
+    Args:
+        db: Database session
+        csv_path: Path to NaPTAN Stops.csv
+
+    Returns:
+        Statistics dict with 'loaded' and 'skipped' counts
+    """
+    stats = {'loaded': 0, 'skipped': 0}
+    batch: List[Dict[str, Any]] = []
+
+    with open(csv_path, newline='', encoding='utf-8-sig') as f:
+        for row in csv.DictReader(f):
+            station = parse_naptan_row(row)
+            if station is None:
+                stats['skipped'] += 1
+                continue
+
+            batch.append(station)
+            if len(batch) >= INSERT_BATCH_SIZE:
+                stats['loaded'] += _upsert_stations(db, batch)
+                batch = []
+
+    if batch:
+        stats['loaded'] += _upsert_stations(db, batch)
+
+    logger.info(f"Loaded {stats['loaded']} stations from {csv_path} ({stats['skipped']} stops skipped)")
+    return stats
+
+
+def _upsert_stations(db: Session, rows: List[Dict[str, Any]]) -> int:
+    """Insert or update stations with one INSERT ... ON CONFLICT"""
+    stmt = insert(Station).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['atco_code'],
+        set_={col: stmt.excluded[col] for col in ('name', 'station_type', 'location')}
+    )
+    result = db.execute(stmt)
+    db.commit()
+    return result.rowcount
@@ -0,0 +1,126 @@
+"""
+Load HM Land Registry Price Paid data into sold_prices.
+
+The Price Paid CSV has no header row; columns are documented at
+https://www.gov.uk/guidance/about-the-price-paid-data. Each sale is linked
+to a property with the batch address matcher so the AVM can use the
+property's location; unmatched sales are stored without one.
+"""
+import csv
+import logging
+from datetime import datetime
+from decimal import Decimal
+from typing import Dict, Any, Optional, List
+
+from sqlalchemy.orm import Session
+from sqlalchemy.dialects.postgresql import insert
+
+from api.models.database import SoldPrice
+from matching.matchers.batch_matcher import BatchAddressMatcher
+
+logger = logging.getLogger(__name__)
+
+# Price Paid property type codes (O = other, not a residential comparable)
+PROPERTY_TYPE_CODES = {
+    'D': 'detached',
+    'S': 'semi_detached',
+    'T': 'terraced',
+    'F': 'flat',
+}
+
+# Rows written per INSERT
+INSERT_BATCH_SIZE = 1000
+
+
+def parse_price_paid_row(row: List[str]) -> Optional[Dict[str, Any]]:
+    """
+    Parse one Price Paid CSV row.
+
+    Returns:
+        sold_prices column values, or None for deleted records, non-residential
+        types and rows without a postcode
+    """
+    if len(row) < 16:
+        return None
+
+    (transaction_id, price, sale_date, postcode, type_code, _old_new, _duration,
+     paon, saon, street, locality, town, *_rest) = row
+    record_status = row[15]
+
+    property_type = PROPERTY_TYPE_CODES.get(type_code)
+    if record_status == 'D' or not property_type or not postcode:
+        return None
+
+    address = ', '.join(part for part in (saon, paon, street, locality, town) if part)
+
+    return {
+        'transaction_id': transaction_id.strip('{}'),
+        'postcode': postcode,
+        'property_type': property_type,
+        'price': Decimal(price),
+        'sale_date': datetime.strptime(sale_date[:10], '%Y-%m-%d').date(),
+        'address': address,
+    }
+
+
+def load_price_paid(db: Session, csv_path: str) -> Dict[str, int]:
+    """
+    Load a Price Paid CSV (yearly or monthly update file) into sold_prices.
+
+    Re-loading a file updates existing transactions in place.
+
+    Args:
+        db: Database session
+        csv_path: Path to the Price Paid CSV
+
+    Returns:
+        Statistics dict with 'loaded', 'matched' and 'skipped' counts
+    """
+    matcher = BatchAddressMatcher(db)
+    stats = {'loaded': 0, 'matched': 0, 'skipped': 0}
+    batch: List[Dict[str, Any]] = []
+
+    def flush():
+        matches = matcher.match_addresses([
+            (i, sale.pop('address'), sale['postcode']) for i, sale in enumerate(batch)
+        ])
+        for i, sale in enumerate(batch):
+            sale['property_id'] = matches[i][0] if i in matches else None
+        stats['matched'] += len(matches)
+        stats['loaded'] += _upsert_sales(db, batch)
+
+    with open(csv_path, newline='', encoding='utf-8') as f:
+        for row in csv.reader(f):
+            sale = parse_price_paid_row(row)
+            if sale is None:
+                stats['skipped'] += 1
+                continue
+
+            batch.append(sale)
+            if len(batch) >= INSERT_BATCH_SIZE:
+                flush()
+                batch = []
+
+    if batch:
+        flush()
+
+    logger.info(
+        f"Loaded {stats['loaded']} sales from {csv_path} "
+        f"({stats['matched']} matched to properties, {stats['skipped']} skipped)"
+    )
+    return stats
+
+
+def _upsert_sales(db: Session, rows: List[Dict[str, Any]]) -> int:
+    """Insert or update sales with one INSERT ... ON CONFLICT"""
+    stmt = insert(SoldPrice).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['transaction_id'],
+        set_={
+            col: stmt.excluded[col]
+            for col in ('property_id', 'postcode', 'property_type', 'price', 'sale_date')
+        }
+    )
+    result = db.execute(stmt)
+    db.commit()
+    return result.rowcount
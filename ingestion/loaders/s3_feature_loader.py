@@ -2,13 +2,130 @@
 Load feature data from S3 Parquet files into DuckDB for fast querying.
 
 This module creates an in-memory (or persistent) DuckDB database that can
-directly query S3 Parquet files and join them with property data.
+directly query S3 Parquet files and join them with property data. Datasets
+mirrored locally (`cli.py sync-features`, see feature_mirror.py) are read
+from the local cache instead; S3 is the fallback.
+
+With a database file (FEATURE_DB_PATH) each feature set is materialised
+into a table sorted by its lookup key with ART indexes, and planning counts
+are pre-aggregated, so point lookups are index probes instead of parquet
+scans. DuckDB lets only one process hold a file read-write, so the file is
+built by `cli.py build-features` (build_feature_database) and every
+serving process (API workers, enrichment workers, the daemon) opens it
+read-only. A build works on a copy that is renamed into place, and only
+rebuilds datasets whose mirrored files changed (tracked in `feature_builds`).
+
+Postcode-level features (IMD, crime, broadband) are identical for every
+address in a postcode, so they are materialised once per refresh into a
+`postcode_features` table with one row per postcode and joined by key;
+only UPRN-level data (EPC, flood, planning) is read per property.
+
+Flood risk is held per UPRN and per postcode. The UPRN-level risk takes
+precedence; otherwise the postcode's (worst) risk from postcode_features
+is used. Two equi-joins replace `uprn = ... OR postcode = ...`, which
+forced a nested-loop join and returned a row per matching flood record.
+
+The EPC register also carries each certificate's address, postcode and
+UPRN; its distinct addresses are materialised (normalised the same way as
+the matcher does) so a batch of scraped addresses can be resolved to UPRNs
+in one query.
+
+Lookups run on cursors from a bounded pool (cursor_pool.py), so threads
+query in parallel; building tables is serialised by a write lock.
 """
 import os
-from typing import Optional, Dict, Any, List
+import shutil
+import logging
+import threading
+from collections import OrderedDict
+from typing import Optional, Dict, Any, List, Iterable, Tuple
 import duckdb
+import pyarrow as pa
 from decimal import Decimal
 
+from matching.normaliser import STREET_SUFFIXES
+from ingestion.loaders.feature_mirror import FeatureMirror, FEATURE_DATASETS
+from ingestion.loaders.cursor_pool import CursorPool, DEFAULT_POOL_SIZE
+
+logger = logging.getLogger(__name__)
+
+# Flood risk levels, worst last; duplicate records resolve to the worst level
+_FLOOD_RISK_RANK_SQL = """
+    CASE lower(flood_risk)
+        WHEN 'very low' THEN 1 WHEN 'low' THEN 2 WHEN 'medium' THEN 3 WHEN 'high' THEN 4
+        ELSE 0
+    END
+"""
+
+# Single-property lookup; $1 = uprn, $2 = postcode. The filtered subqueries
+# let DuckDB prune the sorted/indexed feature tables down to one UPRN.
+_PROPERTY_FEATURES_SQL = f"""
+    SELECT
+        -- EPC
+        epc.epc_rating,
+        epc.epc_score,
+        epc.epc_potential_rating,
+        epc.epc_co2_emissions_current,
+        epc.epc_energy_consumption_current,
+
+        -- Area quality (postcode-level)
+        pf.imd_decile,
+        pf.crime_rate_percentile,
+
+        -- Flood: the property's own risk, else its postcode's
+        COALESCE(flood.flood_risk, pf.postcode_flood_risk) AS flood_risk,
+
+        -- Broadband (postcode-level)
+        pf.max_download_speed_mbps,
+
+        -- Planning
+        COALESCE(planning.recent_planning_apps, 0) AS recent_planning_apps,
+        COALESCE(planning.planning_refusals, 0) AS planning_refusals
+
+    FROM (SELECT $2::VARCHAR AS postcode, $1::BIGINT AS uprn) AS prop
+    -- Filtered subqueries: index probes on the materialised tables
+    LEFT JOIN (SELECT * FROM epc_data WHERE uprn = $1) epc ON epc.uprn = prop.uprn
+    LEFT JOIN (
+        SELECT uprn, arg_max(flood_risk, {_FLOOD_RISK_RANK_SQL}) AS flood_risk
+        FROM flood_data
+        WHERE uprn = $1 AND flood_risk IS NOT NULL
+        GROUP BY uprn
+    ) flood ON flood.uprn = prop.uprn
+    LEFT JOIN (SELECT * FROM planning_data WHERE uprn = $1) planning ON planning.uprn = prop.uprn
+    LEFT JOIN postcode_features pf ON pf.postcode = prop.postcode
+"""
+
+# Recent (uprn, postcode) lookups kept by get_property_features
+DEFAULT_FEATURE_LRU_SIZE = 4096
+
+# Columns of a list-of-dicts batch input
+BATCH_INPUT_SCHEMA = pa.schema([
+    ('property_id', pa.int64()),
+    ('uprn', pa.int64()),
+    ('postcode', pa.string()),
+])
+
+# Persistent mode: sort order and ART-indexed columns of each feature table
+MATERIALISED_TABLES = {
+    'epc': ('uprn', ('uprn',)),
+    'imd': ('postcode', ('postcode',)),
+    'flood': ('uprn, postcode', ('uprn', 'postcode')),
+    'broadband': ('postcode', ('postcode',)),
+    'planning': ('uprn', ('uprn',)),
+}
+
+# Tables a read-only feature database must contain
+_SERVED_TABLES = tuple(f'{dataset}_data' for dataset in FEATURE_DATASETS) + ('postcode_features', 'epc_addresses')
+
+# Share of an EPC address's tokens a scraped address must contain
+EPC_TOKEN_COVERAGE_THRESHOLD = 0.8
+
+# normalise_address() (matching/normaliser.py) as a DuckDB expression over `address`
+_NORMALISE_SQL = (
+    "trim(regexp_replace(regexp_replace(regexp_replace(lower(address), '[.,\\-]', ' ', 'g'), "
+    f"'\\b(?:{'|'.join(STREET_SUFFIXES)})\\b', '', 'g'), '\\s+', ' ', 'g'))"
+)
+
 
 class S3FeatureStore:
     """
@@ -23,35 +140,208 @@ class S3FeatureStore:
     - Broadband availability
     """
 
-    def __init__(self, db_path: str = ":memory:", s3_bucket: str = None):
+    def __init__(
+        self,
+        db_path: str = None,
+        s3_bucket: str = None,
+        snapshot_version: str = None,
+        cache_dir: str = None,
+        read_only: Optional[bool] = None,
+        pool_size: int = None,
+        source_dir: str = None,
+        recent_size: int = DEFAULT_FEATURE_LRU_SIZE
+    ):
         """
         Initialize the feature store.
 
         Args:
-            db_path: Path to DuckDB database file (":memory:" for in-memory)
+            db_path: Path to DuckDB database file (env FEATURE_DB_PATH, default
+                ":memory:"); a file holds materialised, indexed tables
             s3_bucket: S3 bucket name containing feature parquet files
+            snapshot_version: Version of the reference data release being served;
+                bump it when the feature files are refreshed so cached
+                property enrichment is recomputed
+            cache_dir: Local mirror of the feature files (env FEATURE_CACHE_DIR)
+            read_only: Open the database file read-only (default for a file;
+                only build_feature_database opens one writable)
+            pool_size: Cursors for concurrent lookups (env FEATURE_STORE_POOL_SIZE)
+            source_dir: Read {source_dir}/{dataset}/*.parquet directly instead of
+                the mirror or S3 (local files, tests)
+            recent_size: Single-property lookups kept in the LRU
         """
-        self.db_path = db_path
+        self.db_path = db_path or os.getenv("FEATURE_DB_PATH", ":memory:")
+        self.persistent = self.db_path != ":memory:"
+        self.read_only = self.persistent if read_only is None else read_only
         self.s3_bucket = s3_bucket or os.getenv("FEATURE_S3_BUCKET", "uk-property-features")
-        self.conn = duckdb.connect(db_path)
+        self.snapshot_version = snapshot_version or current_snapshot_version()
+        self.mirror = FeatureMirror(self.s3_bucket, cache_dir)
+        self.source_dir = source_dir
+        if self.read_only and not os.path.exists(self.db_path):
+            raise FileNotFoundError(f"Feature database {self.db_path} not found: run `cli.py build-features`")
+        self.conn = duckdb.connect(self.db_path, read_only=self.read_only)
+        self._httpfs_loaded = False
+
+        # Lookups borrow pooled cursors; DDL runs on self.conn under the write lock
+        self.pool = CursorPool(
+            self.conn, pool_size or int(os.getenv("FEATURE_STORE_POOL_SIZE", DEFAULT_POOL_SIZE))
+        )
+        self._write_lock = threading.RLock()
+
+        # LRU of recent get_property_features results
+        self.recent_size = recent_size
+        self._recent: OrderedDict = OrderedDict()
+        self._recent_lock = threading.Lock()
+        self._recent_generation = 0
+        self.recent_hits = 0
+        self.recent_misses = 0
+
+        if self.read_only:
+            # Everything was materialised by build_feature_database()
+            missing = [table for table in _SERVED_TABLES if self._relation_type(table) != 'table']
+            if missing:
+                raise RuntimeError(
+                    f"Feature database {self.db_path} is missing {', '.join(missing)}: run `cli.py build-features`"
+                )
+            self._postcode_features_ready = True
+            self._epc_addresses_ready = True
+            return
+
+        # Create views over the local mirror, or S3 where not mirrored
+        self._create_views()
 
-        # Configure S3 access (uses AWS credentials from environment)
-        self.conn.execute("INSTALL httpfs;")
-        self.conn.execute("LOAD httpfs;")
+        # Postcode-level features and EPC addresses are materialised on first use
+        self._postcode_features_ready = False
+        self._epc_addresses_ready = False
+
+    def _load_httpfs(self):
+        """Configure S3 access (uses AWS credentials from environment)"""
+        if self._httpfs_loaded:
+            return
+        with self._write_lock:
+            self.conn.execute("INSTALL httpfs;")
+            self.conn.execute("LOAD httpfs;")
+
+            # Optional: configure S3 region
+            region = os.getenv("AWS_REGION", "eu-west-2")
+            self.conn.execute(f"SET GLOBAL s3_region='{region}';")
+            self._httpfs_loaded = True
+
+    def _source(self, dataset: str) -> str:
+        """Parquet glob for a dataset: source_dir, the local mirror if complete, else S3"""
+        if self.source_dir:
+            return os.path.join(self.source_dir, dataset, '*.parquet')
+        local = self.mirror.local_glob(dataset)
+        if local:
+            return local
+        self._load_httpfs()
+        return f"s3://{self.s3_bucket}/{dataset}/*.parquet"
+
+    def reload_sources(self):
+        """
+        Re-read the mirror manifest and re-point the views (e.g. after a sync
+        in this process). Changed feature tables are rebuilt (persistent mode)
+        and derived tables are rebuilt on next use.
 
-        # Optional: configure S3 region
-        region = os.getenv("AWS_REGION", "eu-west-2")
-        self.conn.execute(f"SET s3_region='{region}';")
+        Raises:
+            RuntimeError: For a read-only store (rebuild the file with
+                build_feature_database and open a new store)
+        """
+        if self.read_only:
+            raise RuntimeError("Read-only feature store: rebuild with build_feature_database() and reopen")
+        with self._write_lock:
+            self.mirror.manifest = self.mirror._read_manifest()
+            self._create_views()
+            self.clear_recent_features()
+            if self.persistent:
+                self.materialise_features()
+            else:
+                self._postcode_features_ready = False
+                self._epc_addresses_ready = False
+
+    def _relation_type(self, name: str) -> Optional[str]:
+        """'table', 'view' or None for a relation in the main schema"""
+        row = self.conn.execute("""
+            SELECT table_type FROM information_schema.tables
+            WHERE table_schema = 'main' AND table_name = ?
+        """, [name]).fetchone()
+        if not row:
+            return None
+        return 'view' if row[0] == 'VIEW' else 'table'
+
+    def materialise_features(self, datasets: Iterable[str] = FEATURE_DATASETS, force: bool = False) -> List[str]:
+        """
+        Materialise feature sets into sorted, ART-indexed tables (persistent mode).
 
-        # Create views over S3 data
-        self._create_views()
+        Incremental: a dataset is rebuilt only when its table is missing or
+        its mirrored files changed since the last build. Datasets read from
+        S3 (not mirrored) are only rebuilt when missing or forced.
+
+        Args:
+            datasets: Datasets to bring up to date
+            force: Rebuild even if unchanged
+
+        Returns:
+            Datasets that were rebuilt
+        """
+        with self._write_lock:
+            return self._materialise_features(datasets, force)
+
+    def _materialise_features(self, datasets: Iterable[str], force: bool) -> List[str]:
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS feature_builds (
+                dataset VARCHAR PRIMARY KEY,
+                signature VARCHAR,
+                row_count BIGINT,
+                built_at TIMESTAMP
+            )
+        """)
+        built = dict(self.conn.execute("SELECT dataset, signature FROM feature_builds").fetchall())
+
+        rebuilt = []
+        for dataset in datasets:
+            table = f"{dataset}_data"
+            signature = self.mirror.signature(dataset)
+            current = self._relation_type(table) == 'table' and (signature is None or built.get(dataset) == signature)
+            if current and not force:
+                continue
+
+            order_by, indexed = MATERIALISED_TABLES[dataset]
+            if self._relation_type(table) == 'view':
+                self.conn.execute(f"DROP VIEW {table}")
+            self.conn.execute(f"CREATE OR REPLACE TABLE {table} AS SELECT * FROM {dataset}_source ORDER BY {order_by}")
+            for column in indexed:
+                self.conn.execute(f"CREATE INDEX idx_{table}_{column} ON {table} ({column})")
+
+            row_count = self.conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+            self.conn.execute(
+                "INSERT OR REPLACE INTO feature_builds VALUES (?, ?, ?, now())",
+                [dataset, signature, row_count]
+            )
+            rebuilt.append(dataset)
+            logger.info(f"Materialised {table}: {row_count} rows")
+
+        if rebuilt:
+            self.clear_recent_features()
+
+        # Derived tables survive in the file unless their inputs were rebuilt
+        self._postcode_features_ready = (
+            self._relation_type('postcode_features') == 'table' and not {'imd', 'broadband', 'flood'} & set(rebuilt)
+        )
+        self._epc_addresses_ready = self._relation_type('epc_addresses') == 'table' and 'epc' not in rebuilt
+        return rebuilt
 
     def _create_views(self):
-        """Create views/tables from S3 Parquet files"""
+        """
+        Create `<dataset>_source` views over the feature Parquet files.
 
-        # EPC Data
+        In-memory mode the query-facing `<dataset>_data` relations are views
+        over them; in persistent mode they are materialised tables.
+        """
+        sources = {dataset: self._source(dataset) for dataset in FEATURE_DATASETS}
+
+        # EPC Data - the register keeps every certificate; serve the latest per UPRN
         self.conn.execute(f"""
-            CREATE OR REPLACE VIEW epc_data AS
+            CREATE OR REPLACE VIEW epc_source AS
             SELECT
                 uprn,
                 current_energy_rating AS epc_rating,
@@ -59,101 +349,327 @@ class S3FeatureStore:
                 potential_energy_rating AS epc_potential_rating,
                 co2_emissions_current AS epc_co2_emissions_current,
                 energy_consumption_current AS epc_energy_consumption_current,
-                postcode
-            FROM read_parquet('s3://{self.s3_bucket}/epc/*.parquet')
+                postcode,
+                concat_ws(', ', address1, address2, address3) AS address
+            FROM read_parquet('{sources['epc']}')
+            WHERE uprn IS NOT NULL
+            QUALIFY row_number() OVER (PARTITION BY uprn ORDER BY lodgement_date DESC NULLS LAST) = 1
         """)
 
         # IMD (deprivation index) - postcode level
         self.conn.execute(f"""
-            CREATE OR REPLACE VIEW imd_data AS
+            CREATE OR REPLACE VIEW imd_source AS
             SELECT
                 postcode,
                 imd_decile,
                 crime_score,
                 crime_percentile AS crime_rate_percentile
-            FROM read_parquet('s3://{self.s3_bucket}/imd/*.parquet')
+            FROM read_parquet('{sources['imd']}')
         """)
 
         # Flood risk - by UPRN or postcode
         self.conn.execute(f"""
-            CREATE OR REPLACE VIEW flood_data AS
+            CREATE OR REPLACE VIEW flood_source AS
             SELECT
                 uprn,
                 postcode,
                 flood_risk_level AS flood_risk
-            FROM read_parquet('s3://{self.s3_bucket}/flood/*.parquet')
+            FROM read_parquet('{sources['flood']}')
         """)
 
         # Broadband availability
         self.conn.execute(f"""
-            CREATE OR REPLACE VIEW broadband_data AS
+            CREATE OR REPLACE VIEW broadband_source AS
             SELECT
                 postcode,
                 max_download_speed_mbps
-            FROM read_parquet('s3://{self.s3_bucket}/broadband/*.parquet')
+            FROM read_parquet('{sources['broadband']}')
         """)
 
         # Planning applications (aggregated by UPRN)
         self.conn.execute(f"""
-            CREATE OR REPLACE VIEW planning_data AS
+            CREATE OR REPLACE VIEW planning_source AS
             SELECT
                 uprn,
                 COUNT(*) AS total_planning_apps,
                 SUM(CASE WHEN decision = 'Refused' THEN 1 ELSE 0 END) AS planning_refusals,
                 SUM(CASE WHEN application_date >= CURRENT_DATE - INTERVAL '5 years' THEN 1 ELSE 0 END) AS recent_planning_apps
-            FROM read_parquet('s3://{self.s3_bucket}/planning/*.parquet')
+            FROM read_parquet('{sources['planning']}')
             GROUP BY uprn
         """)
 
-    def get_property_features(self, uprn: int, postcode: str) -> Dict[str, Any]:
-        """
-        Get all feature data for a property.
+        if not self.persistent:
+            for dataset in FEATURE_DATASETS:
+                self.conn.execute(f"CREATE OR REPLACE VIEW {dataset}_data AS SELECT * FROM {dataset}_source")
 
-        Args:
-            uprn: Unique Property Reference Number
-            postcode: Property postcode
+    def _ensure_postcode_features(self):
+        if not self._postcode_features_ready:
+            with self._write_lock:
+                if not self._postcode_features_ready:
+                    self.refresh_postcode_features()
 
-        Returns:
-            Dictionary of feature values
+    def _ensure_epc_addresses(self):
+        if not self._epc_addresses_ready:
+            with self._write_lock:
+                if not self._epc_addresses_ready:
+                    self.refresh_epc_addresses()
+
+    def refresh_postcode_features(self):
         """
-        query = f"""
+        Materialise postcode-level features into `postcode_features`.
+
+        One row per postcode: IMD decile and crime percentile from the IMD
+        data, the best available broadband speed and the worst flood risk
+        recorded in the postcode (the fallback for UPRNs without their own).
+        Call again after the feature files are refreshed.
+        """
+        with self._write_lock:
+            self._refresh_postcode_features()
+
+    def _refresh_postcode_features(self):
+        self.conn.execute(f"""
+            CREATE OR REPLACE TABLE postcode_features AS
             SELECT
-                -- EPC
-                epc.epc_rating,
-                epc.epc_score,
-                epc.epc_potential_rating,
-                epc.epc_co2_emissions_current,
-                epc.epc_energy_consumption_current,
-
-                -- Area quality
+                postcode,
                 imd.imd_decile,
                 imd.crime_rate_percentile,
+                bb.max_download_speed_mbps,
+                flood.postcode_flood_risk
+            FROM (
+                SELECT postcode FROM imd_data
+                UNION
+                SELECT postcode FROM broadband_data
+                UNION
+                SELECT postcode FROM flood_data
+            ) AS pc
+            LEFT JOIN (
+                SELECT
+                    postcode,
+                    FIRST(imd_decile) AS imd_decile,
+                    FIRST(crime_rate_percentile) AS crime_rate_percentile
+                FROM imd_data
+                GROUP BY postcode
+            ) AS imd USING (postcode)
+            LEFT JOIN (
+                SELECT postcode, MAX(max_download_speed_mbps) AS max_download_speed_mbps
+                FROM broadband_data
+                GROUP BY postcode
+            ) AS bb USING (postcode)
+            LEFT JOIN (
+                SELECT postcode, arg_max(flood_risk, {_FLOOD_RISK_RANK_SQL}) AS postcode_flood_risk
+                FROM flood_data
+                WHERE flood_risk IS NOT NULL
+                GROUP BY postcode
+            ) AS flood USING (postcode)
+            WHERE postcode IS NOT NULL
+            ORDER BY postcode
+        """)
+        self.conn.execute("CREATE UNIQUE INDEX idx_postcode_features_postcode ON postcode_features (postcode)")
+        self._postcode_features_ready = True
+        self.clear_recent_features()
 
-                -- Flood
-                flood.flood_risk,
+    def refresh_epc_addresses(self):
+        """
+        Materialise the EPC register's distinct (UPRN, address) pairs into
+        `epc_addresses`, keyed by space-free postcode, with the normalised
+        address's tokens and its numbers (building and flat). Call again
+        after the feature files are refreshed.
+        """
+        with self._write_lock:
+            self._refresh_epc_addresses()
 
-                -- Broadband
-                bb.max_download_speed_mbps,
+    def _refresh_epc_addresses(self):
+        self.conn.execute(f"""
+            CREATE OR REPLACE TABLE epc_addresses AS
+            SELECT DISTINCT
+                uprn,
+                postcode_key,
+                list_distinct(string_split(normalised, ' ')) AS tokens,
+                list_sort(list_distinct(regexp_extract_all(normalised, '\\b\\d+[a-z]?\\b'))) AS numbers
+            FROM (
+                SELECT uprn, upper(replace(postcode, ' ', '')) AS postcode_key, {_NORMALISE_SQL} AS normalised
+                FROM epc_data
+                WHERE uprn IS NOT NULL AND postcode IS NOT NULL AND address IS NOT NULL
+            )
+            WHERE normalised <> ''
+            ORDER BY postcode_key
+        """)
+        self.conn.execute("CREATE INDEX idx_epc_addresses_postcode ON epc_addresses (postcode_key)")
+        self._epc_addresses_ready = True
+
+    def resolve_uprns(
+        self,
+        addresses: List[Tuple[str, str]],
+        threshold: float = EPC_TOKEN_COVERAGE_THRESHOLD
+    ) -> List[Optional[Tuple[int, float]]]:
+        """
+        Resolve a batch of addresses to UPRNs via the EPC register, in one query.
 
-                -- Planning
-                COALESCE(planning.recent_planning_apps, 0) AS recent_planning_apps,
-                COALESCE(planning.planning_refusals, 0) AS planning_refusals
+        An EPC address is a candidate when it is in the same postcode, has
+        exactly the same numbers (so flat 3 never resolves to flat 4 or to the
+        whole building), and at least `threshold` of its tokens appear in the
+        scraped address. Addresses whose best score is shared by more than
+        one UPRN are left unresolved.
 
-            FROM (SELECT '{postcode}' AS postcode, {uprn} AS uprn) AS prop
-            LEFT JOIN epc_data epc ON epc.uprn = prop.uprn
-            LEFT JOIN imd_data imd ON imd.postcode = prop.postcode
-            LEFT JOIN flood_data flood ON flood.uprn = prop.uprn OR flood.postcode = prop.postcode
-            LEFT JOIN broadband_data bb ON bb.postcode = prop.postcode
-            LEFT JOIN planning_data planning ON planning.uprn = prop.uprn
+        Args:
+            addresses: (postcode without spaces, normalised address) pairs
+            threshold: Minimum token coverage (0-1)
+
+        Returns:
+            (uprn, coverage) or None per address, in input order
+        """
+        resolved: List[Optional[Tuple[int, float]]] = [None] * len(addresses)
+        if not addresses:
+            return resolved
+
+        self._ensure_epc_addresses()
+
+        with self.pool.cursor() as cur:
+            rows = cur.execute("""
+                WITH batch AS (
+                    SELECT
+                        idx,
+                        postcode_key,
+                        list_distinct(string_split(normalised, ' ')) AS tokens,
+                        list_sort(list_distinct(regexp_extract_all(normalised, '\\b\\d+[a-z]?\\b'))) AS numbers
+                    FROM (
+                        SELECT
+                            UNNEST(?::INTEGER[]) AS idx,
+                            UNNEST(?::VARCHAR[]) AS postcode_key,
+                            UNNEST(?::VARCHAR[]) AS normalised
+                    )
+                ),
+                scored AS (
+                    SELECT
+                        batch.idx,
+                        epc.uprn,
+                        len(list_intersect(batch.tokens, epc.tokens)) / len(epc.tokens) AS coverage
+                    FROM batch
+                    JOIN epc_addresses epc
+                        ON epc.postcode_key = batch.postcode_key AND epc.numbers = batch.numbers
+                ),
+                best AS (
+                    SELECT idx, uprn, coverage
+                    FROM scored
+                    WHERE coverage >= ?
+                    QUALIFY rank() OVER (PARTITION BY idx ORDER BY coverage DESC) = 1
+                )
+                SELECT idx, MIN(uprn), MAX(coverage)
+                FROM best
+                GROUP BY idx
+                HAVING COUNT(DISTINCT uprn) = 1
+            """, [
+                list(range(len(addresses))),
+                [postcode for postcode, _ in addresses],
+                [normalised for _, normalised in addresses],
+                threshold,
+            ]).fetchall()
+
+        for idx, uprn, coverage in rows:
+            resolved[idx] = (uprn, coverage)
+        return resolved
+
+    def get_property_features(self, uprn: int, postcode: str) -> Dict[str, Any]:
         """
+        Get all feature data for a property.
 
-        result = self.conn.execute(query).fetchone()
+        One parameterised query (no SQL built per call, so quotes in a
+        postcode are harmless); the most recent results are kept in an LRU
+        keyed by (uprn, postcode) and cleared whenever feature tables change.
+
+        Args:
+            uprn: Unique Property Reference Number
+            postcode: Property postcode
+
+        Returns:
+            Dictionary of feature values
+        """
+        self._ensure_postcode_features()
+
+        key = (uprn, postcode)
+        with self._recent_lock:
+            cached = self._recent.get(key)
+            if cached is not None:
+                self._recent.move_to_end(key)
+                self.recent_hits += 1
+                return dict(cached)
+            self.recent_misses += 1
+            generation = self._recent_generation
+
+        with self.pool.cursor() as cur:
+            result = cur.execute(_PROPERTY_FEATURES_SQL, [uprn, postcode]).fetchone()
+            columns = [desc[0] for desc in cur.description]
 
         if not result:
             return {}
+        features = dict(zip(columns, result))
+
+        with self._recent_lock:
+            # Don't cache a result computed before the tables changed
+            if generation == self._recent_generation:
+                self._recent[key] = features
+                while len(self._recent) > self.recent_size:
+                    self._recent.popitem(last=False)
+        return dict(features)
+
+    def clear_recent_features(self):
+        """Drop the recent-lookup cache (after any feature data changes)"""
+        with self._recent_lock:
+            self._recent.clear()
+            self._recent_generation += 1
+
+    def get_batch_feature_table(self, properties) -> pa.Table:
+        """
+        Get features for multiple properties as an Arrow table.
+
+        The input is registered with DuckDB as a relation (zero-copy for Arrow
+        tables and DataFrames) and joined in one query; the result comes back
+        as Arrow columns.
+
+        Args:
+            properties: Arrow table, DataFrame or list of dicts with
+                'property_id', 'uprn' and 'postcode' columns
 
-        columns = [desc[0] for desc in self.conn.description]
-        return dict(zip(columns, result))
+        Returns:
+            Arrow table: property_id, uprn and the feature columns
+        """
+        if isinstance(properties, list):
+            properties = pa.Table.from_pylist(properties, schema=BATCH_INPUT_SCHEMA)
+
+        self._ensure_postcode_features()
+
+        # Registered on the borrowed cursor, so concurrent batches don't collide
+        with self.pool.cursor() as cur:
+            cur.register('batch_properties', properties)
+            try:
+                return cur.execute(f"""
+                    SELECT
+                        prop.property_id,
+                        prop.uprn,
+                        epc.epc_rating,
+                        epc.epc_score,
+                        epc.epc_potential_rating,
+                        epc.epc_co2_emissions_current,
+                        epc.epc_energy_consumption_current,
+                        pf.imd_decile,
+                        pf.crime_rate_percentile,
+                        COALESCE(flood.flood_risk, pf.postcode_flood_risk) AS flood_risk,
+                        pf.max_download_speed_mbps,
+                        COALESCE(planning.recent_planning_apps, 0) AS recent_planning_apps,
+                        COALESCE(planning.planning_refusals, 0) AS planning_refusals
+                    FROM batch_properties prop
+                    LEFT JOIN epc_data epc ON epc.uprn = prop.uprn
+                    LEFT JOIN (
+                        SELECT uprn, arg_max(flood_risk, {_FLOOD_RISK_RANK_SQL}) AS flood_risk
+                        FROM flood_data
+                        WHERE uprn IN (SELECT uprn FROM batch_properties) AND flood_risk IS NOT NULL
+                        GROUP BY uprn
+                    ) flood ON flood.uprn = prop.uprn
+                    LEFT JOIN planning_data planning ON planning.uprn = prop.uprn
+                    LEFT JOIN postcode_features pf ON pf.postcode = prop.postcode
+                """).fetch_arrow_table()
+            finally:
+                cur.unregister('batch_properties')
 
     def get_batch_features(self, properties: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """
@@ -163,68 +679,108 @@ class S3FeatureStore:
             properties: List of dicts with 'uprn' and 'postcode' keys
 
         Returns:
-            List of feature dictionaries
+            List of feature dictionaries (see get_batch_feature_table for the
+            columnar form)
         """
         if not properties:
             return []
+        return self.get_batch_feature_table(properties).to_pylist()
 
-        # Create temp table with properties
-        self.conn.execute("DROP TABLE IF EXISTS temp_properties")
-        self.conn.execute("""
-            CREATE TEMP TABLE temp_properties (
-                property_id BIGINT,
-                uprn BIGINT,
-                postcode VARCHAR(10)
-            )
-        """)
+    def close(self):
+        """Close the cursors and the DuckDB connection"""
+        self.pool.close()
+        self.conn.close()
 
-        # Insert properties
-        for prop in properties:
-            self.conn.execute("""
-                INSERT INTO temp_properties VALUES (?, ?, ?)
-            """, [prop['property_id'], prop['uprn'], prop['postcode']])
 
-        # Batch query
-        query = """
-            SELECT
-                prop.property_id,
-                prop.uprn,
-                epc.epc_rating,
-                epc.epc_score,
-                epc.epc_potential_rating,
-                epc.epc_co2_emissions_current,
-                epc.epc_energy_consumption_current,
-                imd.imd_decile,
-                imd.crime_rate_percentile,
-                flood.flood_risk,
-                bb.max_download_speed_mbps,
-                COALESCE(planning.recent_planning_apps, 0) AS recent_planning_apps,
-                COALESCE(planning.planning_refusals, 0) AS planning_refusals
-            FROM temp_properties prop
-            LEFT JOIN epc_data epc ON epc.uprn = prop.uprn
-            LEFT JOIN imd_data imd ON imd.postcode = prop.postcode
-            LEFT JOIN flood_data flood ON flood.uprn = prop.uprn OR flood.postcode = prop.postcode
-            LEFT JOIN broadband_data bb ON bb.postcode = prop.postcode
-            LEFT JOIN planning_data planning ON planning.uprn = prop.uprn
-        """
+def current_snapshot_version() -> str:
+    """Feature snapshot version this deployment serves (env FEATURE_SNAPSHOT_VERSION)"""
+    return os.getenv("FEATURE_SNAPSHOT_VERSION", "1")
 
-        results = self.conn.execute(query).fetchall()
-        columns = [desc[0] for desc in self.conn.description]
 
-        return [dict(zip(columns, row)) for row in results]
+def _remove_database_files(path: str):
+    for file_path in (path, f"{path}.wal"):
+        if os.path.exists(file_path):
+            os.remove(file_path)
 
-    def close(self):
-        """Close the DuckDB connection"""
-        self.conn.close()
+
+def build_feature_database(
+    db_path: str,
+    datasets: Iterable[str] = FEATURE_DATASETS,
+    force: bool = False,
+    cache_dir: str = None,
+    s3_bucket: str = None
+) -> List[str]:
+    """
+    Build or refresh the feature database that serving processes open read-only.
+
+    The current file is copied to a temporary path, changed datasets and the
+    derived tables are rebuilt in the copy, and the copy is renamed over
+    db_path. Readers never see a half-built file, and processes that already
+    have the old file open keep reading it until they reopen.
+
+    Args:
+        db_path: Feature database file
+        datasets: Datasets to bring up to date
+        force: Rebuild even if unchanged
+        cache_dir: Local mirror of the feature files (env FEATURE_CACHE_DIR)
+        s3_bucket: S3 bucket for datasets that aren't mirrored
+
+    Returns:
+        Datasets that were rebuilt (the file is left untouched when all are current)
+    """
+    tmp_path = f"{db_path}.build-{os.getpid()}"
+    _remove_database_files(tmp_path)
+    exists = os.path.exists(db_path)
+
+    try:
+        if exists:
+            shutil.copyfile(db_path, tmp_path)
+
+        store = S3FeatureStore(db_path=tmp_path, s3_bucket=s3_bucket, cache_dir=cache_dir, read_only=False)
+        try:
+            rebuilt = store.materialise_features(datasets, force=force)
+            derived_current = store._postcode_features_ready and store._epc_addresses_ready
+            store._ensure_postcode_features()
+            store._ensure_epc_addresses()
+        finally:
+            store.close()
+
+        if exists and not rebuilt and derived_current:
+            _remove_database_files(tmp_path)
+            return []
+
+        os.replace(tmp_path, db_path)
+    except BaseException:
+        _remove_database_files(tmp_path)
+        raise
+
+    logger.info(f"Feature database {db_path} rebuilt: {', '.join(rebuilt) or 'derived tables'}")
+    return rebuilt
 
 
 # Singleton instance
 _feature_store: Optional[S3FeatureStore] = None
+_feature_store_lock = threading.Lock()
 
 
 def get_feature_store() -> S3FeatureStore:
     """Get or create the global feature store instance"""
     global _feature_store
     if _feature_store is None:
-        _feature_store = S3FeatureStore()
+        with _feature_store_lock:
+            if _feature_store is None:
+                _feature_store = S3FeatureStore()
     return _feature_store
+
+
+def reset_feature_store():
+    """
+    Close and drop the global store so the next call reopens the feature
+    database. Callers must not be mid-lookup on the old store (the
+    enrichment daemon resets between batches).
+    """
+    global _feature_store
+    with _feature_store_lock:
+        store, _feature_store = _feature_store, None
+    if store is not None:
+        store.close()
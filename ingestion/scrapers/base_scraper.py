@@ -58,6 +58,8 @@ class RawListing:
         tenure: Optional[str] = None,
         image_urls: Optional[List[str]] = None,
         listed_date: Optional[date] = None,
+        latitude: Optional[float] = None,
+        longitude: Optional[float] = None,
     ):
         self.external_listing_id = external_listing_id
         self.listing_url = listing_url
@@ -73,6 +75,8 @@ class RawListing:
         self.tenure = tenure
         self.image_urls = image_urls or []
         self.listed_date = listed_date
+        self.latitude = latitude
+        self.longitude = longitude
 
     def to_dict(self) -> Dict[str, Any]:
         """Convert to dictionary for database insertion"""
@@ -88,6 +92,10 @@ class RawListing:
             'property_type': self.property_type,
             'raw_address': self.raw_address,
             'postcode': self.postcode,
+            'location': (
+                f'SRID=4326;POINT({self.longitude} {self.latitude})'
+                if self.latitude is not None and self.longitude is not None else None
+            ),
             'tenure': self.tenure,
             'image_urls': self.image_urls,
             'listed_date': self.listed_date,
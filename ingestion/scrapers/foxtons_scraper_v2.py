@@ -121,6 +121,11 @@ class FoxtonsScraper(BaseScraper):
             # For now, we don't have postcode in this JSON
             postcode = None
 
+        # Map pin - lets listings without a postcode be matched spatially
+        coordinates = prop.get('location') or {}
+        latitude = coordinates.get('lat')
+        longitude = coordinates.get('lon')
+
         # Bedrooms & Bathrooms
         bedrooms = prop.get('bedrooms')
         bathrooms = prop.get('bathrooms')
@@ -154,7 +159,9 @@ class FoxtonsScraper(BaseScraper):
             postcode=postcode,
             tenure=tenure,
             image_urls=image_urls,
-            listed_date=None  # Not in JSON
+            listed_date=None,  # Not in JSON
+            latitude=latitude,
+            longitude=longitude
         )
 
         return listing
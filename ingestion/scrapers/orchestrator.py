@@ -8,6 +8,7 @@ from sqlalchemy.orm import Session
 from sqlalchemy.dialects.postgresql import insert
 
 from api.models.database import ListingRaw, Agent
+from matching.matchers.batch_matcher import match_unmatched_listings
 from .example_agent_scraper import get_scraper_configs, create_scraper
 from .base_scraper import RawListing
 
@@ -34,7 +35,8 @@ class ScraperOrchestrator:
             'failed_agents': 0,
             'total_listings_scraped': 0,
             'total_listings_new': 0,
-            'total_listings_updated': 0
+            'total_listings_updated': 0,
+            'total_listings_matched': 0
         }
 
         for config in configs:
@@ -44,6 +46,7 @@ class ScraperOrchestrator:
                 stats['total_listings_scraped'] += agent_stats['scraped']
                 stats['total_listings_new'] += agent_stats['new']
                 stats['total_listings_updated'] += agent_stats['updated']
+                stats['total_listings_matched'] += agent_stats['matched']
 
             except Exception as e:
                 logger.error(f"Failed to scrape {config.agent_name}: {e}", exc_info=True)
@@ -79,15 +82,19 @@ class ScraperOrchestrator:
             })
             self.db.commit()
 
+            # Match unmatched listings now; unchanged addresses come from the match cache
+            match_stats = match_unmatched_listings(self.db, agent_id=config.agent_id)
+
             logger.info(
                 f"Agent {config.agent_name}: scraped={len(listings)}, "
-                f"new={stats['new']}, updated={stats['updated']}"
+                f"new={stats['new']}, updated={stats['updated']}, matched={match_stats['matched']}"
             )
 
             return {
                 'scraped': len(listings),
                 'new': stats['new'],
-                'updated': stats['updated']
+                'updated': stats['updated'],
+                'matched': match_stats['matched']
             }
 
         finally:
@@ -125,6 +132,7 @@ class ScraperOrchestrator:
                     'property_type': stmt.excluded.property_type,
                     'raw_address': stmt.excluded.raw_address,
                     'postcode': stmt.excluded.postcode,
+                    'location': stmt.excluded.location,
                     'tenure': stmt.excluded.tenure,
                     'image_urls': stmt.excluded.image_urls,
                     'status': stmt.excluded.status,
@@ -11,6 +11,7 @@ from sqlalchemy.dialects.postgresql import insert
 
 from api.models.database import ListingRaw, Agent
 from ingestion.storage.s3_storage import get_storage_manager
+from matching.matchers.batch_matcher import match_unmatched_listings
 from .foxtons_scraper import create_foxtons_scraper
 from .base_scraper import RawListing
 
@@ -38,6 +39,7 @@ class EnhancedScraperOrchestrator:
             'total_listings_scraped': 0,
             'total_listings_new': 0,
             'total_listings_updated': 0,
+            'total_listings_matched': 0,
             'total_images_uploaded': 0
         }
 
@@ -52,6 +54,7 @@ class EnhancedScraperOrchestrator:
                 stats['total_listings_scraped'] += agent_stats['scraped']
                 stats['total_listings_new'] += agent_stats['new']
                 stats['total_listings_updated'] += agent_stats['updated']
+                stats['total_listings_matched'] += agent_stats['matched']
                 stats['total_images_uploaded'] += agent_stats['images_uploaded']
 
             except Exception as e:
@@ -89,16 +92,20 @@ class EnhancedScraperOrchestrator:
             agent.last_scraped_at = datetime.utcnow()
             self.db.commit()
 
+            # Match unmatched listings now; unchanged addresses come from the match cache
+            match_stats = match_unmatched_listings(self.db, agent_id=agent.agent_id)
+
             logger.info(
                 f"Agent {agent.name}: scraped={len(listings)}, "
                 f"new={stats['new']}, updated={stats['updated']}, "
-                f"images={stats['images_uploaded']}"
+                f"matched={match_stats['matched']}, images={stats['images_uploaded']}"
             )
 
             return {
                 'scraped': len(listings),
                 'new': stats['new'],
                 'updated': stats['updated'],
+                'matched': match_stats['matched'],
                 'images_uploaded': stats['images_uploaded']
             }
 
@@ -257,6 +264,7 @@ if __name__ == "__main__":
         print(f"Total listings: {stats['total_listings_scraped']}")
         print(f"New listings: {stats['total_listings_new']}")
         print(f"Updated listings: {stats['total_listings_updated']}")
+        print(f"Matched listings: {stats['total_listings_matched']}")
         print(f"Images uploaded to S3: {stats['total_images_uploaded']}")
         print("="*50)
 
@@ -0,0 +1,393 @@
+"""
+Address matching benchmark and accuracy harness.
+
+Generates a synthetic property universe (in the unused 'ZZ' postcode area)
+and agent-style variants of its addresses: exact, abbreviated street types,
+flats in converted buildings (each flat its own UPRN, so matching the
+right building but the wrong flat scores as wrong), named buildings,
+missing postcodes (map pin only), and addresses that must NOT match
+(number dropped, number not on the street).
+Each matcher runs against a local Postgres inside a savepoint that is rolled
+back, so the database is left as it was.
+
+Reported per matcher: matches/sec, SQL statements issued, precision per
+match method, recall per variant kind and overall precision/recall. Run it
+with `cli.py bench-match` before changing thresholds or normalisation; the
+command exits non-zero below --min-precision / --min-recall.
+
+`cli.py bench-avm` times batch AVM valuation against a synthetic comparables
+index the same way (in memory, no database), exiting non-zero below
+--min-rate valuations per second.
+"""
+import time
+import random
+import logging
+from collections import defaultdict
+from datetime import date
+from decimal import Decimal
+from typing import Dict, Any, List, Optional, NamedTuple, Callable, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from sqlalchemy.dialects.postgresql import insert
+
+from api.models.database import Property
+from enrichment.avm import AVMEngine, SOLD
+from matching.normaliser import parse_address
+from matching.candidate_cache import get_candidate_cache, invalidate_candidate_postcodes
+from matching.matchers.address_matcher import AddressMatcher
+from matching.matchers.batch_matcher import BatchAddressMatcher
+
+logger = logging.getLogger(__name__)
+
+# Synthetic UPRNs start here (real UPRNs are at most 12 digits)
+SYNTHETIC_UPRN_BASE = 900_000_000_000_000
+
+STREET_NAMES = (
+    'Acacia', 'Albert', 'Alexandra', 'Beech', 'Church', 'Elm', 'Grange', 'Highfield',
+    'Kings', 'Manor', 'Mill', 'Oak', 'Park', 'Queens', 'Station', 'Victoria', 'Willow', 'York',
+)
+STREET_TYPES = {
+    'Road': 'Rd', 'Street': 'St', 'Avenue': 'Ave', 'Lane': 'Ln', 'Drive': 'Dr', 'Close': 'Cl',
+}
+BUILDING_NAMES = (
+    'Rose Cottage', 'The Old Bakery', 'Ivy House', 'The Coach House', 'Orchard Lodge',
+    'The Old Rectory', 'Hillside', 'Meadow View',
+)
+LOCALITIES = ('Hampstead', 'Camden', 'Islington', 'Hackney', 'Clapham', 'Fulham')
+
+# Share of numbered buildings split into flats, and flats per such building
+FLAT_BUILDING_SHARE = 0.25
+MAX_FLATS_PER_BUILDING = 4
+
+# Variant kinds whose expected answer is "no match"
+NEGATIVE_KINDS = ('missing_number', 'decoy')
+
+MatchResult = Optional[Tuple[int, Decimal, str]]
+
+# Matcher entry point: (session, cases) -> match result (or None) per case
+MatcherRun = Callable[[Session, List['BenchmarkCase']], List[MatchResult]]
+
+
+class BenchmarkCase(NamedTuple):
+    """An agent-style address and the property it should match (None = no match)"""
+    kind: str
+    raw_address: str
+    postcode: Optional[str]
+    latitude: float
+    longitude: float
+    expected_uprn: Optional[int]
+
+
+def generate_universe(postcodes: int = 200, per_postcode: int = 15, seed: int = 0) -> List[Dict[str, Any]]:
+    """
+    Synthetic properties: each postcode is a run of one street, some named,
+    some numbers converted into flats (one property per flat).
+
+    Returns:
+        properties column values (location as EWKT)
+    """
+    rng = random.Random(seed)
+    properties = []
+    for pc in range(postcodes):
+        street_type = list(STREET_TYPES)[pc // len(STREET_NAMES) % len(STREET_TYPES)]
+        street = f"{STREET_NAMES[pc % len(STREET_NAMES)]} {street_type}"
+        locality = LOCALITIES[pc // len(STREET_NAMES) % len(LOCALITIES)]
+        postcode = f"ZZ{pc // 100 + 1}{pc // 10 % 10}{chr(65 + pc % 10)}A"
+        # Postcodes ~1km apart on a grid, properties ~10m apart along the street
+        base_lat = 51.40 + (pc // 30) * 0.009
+        base_lon = -0.30 + (pc % 30) * 0.014
+        names = rng.sample(BUILDING_NAMES, len(BUILDING_NAMES))
+
+        for i in range(per_postcode):
+            named = bool(names) and rng.random() < 0.2
+            building_name = names.pop() if named else None
+            building_number = None if named else str(2 * i + 1)
+            first = building_name + ', ' if named else building_number + ' '
+
+            flats = [None]
+            if not named and rng.random() < FLAT_BUILDING_SHARE:
+                flats = [f"Flat {flat}, " for flat in range(1, rng.randint(2, MAX_FLATS_PER_BUILDING) + 1)]
+
+            for flat in flats:
+                address = f"{flat or ''}{first}{street}, {locality}"
+                properties.append({
+                    'uprn': SYNTHETIC_UPRN_BASE + len(properties),
+                    'building_name': building_name,
+                    'building_number': building_number,
+                    'street': street,
+                    'locality': locality,
+                    'town_city': 'London',
+                    'postcode': postcode,
+                    'property_type': 'flat' if flat else None,
+                    'address_normalised': parse_address(address).normalised,
+                    'location': f'SRID=4326;POINT({base_lon + i * 0.00015} {base_lat})',
+                })
+    return properties
+
+
+def _point(prop: Dict[str, Any]):
+    lon, lat = prop['location'].split('(')[1].rstrip(')').split()
+    return float(lat), float(lon)
+
+
+def generate_cases(properties: List[Dict[str, Any]], cases: int = 2000, seed: int = 0) -> List[BenchmarkCase]:
+    """
+    Agent-style address variants of sampled properties.
+
+    Returns:
+        BenchmarkCase list mixing matchable and must-not-match addresses
+    """
+    rng = random.Random(seed)
+    result = []
+    for _ in range(cases):
+        prop = rng.choice(properties)
+        street, locality = prop['street'], prop['locality']
+        postcode = prop['postcode']
+        spaced = f"{postcode[:-3]} {postcode[-3:]}"
+        lat, lon = _point(prop)
+        # Agents' pins are typically within a few tens of metres
+        lat += rng.uniform(-0.0002, 0.0002)
+        lon += rng.uniform(-0.0002, 0.0002)
+
+        if prop['building_name']:
+            kind = rng.choice(('named', 'named', 'no_postcode'))
+            address = f"{prop['building_name']}, {street}, {locality}"
+        elif prop['property_type'] == 'flat':
+            # The flat's own UPRN is expected, not any flat in its building
+            kind = 'flat'
+            flat = parse_address(prop['address_normalised']).sub_building.title()
+            address = f"{flat}, {prop['building_number']} {street}, {locality}"
+        else:
+            kind = rng.choice(('exact', 'abbreviated', 'no_postcode', 'missing_number', 'decoy'))
+            number = prop['building_number']
+            address = f"{number} {street}, {locality}"
+            if kind == 'abbreviated':
+                name, street_type = street.rsplit(' ', 1)
+                address = f"{number} {name} {STREET_TYPES[street_type]}., {locality}".upper()
+            elif kind == 'missing_number':
+                address = f"{street}, {locality}"
+            elif kind == 'decoy':
+                address = f"{rng.randint(500, 900)} {street}, {locality}"
+
+        expected = None if kind in NEGATIVE_KINDS else prop['uprn']
+        result.append(BenchmarkCase(
+            kind, address, None if kind == 'no_postcode' else spaced, lat, lon, expected
+        ))
+    return result
+
+
+def load_universe(db: Session, properties: List[Dict[str, Any]]) -> Dict[int, int]:
+    """
+    Insert the synthetic properties (in the caller's transaction).
+
+    Returns:
+        Mapping of property_id -> uprn
+    """
+    uprns = {}
+    for start in range(0, len(properties), 1000):
+        rows = db.execute(
+            insert(Property).values(properties[start:start + 1000]).returning(Property.property_id, Property.uprn)
+        ).all()
+        uprns.update(dict(rows))
+    invalidate_candidate_postcodes({prop['postcode'] for prop in properties})
+    return uprns
+
+
+def run_single_matcher(db: Session, cases: List[BenchmarkCase]) -> List[MatchResult]:
+    """AddressMatcher, one address at a time"""
+    matcher = AddressMatcher(db)
+    return [
+        matcher.match(case.raw_address, case.postcode, latitude=case.latitude, longitude=case.longitude)
+        for case in cases
+    ]
+
+
+def run_batch_matcher(db: Session, cases: List[BenchmarkCase]) -> List[MatchResult]:
+    """BatchAddressMatcher, all addresses in one batch"""
+    matcher = BatchAddressMatcher(db)
+    matches = matcher.match_addresses([
+        (i, case.raw_address, case.postcode) for i, case in enumerate(cases) if case.postcode
+    ])
+    matches.update(matcher.match_locations([
+        (i, case.raw_address, case.latitude, case.longitude) for i, case in enumerate(cases) if not case.postcode
+    ]))
+    return [matches.get(i) for i in range(len(cases))]
+
+
+MATCHERS: Dict[str, MatcherRun] = {
+    'address_matcher': run_single_matcher,
+    'batch_matcher': run_batch_matcher,
+}
+
+
+def score_results(
+    cases: List[BenchmarkCase],
+    results: List[MatchResult],
+    uprns: Dict[int, int]
+) -> Dict[str, Any]:
+    """
+    Precision per match method, recall per variant kind, overall precision/recall.
+
+    A prediction is correct when it resolves to the expected UPRN; any match
+    for a must-not-match case is a false positive.
+    """
+    by_method = defaultdict(lambda: {'predicted': 0, 'correct': 0})
+    by_kind = defaultdict(lambda: {'cases': 0, 'correct': 0})
+    predicted = correct = matchable = 0
+
+    for case, result in zip(cases, results):
+        hit = result is not None and uprns.get(result[0]) == case.expected_uprn
+        by_kind[case.kind]['cases'] += 1
+        by_kind[case.kind]['correct'] += hit if result is not None else case.expected_uprn is None
+        matchable += case.expected_uprn is not None
+        if result is not None:
+            predicted += 1
+            correct += hit
+            by_method[result[2]]['predicted'] += 1
+            by_method[result[2]]['correct'] += hit
+
+    return {
+        'precision': correct / predicted if predicted else 1.0,
+        'recall': correct / matchable if matchable else 1.0,
+        'by_method': {
+            method: {**counts, 'precision': counts['correct'] / counts['predicted']}
+            for method, counts in sorted(by_method.items())
+        },
+        'by_kind': {
+            kind: {**counts, 'rate': counts['correct'] / counts['cases']}
+            for kind, counts in sorted(by_kind.items())
+        },
+    }
+
+
+def run_benchmark(
+    db: Session,
+    postcodes: int = 200,
+    per_postcode: int = 15,
+    cases: int = 2000,
+    seed: int = 0,
+    matchers: Optional[List[str]] = None
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Load a synthetic universe, run each matcher on the same cases, roll back.
+
+    Args:
+        db: Session on a local (disposable) Postgres with schema.sql applied
+        postcodes: Synthetic postcodes to generate
+        per_postcode: Properties per postcode
+        cases: Address variants to match
+        seed: Random seed (same seed, same universe and cases)
+        matchers: Names from MATCHERS to run (default: all)
+
+    Returns:
+        Report per matcher: elapsed_s, matches_per_s, queries, queries_per_case
+        and the score_results metrics
+    """
+    properties = generate_universe(postcodes, per_postcode, seed)
+    bench_cases = generate_cases(properties, cases, seed)
+    report = {}
+
+    try:
+        uprns = load_universe(db, properties)
+        db.flush()
+        logger.info(f"Loaded {len(uprns)} synthetic properties, {len(bench_cases)} cases")
+
+        for name in matchers or list(MATCHERS):
+            # Each matcher starts cold: no cached candidates or match results
+            get_candidate_cache().invalidate()
+            savepoint = db.begin_nested()
+
+            queries = [0]
+
+            def count(*_args):
+                queries[0] += 1
+
+            bind = db.connection()
+            event.listen(bind, 'before_cursor_execute', count)
+            try:
+                start = time.perf_counter()
+                results = MATCHERS[name](db, bench_cases)
+                elapsed = time.perf_counter() - start
+            finally:
+                event.remove(bind, 'before_cursor_execute', count)
+                savepoint.rollback()
+
+            report[name] = {
+                'elapsed_s': elapsed,
+                'matches_per_s': len(bench_cases) / elapsed if elapsed else 0.0,
+                'queries': queries[0],
+                'queries_per_case': queries[0] / len(bench_cases),
+                **score_results(bench_cases, results, uprns),
+            }
+            logger.info(
+                f"{name}: {report[name]['matches_per_s']:.0f} matches/s, "
+                f"precision {report[name]['precision']:.3f}, recall {report[name]['recall']:.3f}"
+            )
+    finally:
+        db.rollback()
+        get_candidate_cache().invalidate()
+
+    return report
+
+
+# Valuation date of the AVM benchmark (comparables are dated relative to it)
+AVM_BENCHMARK_AS_OF = date(2024, 6, 1)
+
+
+def generate_avm_inputs(
+    comparables: int = 50_000,
+    subjects: int = 5_000,
+    districts: int = 20,
+    seed: int = 1
+) -> Tuple[List[Tuple], List[Dict[str, Any]]]:
+    """
+    Synthetic AVM comparables and subjects spread over inner-London districts.
+
+    Returns:
+        (comparable rows as AVMEngine takes them, subject dicts for value_batch)
+    """
+    rng = random.Random(seed)
+    names = [f"E{i}" for i in range(1, districts + 1)]
+
+    rows = [
+        (i, f"{rng.choice(names)} 1AA", rng.choice(['flat', 'terraced']),
+         51.5 + rng.uniform(-0.05, 0.05), -0.1 + rng.uniform(-0.05, 0.05),
+         rng.uniform(200_000, 2_000_000), rng.randint(1, 5), date(2024, 1, 1), SOLD)
+        for i in range(1, comparables + 1)
+    ]
+    subject_dicts = [
+        {'property_id': None, 'postcode': f"{rng.choice(names)} 2BB", 'property_type': 'flat',
+         'bedrooms': rng.randint(1, 5), 'latitude': 51.5 + rng.uniform(-0.05, 0.05),
+         'longitude': -0.1 + rng.uniform(-0.05, 0.05)}
+        for _ in range(subjects)
+    ]
+    return rows, subject_dicts
+
+
+def run_avm_benchmark(comparables: int = 50_000, subjects: int = 5_000, seed: int = 1) -> Dict[str, Any]:
+    """
+    Time one value_batch call over synthetic comparables.
+
+    Returns:
+        Report with index_s (building the engine), elapsed_s, valuations_per_s
+        and valued (subjects that got an estimate)
+    """
+    rows, subject_dicts = generate_avm_inputs(comparables, subjects, seed=seed)
+
+    start = time.perf_counter()
+    engine = AVMEngine(rows, as_of=AVM_BENCHMARK_AS_OF)
+    index_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    valuations = engine.value_batch(subject_dicts)
+    elapsed = time.perf_counter() - start
+
+    report = {
+        'index_s': index_s,
+        'elapsed_s': elapsed,
+        'valuations_per_s': len(subject_dicts) / elapsed if elapsed else 0.0,
+        'valued': sum(1 for v in valuations if v['estimate'] is not None),
+    }
+    logger.info(f"AVM: {report['valuations_per_s']:.0f} valuations/s over {comparables} comparables")
+    return report
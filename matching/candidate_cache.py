@@ -0,0 +1,196 @@
+"""
+Per-postcode cache of candidate properties for address matching.
+
+Fuzzy matching compares an address against every property in its
+postcode. Instead of evaluating pg_trgm similarity() in SQL per candidate,
+a postcode's properties are loaded once, their trigram sets precomputed
+from address_normalised, and the postcode kept as one shard of an LRU so
+hot postcodes (new developments, busy agents) are served from memory.
+Shards expire after `max_age_s` so properties added by other processes are
+picked up; code that inserts properties drops the affected postcodes at once
+with `invalidate_candidate_postcodes`. Postcodes with no properties are only
+trusted for `empty_max_age_s`, since a miss is usually a postcode about to be
+loaded rather than one that doesn't exist.
+"""
+import time
+import logging
+import threading
+from collections import OrderedDict, defaultdict
+from typing import Dict, List, Optional, Iterable, Tuple, FrozenSet, Callable
+
+from sqlalchemy.orm import Session
+
+from api.models.database import Property
+from matching.trigram import trigrams, similarity
+
+logger = logging.getLogger(__name__)
+
+# Postcodes held in memory (a postcode averages ~15 properties)
+DEFAULT_MAX_POSTCODES = 20_000
+
+# Seconds before a postcode's candidates are reloaded
+DEFAULT_MAX_AGE_S = 3600.0
+
+# Seconds before a postcode with no properties is looked up again
+DEFAULT_EMPTY_MAX_AGE_S = 60.0
+
+
+def normalise_postcode(postcode: Optional[str]) -> Optional[str]:
+    """Postcode in the form properties.postcode is stored in (upper case, no spaces)"""
+    if not postcode:
+        return None
+    return postcode.upper().replace(' ', '') or None
+
+
+class PropertyCandidate:
+    """A property in a candidate postcode, with its trigram set"""
+
+    __slots__ = ('property_id', 'building_number', 'address_normalised', 'trigrams')
+
+    def __init__(self, property_id: int, building_number: Optional[str], address_normalised: str):
+        self.property_id = property_id
+        self.building_number = building_number
+        self.address_normalised = address_normalised or ''
+        self.trigrams = trigrams(self.address_normalised)
+
+
+def best_fuzzy_match(
+    address_trigrams: FrozenSet[str],
+    candidates: List[PropertyCandidate],
+    threshold: float
+) -> Optional[Tuple[PropertyCandidate, float]]:
+    """
+    Most similar candidate at or above the threshold.
+
+    Returns:
+        (candidate, similarity) or None
+    """
+    best_score, best = 0.0, None
+    for candidate in candidates:
+        score = similarity(address_trigrams, candidate.trigrams)
+        if score > best_score:
+            best_score, best = score, candidate
+
+    if best is not None and best_score >= threshold:
+        return best, best_score
+    return None
+
+
+class PostcodeCandidateCache:
+    """LRU of postcode -> candidate properties, loaded in bulk on miss"""
+
+    def __init__(
+        self,
+        max_postcodes: int = DEFAULT_MAX_POSTCODES,
+        max_age_s: float = DEFAULT_MAX_AGE_S,
+        clock: Callable[[], float] = time.monotonic,
+        empty_max_age_s: float = DEFAULT_EMPTY_MAX_AGE_S
+    ):
+        self.max_postcodes = max_postcodes
+        self.max_age_s = max_age_s
+        self.empty_max_age_s = empty_max_age_s
+        self.clock = clock
+        # postcode -> (expires_at, candidates)
+        self._shards: 'OrderedDict[str, Tuple[float, List[PropertyCandidate]]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._shards)
+
+    def get(self, db: Session, postcode: str) -> List[PropertyCandidate]:
+        """Candidates in one (normalised) postcode"""
+        return self.get_many(db, [postcode]).get(postcode, [])
+
+    def get_many(self, db: Session, postcodes: Iterable[str]) -> Dict[str, List[PropertyCandidate]]:
+        """
+        Candidates for several (normalised) postcodes; misses load in one query.
+
+        Returns:
+            Mapping of postcode -> candidates (empty list if none)
+        """
+        now = self.clock()
+        result: Dict[str, List[PropertyCandidate]] = {}
+        missing = []
+
+        with self._lock:
+            for postcode in set(postcodes):
+                shard = self._shards.get(postcode)
+                if shard is not None and now < shard[0]:
+                    self._shards.move_to_end(postcode)
+                    result[postcode] = shard[1]
+                    self.hits += 1
+                else:
+                    missing.append(postcode)
+                    self.misses += 1
+
+        if missing:
+            loaded = self._load(db, missing)
+            with self._lock:
+                for postcode in missing:
+                    result[postcode] = loaded.get(postcode, [])
+                    max_age = self.max_age_s if result[postcode] else self.empty_max_age_s
+                    self._shards[postcode] = (now + max_age, result[postcode])
+                    self._shards.move_to_end(postcode)
+                while len(self._shards) > self.max_postcodes:
+                    self._shards.popitem(last=False)
+
+        return result
+
+    @staticmethod
+    def _load(db: Session, postcodes: List[str]) -> Dict[str, List[PropertyCandidate]]:
+        rows = db.query(
+            Property.property_id,
+            Property.postcode,
+            Property.building_number,
+            Property.address_normalised
+        ).filter(
+            Property.postcode.in_(postcodes)
+        ).order_by(Property.property_id).all()
+
+        candidates: Dict[str, List[PropertyCandidate]] = defaultdict(list)
+        for property_id, postcode, building_number, address_normalised in rows:
+            candidates[postcode].append(PropertyCandidate(property_id, building_number, address_normalised))
+        return candidates
+
+    def invalidate(self, postcode: Optional[str] = None):
+        """Drop one postcode's shard, or everything"""
+        with self._lock:
+            if postcode is None:
+                self._shards.clear()
+            else:
+                self._shards.pop(postcode, None)
+
+    def invalidate_many(self, postcodes: Iterable[str]):
+        """Drop the shards of several (normalised) postcodes"""
+        with self._lock:
+            for postcode in postcodes:
+                self._shards.pop(postcode, None)
+
+
+# Singleton instance
+_candidate_cache: Optional[PostcodeCandidateCache] = None
+_candidate_cache_lock = threading.Lock()
+
+
+def get_candidate_cache() -> PostcodeCandidateCache:
+    """Get or create the global postcode candidate cache"""
+    global _candidate_cache
+    if _candidate_cache is None:
+        with _candidate_cache_lock:
+            if _candidate_cache is None:
+                _candidate_cache = PostcodeCandidateCache()
+    return _candidate_cache
+
+
+def invalidate_candidate_postcodes(postcodes: Iterable[Optional[str]]):
+    """
+    Drop cached candidates for postcodes that just gained properties.
+
+    Call after inserting properties so this process matches against them
+    immediately; other processes see them when their shards expire.
+    """
+    get_candidate_cache().invalidate_many(
+        {normalised for normalised in map(normalise_postcode, postcodes) if normalised}
+    )
@@ -0,0 +1,119 @@
+"""
+Persistent address match cache.
+
+Scrapes re-upsert the same listings and `cli.py match` re-tries every
+unmatched one, though the address string rarely changes. Match results are
+stored in `address_match_cache` keyed by a hash of (raw address, postcode):
+hits (property, confidence, method) are reused as-is, and misses are cached
+with a retry-after so a stable unmatchable address isn't re-matched every
+run. Adding a property to a postcode clears that postcode's misses
+(trigger in schema.sql); deleting a property removes its hits.
+"""
+import hashlib
+import logging
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from typing import Dict, Iterable, Optional, Tuple
+
+from sqlalchemy.orm import Session
+from sqlalchemy.dialects.postgresql import insert
+
+from api.models.database import AddressMatchCache
+from matching.candidate_cache import normalise_postcode
+
+logger = logging.getLogger(__name__)
+
+# How long an unmatched address is trusted before being matched again
+DEFAULT_RETRY_AFTER = timedelta(days=7)
+
+MatchResult = Tuple[int, Decimal, str]
+
+
+def match_cache_key(raw_address: str, postcode: Optional[str]) -> str:
+    """Cache key: sha256 of the case/whitespace-folded address and normalised postcode"""
+    address = ' '.join(raw_address.lower().split())
+    return hashlib.sha256(f"{address}|{normalise_postcode(postcode) or ''}".encode()).hexdigest()
+
+
+class MatchCache:
+    """Reads and writes cached match results; the caller owns the transaction"""
+
+    def __init__(self, db: Session, retry_after: timedelta = DEFAULT_RETRY_AFTER):
+        self.db = db
+        self.retry_after = retry_after
+
+    def lookup(self, keys: Iterable[str]) -> Dict[str, Optional[MatchResult]]:
+        """
+        Look up cached results.
+
+        Returns:
+            Mapping of key -> (property_id, confidence, match_method), or None
+            for a miss that isn't due for retry. Keys without a usable entry
+            are absent.
+        """
+        keys = list(set(keys))
+        if not keys:
+            return {}
+
+        rows = self.db.query(
+            AddressMatchCache.address_key,
+            AddressMatchCache.property_id,
+            AddressMatchCache.match_confidence,
+            AddressMatchCache.match_method,
+            AddressMatchCache.retry_after
+        ).filter(AddressMatchCache.address_key.in_(keys)).all()
+
+        now = datetime.now(timezone.utc)
+        cached = {}
+        for key, property_id, confidence, method, retry_after in rows:
+            if property_id is not None:
+                cached[key] = (property_id, confidence, method)
+            elif retry_after is not None and retry_after > now:
+                cached[key] = None
+        return cached
+
+    def store(self, results: Dict[str, Tuple[str, Optional[MatchResult]]]) -> int:
+        """
+        Write match results with one multi-row upsert.
+
+        Args:
+            results: key -> (postcode, match result or None for no match)
+
+        Returns:
+            Number of cache rows written
+
+        Results without a usable postcode are skipped: the cache is keyed
+        and invalidated by postcode, so they have nowhere to live.
+        """
+        now = datetime.now(timezone.utc)
+        rows = []
+        for key, (postcode, result) in results.items():
+            postcode = normalise_postcode(postcode)
+            if not postcode:
+                continue
+            property_id, confidence, method = result or (None, None, None)
+            rows.append({
+                'address_key': key,
+                'postcode': postcode,
+                'property_id': property_id,
+                'match_confidence': confidence,
+                'match_method': method,
+                'retry_after': None if result else now + self.retry_after,
+                'matched_at': now,
+            })
+        if not rows:
+            return 0
+
+        stmt = insert(AddressMatchCache).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['address_key'],
+            set_={
+                column: stmt.excluded[column]
+                for column in ('postcode', 'property_id', 'match_confidence', 'match_method',
+                               'retry_after', 'matched_at')
+            }
+        )
+        result = self.db.execute(stmt)
+
+        logger.debug(f"Cached {result.rowcount} address match results")
+        return result.rowcount
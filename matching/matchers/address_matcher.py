@@ -4,16 +4,27 @@ Address matching logic to link scraped listings to base properties.
 Strategies (in order of preference):
 1. UPRN exact match (if available in scraped data)
 2. Postcode + building number exact match
-3. Postcode + fuzzy address match (using trigram similarity)
+3. Postcode + fuzzy address match (pg_trgm-compatible trigram similarity,
+   scored in memory against the postcode's cached candidates)
+4. No postcode: nearby properties ranked by street and building number
+   (geo_fuzzy, see geo_matcher.py)
+
+Postcode-based results, including misses, are kept in the persistent match
+cache so unchanged addresses aren't matched again. Like MatchCache, the
+matcher leaves the transaction to its caller: commit after matching, or the
+cached results are lost with the session.
 """
-import re
 import logging
 from typing import Optional, Tuple
 from decimal import Decimal
-from sqlalchemy import func
 from sqlalchemy.orm import Session
 
 from api.models.database import Property
+from matching.trigram import trigrams
+from matching.normaliser import parse_address, contains_sub_building
+from matching.match_cache import MatchCache, match_cache_key
+from matching.matchers.geo_matcher import fetch_geo_candidates, rank_geo_candidates
+from matching.candidate_cache import get_candidate_cache, best_fuzzy_match, normalise_postcode
 
 logger = logging.getLogger(__name__)
 
@@ -26,12 +37,15 @@ class AddressMatcher:
 
     def __init__(self, db: Session):
         self.db = db
+        self.match_cache = MatchCache(db)
 
     def match(
         self,
         raw_address: str,
         postcode: Optional[str],
-        uprn: Optional[int] = None
+        uprn: Optional[int] = None,
+        latitude: Optional[float] = None,
+        longitude: Optional[float] = None
     ) -> Optional[Tuple[int, Decimal, str]]:
         """
         Match a raw address to a property.
@@ -40,9 +54,14 @@ class AddressMatcher:
             raw_address: Full address string from scraper
             postcode: Postcode (may be None)
             uprn: UPRN if available (rare in scraped data)
+            latitude: Listing's map pin, used when there is no postcode
+            longitude: Listing's map pin, used when there is no postcode
 
         Returns:
             Tuple of (property_id, confidence, match_method) or None
+
+        The match cache write joins the caller's transaction; the caller
+        commits it.
         """
 
         # Strategy 1: UPRN exact match
@@ -51,21 +70,33 @@ class AddressMatcher:
             if result:
                 return result
 
+        # Strategy 4: Nearby properties (no postcode, or a blank one)
+        postcode = normalise_postcode(postcode)
+        if not postcode:
+            result = None
+            if latitude is not None and longitude is not None:
+                result = self._match_by_location(raw_address, latitude, longitude)
+            if not result:
+                logger.warning(f"No match found for address: {raw_address}")
+            return result
+
+        key = match_cache_key(raw_address, postcode)
+        cached = self.match_cache.lookup([key])
+        if key in cached:
+            return cached[key]
+
         # Strategy 2: Postcode + building number
-        if postcode:
-            result = self._match_by_postcode_and_number(raw_address, postcode)
-            if result:
-                return result
+        result = self._match_by_postcode_and_number(raw_address, postcode)
 
         # Strategy 3: Fuzzy address match (within postcode)
-        if postcode:
+        if not result:
             result = self._match_by_fuzzy_address(raw_address, postcode)
-            if result:
-                return result
 
-        # No match found
-        logger.warning(f"No match found for address: {raw_address}")
-        return None
+        self.match_cache.store({key: (postcode, result)})
+
+        if not result:
+            logger.warning(f"No match found for address: {raw_address}")
+        return result
 
     def _match_by_uprn(self, uprn: int) -> Optional[Tuple[int, Decimal, str]]:
         """Match by UPRN (highest confidence)"""
@@ -82,26 +113,25 @@ class AddressMatcher:
         """
         Match by postcode + building number/name.
 
-        Extract building number from address and match against properties
-        with same postcode.
+        Parse the building number (or range) from the address and match
+        against properties with same postcode. An address naming a flat only
+        matches a property whose address names the same flat.
         """
-        # Normalize address
-        normalized = self._normalize_address(raw_address)
-
-        # Extract building number (leading digits)
-        building_num = self._extract_building_number(normalized)
+        parsed = parse_address(raw_address)
+        building_num = parsed.building_number
 
         if not building_num:
             return None
 
         # Query properties with matching postcode and building number
-        prop = self.db.query(Property).filter(
+        props = self.db.query(Property.property_id, Property.address_normalised).filter(
             Property.postcode == postcode.upper().replace(' ', ''),
             Property.building_number == building_num
-        ).first()
+        ).order_by(Property.property_id).all()
 
-        if prop:
-            return (prop.property_id, Decimal('0.95'), 'postcode_number')
+        for property_id, address_normalised in props:
+            if parsed.sub_building is None or contains_sub_building(address_normalised, parsed.sub_building):
+                return (property_id, Decimal('0.95'), 'postcode_number')
 
         return None
 
@@ -111,86 +141,54 @@ class AddressMatcher:
         postcode: str
     ) -> Optional[Tuple[int, Decimal, str]]:
         """
-        Fuzzy match using PostgreSQL trigram similarity.
+        Fuzzy match using trigram similarity.
 
-        Finds properties in same postcode with similar address strings.
+        Finds properties in same postcode with similar address strings. The
+        postcode's properties (with precomputed trigram sets) come from the
+        shared candidate cache, so hot postcodes cost no query; scores match
+        pg_trgm's similarity().
         """
-        normalized = self._normalize_address(raw_address)
+        postcode = normalise_postcode(postcode)
+        if not postcode:
+            return None
+
+        normalized = parse_address(raw_address).normalised
+        candidates = get_candidate_cache().get(self.db, postcode)
 
-        # Use pg_trgm similarity
         # similarity() returns 0-1, higher is better
-        query = self.db.query(
-            Property.property_id,
-            func.similarity(Property.address_normalised, normalized).label('sim_score')
-        ).filter(
-            Property.postcode == postcode.upper().replace(' ', '')
-        ).filter(
-            func.similarity(Property.address_normalised, normalized) >= self.FUZZY_MATCH_THRESHOLD
-        ).order_by(
-            func.similarity(Property.address_normalised, normalized).desc()
-        ).first()
-
-        if query:
-            property_id, sim_score = query
+        fuzzy = best_fuzzy_match(trigrams(normalized), candidates, self.FUZZY_MATCH_THRESHOLD)
+
+        if fuzzy:
+            candidate, sim_score = fuzzy
             # Convert similarity to decimal confidence (0.7-1.0 range)
             confidence = Decimal(str(round(sim_score, 2)))
-            return (property_id, confidence, 'address_fuzzy')
+            return (candidate.property_id, confidence, 'address_fuzzy')
 
         return None
 
-    @staticmethod
-    def _normalize_address(address: str) -> str:
-        """
-        Normalize address for matching.
-
-        - Lowercase
-        - Remove punctuation
-        - Collapse whitespace
-        - Remove common suffixes (street, road, avenue, etc.)
-        """
-        normalized = address.lower()
-
-        # Remove punctuation
-        normalized = re.sub(r'[.,\-]', ' ', normalized)
-
-        # Remove common street suffixes for better matching
-        suffixes = ['street', 'road', 'avenue', 'lane', 'drive', 'close', 'way', 'place']
-        for suffix in suffixes:
-            normalized = re.sub(rf'\b{suffix}\b', '', normalized)
-
-        # Collapse whitespace
-        normalized = ' '.join(normalized.split())
-
-        return normalized
-
-    @staticmethod
-    def _extract_building_number(address: str) -> Optional[str]:
+    def _match_by_location(
+        self,
+        raw_address: str,
+        latitude: float,
+        longitude: float
+    ) -> Optional[Tuple[int, Decimal, str]]:
         """
-        Extract building number from start of address.
+        Match by properties near the listing's map pin.
 
-        Examples:
-        "42 High Street" -> "42"
-        "123a Main Road" -> "123a"
-        "Flat 5, 10 Oak Lane" -> "10"
+        Candidates within GEO_RADIUS_M are ranked by building number,
+        building name and street-name similarity.
         """
-        # Try to match leading number (possibly with suffix like 'a')
-        match = re.match(r'^(\d+[a-z]?)\b', address)
-        if match:
-            return match.group(1)
-
-        # Handle "Flat X, NUMBER Street" pattern
-        match = re.search(r',\s*(\d+[a-z]?)\b', address)
-        if match:
-            return match.group(1)
-
-        return None
+        candidates = fetch_geo_candidates(self.db, [(latitude, longitude)])[0]
+        return rank_geo_candidates(raw_address, candidates)
 
 
 def match_listing_to_property(
     db: Session,
     raw_address: str,
     postcode: Optional[str],
-    uprn: Optional[int] = None
+    uprn: Optional[int] = None,
+    latitude: Optional[float] = None,
+    longitude: Optional[float] = None
 ) -> Optional[Tuple[int, Decimal, str]]:
     """
     Convenience function to match a listing.
@@ -200,9 +198,13 @@ def match_listing_to_property(
         raw_address: Raw address string
         postcode: Postcode (optional)
         uprn: UPRN (optional)
+        latitude: Map pin latitude (optional, used without a postcode)
+        longitude: Map pin longitude (optional, used without a postcode)
 
     Returns:
         Tuple of (property_id, confidence, match_method) or None
     """
     matcher = AddressMatcher(db)
-    return matcher.match(raw_address, postcode, uprn)
+    result = matcher.match(raw_address, postcode, uprn, latitude, longitude)
+    db.commit()
+    return result
@@ -0,0 +1,314 @@
+"""
+Set-based address matching.
+
+Matching listings one at a time costs up to three queries each. The batch
+matcher groups addresses by normalised postcode, fetches every candidate
+property for all postcodes not already in the candidate cache in one
+query, and resolves postcode + number and fuzzy matches in memory with the
+same rules as AddressMatcher (fuzzy matching uses pg_trgm-compatible
+trigram similarity). Addresses already in the persistent match cache
+(hits, and misses not yet due for retry) skip matching entirely. Results
+for listings are written back with a single UPDATE ... FROM (VALUES ...).
+
+Given a feature store, remaining addresses are first resolved to UPRNs
+against the EPC register in one DuckDB query ('epc_uprn'); only what that
+leaves unresolved goes to the Postgres candidates.
+
+Listings without a postcode but with a map pin are matched spatially
+(geo_matcher.py), with one ST_DWithin query per batch.
+"""
+import logging
+from collections import defaultdict
+from decimal import Decimal
+from typing import Optional, Tuple, List, Dict, Any, Hashable
+
+from geoalchemy2 import Geometry
+from sqlalchemy import update, values, column, cast, func, BigInteger, Numeric, String
+from sqlalchemy.orm import Session
+
+from api.models.database import ListingRaw, Property
+from matching.matchers.address_matcher import AddressMatcher
+from matching.trigram import trigrams
+from matching.normaliser import parse_address, contains_sub_building
+from matching.match_cache import MatchCache, match_cache_key
+from matching.matchers.geo_matcher import fetch_geo_candidates, rank_geo_candidates
+from matching.candidate_cache import (
+    PropertyCandidate, get_candidate_cache, best_fuzzy_match, normalise_postcode
+)
+
+logger = logging.getLogger(__name__)
+
+# Listings matched (and written back) per batch
+DEFAULT_MATCH_BATCH_SIZE = 1000
+
+# Confidence of an address resolved to a UPRN through the EPC register
+EPC_MATCH_CONFIDENCE = Decimal('0.95')
+
+
+class BatchAddressMatcher:
+    """Matches many addresses with one candidate query per batch"""
+
+    FUZZY_MATCH_THRESHOLD = AddressMatcher.FUZZY_MATCH_THRESHOLD
+
+    def __init__(self, db: Session, feature_store=None):
+        """
+        Args:
+            db: Database session
+            feature_store: S3FeatureStore to resolve UPRNs from the EPC
+                register first (optional)
+        """
+        self.db = db
+        self.feature_store = feature_store
+        self.candidates = get_candidate_cache()
+        self.match_cache = MatchCache(db)
+
+    def match_addresses(
+        self,
+        addresses: List[Tuple[Hashable, str, Optional[str]]]
+    ) -> Dict[Hashable, Tuple[int, Decimal, str]]:
+        """
+        Match a batch of addresses to properties.
+
+        Results are stored in the match cache; the caller commits them.
+
+        Args:
+            addresses: (key, raw_address, postcode) tuples; key identifies the
+                address in the result (e.g. raw_listing_id)
+
+        Returns:
+            Mapping of key -> (property_id, confidence, match_method) for
+            matched addresses
+        """
+        cache_keys = {
+            key: match_cache_key(raw_address, postcode)
+            for key, raw_address, postcode in addresses
+            if raw_address and normalise_postcode(postcode)
+        }
+        cached = self.match_cache.lookup(cache_keys.values())
+
+        matches = {}
+        by_postcode: Dict[str, List[Tuple[Hashable, str]]] = defaultdict(list)
+        for key, raw_address, postcode in addresses:
+            if key not in cache_keys:
+                continue
+            cache_key = cache_keys[key]
+            if cache_key in cached:
+                if cached[cache_key]:
+                    matches[key] = cached[cache_key]
+            else:
+                by_postcode[normalise_postcode(postcode)].append((key, raw_address))
+
+        if not by_postcode:
+            return matches
+
+        results = {}
+        if self.feature_store is not None:
+            for key, (postcode, result) in self._resolve_by_epc(by_postcode).items():
+                results[cache_keys[key]] = (postcode, result)
+                matches[key] = result
+            by_postcode = {
+                postcode: [(key, raw) for key, raw in items if key not in matches]
+                for postcode, items in by_postcode.items()
+            }
+            by_postcode = {postcode: items for postcode, items in by_postcode.items() if items}
+
+        candidates = self.candidates.get_many(self.db, by_postcode)
+
+        for postcode, items in by_postcode.items():
+            in_postcode = candidates.get(postcode)
+            for key, raw_address in items:
+                result = self._match_in_postcode(raw_address, in_postcode) if in_postcode else None
+                results[cache_keys[key]] = (postcode, result)
+                if result:
+                    matches[key] = result
+
+        self.match_cache.store(results)
+        return matches
+
+    def _resolve_by_epc(
+        self,
+        by_postcode: Dict[str, List[Tuple[Hashable, str]]]
+    ) -> Dict[Hashable, Tuple[str, Tuple[int, Decimal, str]]]:
+        """
+        Resolve addresses to UPRNs via the EPC register, then UPRNs to properties.
+
+        Returns:
+            Mapping of key -> (postcode, (property_id, confidence, 'epc_uprn'))
+            for resolved addresses whose UPRN is in properties
+        """
+        items = [
+            (key, postcode, parse_address(raw_address).normalised)
+            for postcode, postcode_items in by_postcode.items()
+            for key, raw_address in postcode_items
+        ]
+        resolved = self.feature_store.resolve_uprns([(postcode, normalised) for _, postcode, normalised in items])
+
+        uprns = {hit[0] for hit in resolved if hit}
+        if not uprns:
+            return {}
+        property_ids = dict(
+            self.db.query(Property.uprn, Property.property_id).filter(Property.uprn.in_(uprns)).all()
+        )
+
+        matches = {}
+        for (key, postcode, _), hit in zip(items, resolved):
+            if hit and hit[0] in property_ids:
+                matches[key] = (postcode, (property_ids[hit[0]], EPC_MATCH_CONFIDENCE, 'epc_uprn'))
+
+        logger.debug(f"Resolved {len(matches)} / {len(items)} addresses via the EPC register")
+        return matches
+
+    def match_locations(
+        self,
+        addresses: List[Tuple[Hashable, str, float, float]]
+    ) -> Dict[Hashable, Tuple[int, Decimal, str]]:
+        """
+        Match addresses without a postcode by nearby properties.
+
+        Args:
+            addresses: (key, raw_address, latitude, longitude) tuples
+
+        Returns:
+            Mapping of key -> (property_id, confidence, 'geo_fuzzy') for
+            matched addresses
+        """
+        candidates = fetch_geo_candidates(self.db, [(lat, lon) for _, _, lat, lon in addresses])
+
+        matches = {}
+        for (key, raw_address, _, _), nearby in zip(addresses, candidates):
+            result = rank_geo_candidates(raw_address, nearby)
+            if result:
+                matches[key] = result
+        return matches
+
+    def _match_in_postcode(
+        self,
+        raw_address: str,
+        candidates: List[PropertyCandidate]
+    ) -> Optional[Tuple[int, Decimal, str]]:
+        """Postcode + building number, then fuzzy address, within one postcode"""
+        parsed = parse_address(raw_address)
+
+        # Strategy 2: Postcode + building number (and flat, if the address names one)
+        building_num = parsed.building_number
+        if building_num:
+            for candidate in candidates:
+                if candidate.building_number == building_num and (
+                    parsed.sub_building is None
+                    or contains_sub_building(candidate.address_normalised, parsed.sub_building)
+                ):
+                    return (candidate.property_id, Decimal('0.95'), 'postcode_number')
+
+        # Strategy 3: Fuzzy address match (within postcode)
+        fuzzy = best_fuzzy_match(trigrams(parsed.normalised), candidates, self.FUZZY_MATCH_THRESHOLD)
+        if fuzzy:
+            best, score = fuzzy
+            return (best.property_id, Decimal(str(round(score, 2))), 'address_fuzzy')
+
+        return None
+
+    def write_listing_matches(self, matches: Dict[int, Tuple[int, Decimal, str]]) -> int:
+        """
+        Write listing matches back with a single UPDATE ... FROM (VALUES ...).
+
+        Commits, together with the batch's match cache rows.
+
+        Args:
+            matches: raw_listing_id -> (property_id, confidence, match_method)
+
+        Returns:
+            Number of listings updated
+        """
+        if not matches:
+            self.db.commit()
+            return 0
+
+        matched = values(
+            column('raw_listing_id', BigInteger),
+            column('property_id', BigInteger),
+            column('confidence', Numeric(3, 2)),
+            column('method', String(50)),
+            name='matched'
+        ).data([
+            (raw_listing_id, property_id, confidence, method)
+            for raw_listing_id, (property_id, confidence, method) in matches.items()
+        ])
+
+        stmt = update(ListingRaw).where(
+            ListingRaw.raw_listing_id == matched.c.raw_listing_id
+        ).values(
+            matched_property_id=matched.c.property_id,
+            match_confidence=matched.c.confidence,
+            match_method=matched.c.method
+        )
+
+        result = self.db.execute(stmt)
+        self.db.commit()
+        return result.rowcount
+
+
+def match_unmatched_listings(
+    db: Session,
+    batch_size: int = DEFAULT_MATCH_BATCH_SIZE,
+    agent_id: Optional[int] = None,
+    feature_store=None
+) -> Dict[str, Any]:
+    """
+    Match all unmatched raw listings, batch by batch.
+
+    Listings with a postcode use the postcode strategies; listings with only
+    a map pin are matched spatially.
+
+    Args:
+        db: Database session
+        batch_size: Listings matched and written back per batch
+        agent_id: Only match this agent's listings (e.g. right after a scrape)
+        feature_store: S3FeatureStore for EPC register UPRN resolution (optional)
+
+    Returns:
+        Statistics dict with 'unmatched' (listings considered) and 'matched'
+    """
+    matcher = BatchAddressMatcher(db, feature_store)
+
+    query = db.query(
+        ListingRaw.raw_listing_id,
+        ListingRaw.raw_address,
+        ListingRaw.postcode
+    ).filter(
+        ListingRaw.matched_property_id.is_(None),
+        ListingRaw.postcode.isnot(None)
+    )
+    if agent_id is not None:
+        query = query.filter(ListingRaw.agent_id == agent_id)
+    unmatched = query.order_by(ListingRaw.raw_listing_id).all()
+
+    geom = cast(ListingRaw.location, Geometry)
+    geo_query = db.query(
+        ListingRaw.raw_listing_id,
+        ListingRaw.raw_address,
+        func.ST_Y(geom),
+        func.ST_X(geom)
+    ).filter(
+        ListingRaw.matched_property_id.is_(None),
+        ListingRaw.postcode.is_(None),
+        ListingRaw.location.isnot(None)
+    )
+    if agent_id is not None:
+        geo_query = geo_query.filter(ListingRaw.agent_id == agent_id)
+    unmatched_geo = geo_query.order_by(ListingRaw.raw_listing_id).all()
+
+    stats = {'unmatched': len(unmatched) + len(unmatched_geo), 'matched': 0}
+
+    for start in range(0, len(unmatched), batch_size):
+        batch = unmatched[start:start + batch_size]
+        matches = matcher.match_addresses([tuple(row) for row in batch])
+        stats['matched'] += matcher.write_listing_matches(matches)
+        logger.info(f"Matched {stats['matched']} / {start + len(batch)} listings so far")
+
+    for start in range(0, len(unmatched_geo), batch_size):
+        batch = unmatched_geo[start:start + batch_size]
+        matches = matcher.match_locations([tuple(row) for row in batch])
+        stats['matched'] += matcher.write_listing_matches(matches)
+        logger.info(f"Matched {stats['matched']} listings ({start + len(batch)} without a postcode tried)")
+
+    return stats
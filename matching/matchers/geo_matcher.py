@@ -0,0 +1,140 @@
+"""
+Spatial candidate matching for listings without a postcode.
+
+Some agents (e.g. the Foxtons search JSON) publish coordinates and a street
+but no postcode, so the postcode strategies can't run. Candidate properties
+are pulled with ST_DWithin around the listing's point (GIST index on
+properties.location) and must share a building number or building name;
+ties are broken by street-name similarity, then distance. A street alone
+never matches. Matches are recorded with method 'geo_fuzzy'.
+"""
+import logging
+from decimal import Decimal
+from typing import NamedTuple, Optional, Tuple, List
+
+from geoalchemy2 import Geography
+from sqlalchemy import values, column, cast, func, Integer, Float
+from sqlalchemy.orm import Session
+
+from api.models.database import Property
+from matching.normaliser import parse_address
+from matching.trigram import trigrams, similarity
+
+logger = logging.getLogger(__name__)
+
+# Search radius around the listing's point (agents' pins are approximate)
+GEO_RADIUS_M = 150
+
+# Minimum street-name similarity for a candidate to be considered
+GEO_STREET_THRESHOLD = 0.6
+
+# Minimum building-name similarity to count as the same building
+GEO_NAME_THRESHOLD = 0.7
+
+# Confidence by the strongest evidence matched
+GEO_NUMBER_CONFIDENCE = Decimal('0.90')
+GEO_NAME_CONFIDENCE = Decimal('0.85')
+
+
+class GeoCandidate(NamedTuple):
+    """A property near a listing's point"""
+    property_id: int
+    building_number: Optional[str]
+    building_name: Optional[str]
+    street: Optional[str]
+    distance_m: float
+
+
+def fetch_geo_candidates(
+    db: Session,
+    points: List[Tuple[float, float]],
+    radius_m: float = GEO_RADIUS_M
+) -> List[List[GeoCandidate]]:
+    """
+    Properties within radius_m of each point, in one query.
+
+    Args:
+        db: Database session
+        points: (latitude, longitude) per listing
+
+    Returns:
+        Candidates per point, in the order of `points`
+    """
+    candidates: List[List[GeoCandidate]] = [[] for _ in points]
+    if not points:
+        return candidates
+
+    pts = values(
+        column('idx', Integer),
+        column('latitude', Float),
+        column('longitude', Float),
+        name='points'
+    ).data([(i, lat, lon) for i, (lat, lon) in enumerate(points)])
+    point = cast(func.ST_SetSRID(func.ST_MakePoint(pts.c.longitude, pts.c.latitude), 4326), Geography)
+
+    rows = db.query(
+        pts.c.idx,
+        Property.property_id,
+        Property.building_number,
+        Property.building_name,
+        Property.street,
+        func.ST_Distance(Property.location, point)
+    ).select_from(pts).join(
+        Property, func.ST_DWithin(Property.location, point, radius_m)
+    ).all()
+
+    for idx, property_id, building_number, building_name, street, distance_m in rows:
+        candidates[idx].append(GeoCandidate(property_id, building_number, building_name, street, distance_m))
+    return candidates
+
+
+def _name_trigrams(name: Optional[str]):
+    # Street types are kept: "park road" and "park lane" are different streets
+    return trigrams(name) if name else frozenset()
+
+
+def rank_geo_candidates(
+    raw_address: str,
+    candidates: List[GeoCandidate]
+) -> Optional[Tuple[int, Decimal, str]]:
+    """
+    Pick the best nearby property for an address.
+
+    Candidates must be on a similar street. A listing's building number must
+    match exactly (a different number is a different property); otherwise
+    a matching building name is required. A street alone never matches: the
+    nearest property on it is usually someone else's home.
+
+    Returns:
+        Tuple of (property_id, confidence, 'geo_fuzzy') or None
+    """
+    parsed = parse_address(raw_address)
+    if not parsed.street or not candidates:
+        return None
+
+    street = _name_trigrams(parsed.street)
+    name = _name_trigrams(parsed.building_name)
+
+    best_rank, best = None, None
+    for candidate in candidates:
+        street_sim = similarity(street, _name_trigrams(candidate.street))
+        if street_sim < GEO_STREET_THRESHOLD:
+            continue
+
+        number_match = bool(parsed.building_number) and candidate.building_number == parsed.building_number
+        if parsed.building_number and not number_match:
+            continue
+
+        name_match = similarity(name, _name_trigrams(candidate.building_name)) >= GEO_NAME_THRESHOLD
+        if not number_match and not name_match:
+            continue
+
+        rank = (number_match, name_match, street_sim, -candidate.distance_m)
+        if best_rank is None or rank > best_rank:
+            best_rank, best = rank, candidate
+
+    if best is None:
+        return None
+
+    confidence = GEO_NUMBER_CONFIDENCE if best_rank[0] else GEO_NAME_CONFIDENCE
+    return (best.property_id, confidence, 'geo_fuzzy')
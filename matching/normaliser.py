@@ -0,0 +1,135 @@
+"""
+Address normalisation and parsing.
+
+One compiled pass per address produces both the match string stored in
+properties.address_normalised and a structured address (sub-building,
+building number or range, building name, street, locality), so listings,
+sold prices and properties are normalised the same way. Results are
+memoised: agents and Price Paid repeat the same address strings heavily.
+
+"Flat 3, 12-14 High Street, Camden" parses to sub_building "flat 3",
+building_number "12-14", street "high street", locality "camden" and
+normalises to "flat 3 12 14 high camden".
+"""
+import re
+from functools import lru_cache
+from typing import NamedTuple, Optional, Dict, List
+
+# Distinct address strings memoised
+NORMALISE_CACHE_SIZE = 200_000
+
+# Street type words dropped from the match string
+STREET_SUFFIXES = ('street', 'road', 'avenue', 'lane', 'drive', 'close', 'way', 'place')
+
+SUB_BUILDING_WORDS = ('flat', 'apartment', 'apt', 'unit', 'suite', 'studio', 'room', 'maisonette')
+
+_PUNCTUATION = re.compile(r'[.,\-]')
+_SUFFIX = re.compile(rf"\b(?:{'|'.join(STREET_SUFFIXES)})\b")
+_PART_SEPARATOR = re.compile(r'\s*,\s*')
+_SUB_BUILDING = re.compile(rf"^((?:{'|'.join(SUB_BUILDING_WORDS)})\s+[a-z0-9]+)\b\s*")
+_BUILDING_NUMBER = re.compile(r'^(\d+[a-z]?(?:\s*-\s*\d+[a-z]?)?)\b\s*(.*)$')
+_ENDS_WITH_SUFFIX = re.compile(rf"\b(?:{'|'.join(STREET_SUFFIXES)})$")
+_WHITESPACE = re.compile(r'\s+')
+
+
+class ParsedAddress(NamedTuple):
+    """Structured address; components are lowercase with tidy whitespace"""
+    sub_building: Optional[str]
+    building_number: Optional[str]
+    building_name: Optional[str]
+    street: Optional[str]
+    locality: Optional[str]
+    normalised: str
+
+    def property_fields(self) -> Dict[str, Optional[str]]:
+        """Column values for a properties row built from this address"""
+        return {
+            'building_name': self.building_name,
+            'building_number': self.building_number,
+            'street': self.street,
+            'locality': self.locality,
+            'address_normalised': self.normalised,
+        }
+
+
+def contains_sub_building(address_normalised: Optional[str], sub_building: str) -> bool:
+    """Whether a normalised address names the sub-building ("flat 3" in "flat 3 12 downing")"""
+    return f" {normalise_address(sub_building)} " in f" {address_normalised or ''} "
+
+
+@lru_cache(maxsize=NORMALISE_CACHE_SIZE)
+def normalise_address(address: str) -> str:
+    """
+    Normalize address for matching.
+
+    - Lowercase
+    - Remove punctuation
+    - Remove common suffixes (street, road, avenue, etc.)
+    - Collapse whitespace
+    """
+    normalized = _PUNCTUATION.sub(' ', address.lower())
+    normalized = _SUFFIX.sub('', normalized)
+    return ' '.join(normalized.split())
+
+
+@lru_cache(maxsize=NORMALISE_CACHE_SIZE)
+def parse_address(address: str) -> ParsedAddress:
+    """
+    Split an address into its components.
+
+    Examples:
+    "42 High Street" -> building_number "42", street "high street"
+    "Flat 3 12 High St" -> sub_building "flat 3", building_number "12"
+    "12-14 Mill Lane" -> building_number "12-14"
+    "Rose Cottage, Brick Lane, London" -> building_name "rose cottage"
+
+    Args:
+        address: Raw address string (comma-separated parts, postcode excluded)
+
+    Returns:
+        ParsedAddress; components that can't be identified are None
+    """
+    parts: List[str] = [
+        ' '.join(part.replace('.', ' ').split())
+        for part in _PART_SEPARATOR.split(address.lower())
+    ]
+    parts = [part for part in parts if part]
+
+    sub_building = None
+    if parts:
+        match = _SUB_BUILDING.match(parts[0])
+        if match:
+            sub_building = match.group(1)
+            parts[0] = parts[0][match.end():]
+            if not parts[0]:
+                parts.pop(0)
+
+    # The first part starting with a number holds the building number and street
+    building_number = street = None
+    name_parts: List[str] = []
+    rest: List[str] = []
+    for i, part in enumerate(parts):
+        match = _BUILDING_NUMBER.match(part)
+        if match:
+            building_number = _WHITESPACE.sub('', match.group(1))
+            street = match.group(2) or None
+            name_parts = parts[:i]
+            rest = parts[i + 1:]
+            if street is None and rest:
+                street, rest = rest[0], rest[1:]
+            break
+    else:
+        # No number: a leading part that isn't a street is the building name
+        if len(parts) > 1 and not _ENDS_WITH_SUFFIX.search(parts[0]):
+            name_parts, parts = parts[:1], parts[1:]
+        if parts:
+            street, rest = parts[0], parts[1:]
+
+    return ParsedAddress(
+        sub_building=sub_building,
+        building_number=building_number,
+        building_name=' '.join(name_parts) or None,
+        street=street,
+        locality=rest[0] if rest else None,
+        normalised=normalise_address(address),
+    )
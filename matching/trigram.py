@@ -0,0 +1,30 @@
+"""
+Trigram similarity with PostgreSQL pg_trgm semantics.
+
+pg_trgm lowercases the string, splits it into words of alphanumeric
+characters, pads each word with two spaces in front and one behind, and
+takes the set of 3-character substrings. similarity() is the number of
+shared trigrams divided by the number of distinct trigrams in either
+string, so thresholds tuned against Postgres (e.g. 0.7) carry over.
+"""
+import re
+from typing import FrozenSet
+
+_WORD = re.compile(r'[^\W_]+')
+
+
+def trigrams(text: str) -> FrozenSet[str]:
+    """Set of pg_trgm trigrams for a string"""
+    result = set()
+    for word in _WORD.findall(text.lower()):
+        padded = f'  {word} '
+        result.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return frozenset(result)
+
+
+def similarity(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    """pg_trgm similarity() of two trigram sets (0-1)"""
+    if not a or not b:
+        return 0.0
+    shared = len(a & b)
+    return shared / (len(a) + len(b) - shared)
@@ -95,6 +95,7 @@ CREATE TABLE listings_raw (
     -- Address (as scraped - might be incomplete)
     raw_address TEXT NOT NULL,
     postcode VARCHAR(10),
+    location GEOGRAPHY(POINT, 4326), -- agent's map pin, when published
 
     -- Images
     image_urls JSONB, -- ["url1", "url2", ...]
@@ -107,7 +108,7 @@ CREATE TABLE listings_raw (
     -- Matching status
     matched_property_id BIGINT REFERENCES properties(property_id),
     match_confidence NUMERIC(3, 2), -- 0.00 to 1.00
-    match_method VARCHAR(50), -- uprn_exact, postcode_number, address_fuzzy
+    match_method VARCHAR(50), -- uprn_exact, epc_uprn, postcode_number, address_fuzzy, geo_fuzzy
 
     -- Timestamps
     scraped_at TIMESTAMPTZ DEFAULT NOW(),
@@ -121,6 +122,8 @@ CREATE INDEX idx_listings_raw_agent ON listings_raw(agent_id);
 CREATE INDEX idx_listings_raw_status ON listings_raw(status);
 CREATE INDEX idx_listings_raw_matched_property ON listings_raw(matched_property_id);
 CREATE INDEX idx_listings_raw_postcode ON listings_raw(postcode) WHERE postcode IS NOT NULL;
+CREATE INDEX idx_listings_raw_unmatched_geo ON listings_raw(raw_listing_id)
+    WHERE matched_property_id IS NULL AND postcode IS NULL AND location IS NOT NULL;
 
 -- =====================================================
 -- ENRICHED LISTINGS (search-optimised)
@@ -193,6 +196,9 @@ CREATE TABLE listings_enriched (
     avm_confidence_score NUMERIC(3, 2), -- 0-1
     avm_value_delta_pct NUMERIC(5, 2), -- (price - avm_estimate) / avm_estimate * 100
 
+    -- Raw listing fields at enrichment time (drives incremental re-enrichment)
+    source_fingerprint JSONB, -- {"matched_property_id": 1, "price_numeric": "450000.00", ..., "feature_snapshot_version": "1"}
+
     -- Derived flags
     is_undervalued BOOLEAN GENERATED ALWAYS AS (avm_value_delta_pct < -5) STORED,
     is_overvalued BOOLEAN GENERATED ALWAYS AS (avm_value_delta_pct > 5) STORED,
@@ -257,6 +263,17 @@ CREATE TABLE airports (
 
 CREATE INDEX idx_airports_location ON airports USING GIST(location);
 
+-- Rail, Underground, metro and tram stations (loaded from NaPTAN Stops.csv)
+CREATE TABLE stations (
+    station_id SERIAL PRIMARY KEY,
+    atco_code VARCHAR(20) UNIQUE NOT NULL, -- NaPTAN stop point identifier
+    name VARCHAR(255) NOT NULL,
+    station_type VARCHAR(20) NOT NULL, -- rail, metro
+    location GEOGRAPHY(POINT, 4326) NOT NULL
+);
+
+CREATE INDEX idx_stations_location ON stations USING GIST(location);
+
 -- Conservation Areas (loaded from local authority data)
 CREATE TABLE conservation_areas (
     conservation_area_id SERIAL PRIMARY KEY,
@@ -268,6 +285,93 @@ CREATE TABLE conservation_areas (
 
 CREATE INDEX idx_conservation_areas_boundary ON conservation_areas USING GIST(boundary);
 
+-- Sold prices (HM Land Registry Price Paid), used as AVM comparables.
+-- location is NULL for sales not yet geocoded; the matched property's
+-- location is used instead.
+CREATE TABLE sold_prices (
+    sale_id BIGSERIAL PRIMARY KEY,
+    transaction_id VARCHAR(50) UNIQUE NOT NULL, -- Land Registry transaction identifier
+    property_id BIGINT REFERENCES properties(property_id) ON DELETE SET NULL,
+
+    postcode VARCHAR(10) NOT NULL,
+    property_type VARCHAR(50), -- flat, terraced, semi_detached, detached
+    bedrooms INTEGER,
+    price NUMERIC(12, 2) NOT NULL,
+    sale_date DATE NOT NULL,
+    location GEOGRAPHY(POINT, 4326),
+
+    created_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+CREATE INDEX idx_sold_prices_postcode ON sold_prices(postcode);
+CREATE INDEX idx_sold_prices_property ON sold_prices(property_id);
+CREATE INDEX idx_sold_prices_sale_date ON sold_prices(sale_date);
+
+-- Property -> conservation area membership (precomputed spatial join)
+-- A row with NULL conservation_area_id means "computed: not in any area".
+-- Kept current by the triggers below; backfill with
+-- SELECT refresh_property_conservation_areas(NULL);
+CREATE TABLE property_conservation_area (
+    property_id BIGINT PRIMARY KEY REFERENCES properties(property_id) ON DELETE CASCADE,
+    conservation_area_id INTEGER REFERENCES conservation_areas(conservation_area_id) ON DELETE SET NULL,
+    computed_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+CREATE INDEX idx_property_conservation_area_area ON property_conservation_area(conservation_area_id);
+
+-- Listing-independent enrichment per property (EPC, area, flood, broadband,
+-- planning, conservation, schools, transport), reused across relistings and
+-- agents. Keyed by feature snapshot version: bump FEATURE_SNAPSHOT_VERSION
+-- when reference data is refreshed.
+CREATE TABLE property_enrichment_cache (
+    property_id BIGINT NOT NULL REFERENCES properties(property_id) ON DELETE CASCADE,
+    feature_snapshot_version VARCHAR(50) NOT NULL,
+
+    epc_rating VARCHAR(1),
+    epc_score INTEGER,
+    epc_potential_rating VARCHAR(1),
+    epc_co2_emissions_current NUMERIC(8, 2),
+    epc_energy_consumption_current NUMERIC(8, 2),
+
+    in_conservation_area BOOLEAN,
+    conservation_area_name VARCHAR(255),
+    recent_planning_apps INTEGER,
+    planning_refusals INTEGER,
+
+    school_quality_score NUMERIC(3, 2),
+    distance_to_nearest_primary_m INTEGER,
+    distance_to_nearest_secondary_m INTEGER,
+
+    distance_to_nearest_station_m INTEGER,
+    distance_to_nearest_airport_m INTEGER,
+    nearest_airport_code VARCHAR(10),
+
+    imd_decile INTEGER,
+    crime_rate_percentile INTEGER,
+    flood_risk VARCHAR(20),
+    max_download_speed_mbps INTEGER,
+
+    computed_at TIMESTAMPTZ DEFAULT NOW(),
+
+    PRIMARY KEY (property_id, feature_snapshot_version)
+);
+
+-- Address match results keyed by a hash of (raw address, postcode), so
+-- re-scraped and still-unmatched listings aren't re-matched every run.
+-- NULL property_id is a cached miss, retried after retry_after or as soon
+-- as a property is added to the postcode (trigger below).
+CREATE TABLE address_match_cache (
+    address_key VARCHAR(64) PRIMARY KEY, -- sha256 hex, see matching/match_cache.py
+    postcode VARCHAR(10) NOT NULL,
+    property_id BIGINT REFERENCES properties(property_id) ON DELETE CASCADE,
+    match_confidence NUMERIC(3, 2),
+    match_method VARCHAR(50),
+    retry_after TIMESTAMPTZ,
+    matched_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+CREATE INDEX idx_address_match_cache_misses ON address_match_cache(postcode) WHERE property_id IS NULL;
+
 -- =====================================================
 -- USER QUESTIONNAIRES & SEARCHES
 -- =====================================================
@@ -403,3 +507,112 @@ CREATE TRIGGER update_listings_raw_updated_at BEFORE UPDATE ON listings_raw
 
 CREATE TRIGGER update_listings_enriched_updated_at BEFORE UPDATE ON listings_enriched
     FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
+
+-- Recompute conservation area membership for the given properties
+-- (all properties when NULL) with one spatial join. Returns rows written.
+CREATE OR REPLACE FUNCTION refresh_property_conservation_areas(ids BIGINT[])
+RETURNS INTEGER AS $$
+DECLARE
+    written INTEGER;
+BEGIN
+    INSERT INTO property_conservation_area (property_id, conservation_area_id, computed_at)
+    SELECT DISTINCT ON (p.property_id)
+        p.property_id,
+        c.conservation_area_id,
+        NOW()
+    FROM properties p
+    LEFT JOIN conservation_areas c ON ST_Covers(c.boundary, p.location)
+    WHERE ids IS NULL OR p.property_id = ANY(ids)
+    ORDER BY p.property_id, c.conservation_area_id
+    ON CONFLICT (property_id) DO UPDATE SET
+        conservation_area_id = EXCLUDED.conservation_area_id,
+        computed_at = EXCLUDED.computed_at;
+
+    GET DIAGNOSTICS written = ROW_COUNT;
+    RETURN written;
+END;
+$$ LANGUAGE plpgsql;
+
+-- New or moved properties
+CREATE OR REPLACE FUNCTION refresh_conservation_for_property()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM refresh_property_conservation_areas(ARRAY[NEW.property_id]);
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER refresh_property_conservation_area AFTER INSERT OR UPDATE OF location ON properties
+    FOR EACH ROW EXECUTE FUNCTION refresh_conservation_for_property();
+
+-- Added, redrawn or removed boundaries: recompute properties inside the old or new boundary
+CREATE OR REPLACE FUNCTION refresh_conservation_for_area()
+RETURNS TRIGGER AS $$
+DECLARE
+    affected BIGINT[];
+BEGIN
+    SELECT array_agg(p.property_id) INTO affected
+    FROM properties p
+    WHERE (TG_OP IN ('INSERT', 'UPDATE') AND ST_Covers(NEW.boundary, p.location))
+       OR (TG_OP IN ('UPDATE', 'DELETE') AND ST_Covers(OLD.boundary, p.location));
+
+    IF affected IS NOT NULL THEN
+        PERFORM refresh_property_conservation_areas(affected);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER refresh_conservation_area_members AFTER INSERT OR UPDATE OF boundary OR DELETE ON conservation_areas
+    FOR EACH ROW EXECUTE FUNCTION refresh_conservation_for_area();
+
+-- Cached property enrichment is stale once the property moves or is
+-- re-identified, or its conservation area membership changes
+CREATE OR REPLACE FUNCTION invalidate_property_enrichment_cache()
+RETURNS TRIGGER AS $$
+BEGIN
+    DELETE FROM property_enrichment_cache WHERE property_id = NEW.property_id;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER invalidate_enrichment_cache_on_property AFTER UPDATE OF location, uprn, postcode ON properties
+    FOR EACH ROW EXECUTE FUNCTION invalidate_property_enrichment_cache();
+
+CREATE TRIGGER invalidate_enrichment_cache_on_conservation AFTER UPDATE ON property_conservation_area
+    FOR EACH ROW
+    WHEN (OLD.conservation_area_id IS DISTINCT FROM NEW.conservation_area_id)
+    EXECUTE FUNCTION invalidate_property_enrichment_cache();
+
+-- A new property may match addresses that previously didn't
+CREATE OR REPLACE FUNCTION invalidate_address_match_misses()
+RETURNS TRIGGER AS $$
+BEGIN
+    DELETE FROM address_match_cache WHERE postcode = NEW.postcode AND property_id IS NULL;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER invalidate_address_match_misses AFTER INSERT OR UPDATE OF postcode, address_normalised, building_number ON properties
+    FOR EACH ROW EXECUTE FUNCTION invalidate_address_match_misses();
+
+-- Wake the enrichment daemon (cli.py enrich-daemon) when a listing is
+-- matched or its price or status changes. Payload is the raw_listing_id;
+-- notifications are delivered on commit and de-duplicated per transaction.
+CREATE OR REPLACE FUNCTION notify_listing_enrichment()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF NEW.matched_property_id IS NOT NULL AND (
+        TG_OP = 'INSERT'
+        OR NEW.matched_property_id IS DISTINCT FROM OLD.matched_property_id
+        OR NEW.price_numeric IS DISTINCT FROM OLD.price_numeric
+        OR NEW.status IS DISTINCT FROM OLD.status
+    ) THEN
+        PERFORM pg_notify('listing_enrichment', NEW.raw_listing_id::text);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER notify_listing_enrichment AFTER INSERT OR UPDATE OF matched_property_id, price_numeric, status ON listings_raw
+    FOR EACH ROW EXECUTE FUNCTION notify_listing_enrichment();
@@ -0,0 +1,280 @@
+"""
+Columnar property dataset for the smart search API.
+
+The enriched Parquet snapshot (see enrichment/snapshot.py) - or, for demos
+without a database, the scraped JSON with mock enrichment - is compiled once
+into an uncompressed Arrow IPC file. Every API worker memory-maps that file
+read-only, so the column buffers live in the OS page cache and are shared
+between processes instead of each worker parsing and holding its own copy.
+
+Usage:
+    python -m search.property_dataset                  # compile snapshot (or JSON)
+    python -m search.property_dataset --source x.json --output x.arrow
+"""
+import os
+import json
+import zlib
+import random
+import logging
+from typing import List, Dict, Any, Optional
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SOURCE_PATH = 'savills_properties.json'
+DEFAULT_SNAPSHOT_PATH = 'savills_enriched.parquet'
+DEFAULT_DATASET_PATH = 'savills_properties.arrow'
+
+
+# Column layout of the compiled dataset (one row per listing)
+DATASET_SCHEMA = pa.schema([
+    ('listing_id', pa.int64()),
+    ('external_id', pa.string()),
+    ('title', pa.string()),
+    ('description', pa.string()),
+    ('price', pa.float64()),
+    ('price_text', pa.string()),
+    ('bedrooms', pa.int32()),
+    ('bathrooms', pa.int32()),
+    ('property_type', pa.string()),
+    ('tenure', pa.string()),
+    ('address', pa.string()),
+    ('postcode', pa.string()),
+    ('listing_url', pa.string()),
+    ('image_urls', pa.list_(pa.string())),
+    ('image_url', pa.string()),
+    ('agent_name', pa.string()),
+    ('latitude', pa.float64()),
+    ('longitude', pa.float64()),
+
+    # Enrichment
+    ('epc_rating', pa.string()),
+    ('epc_score', pa.int32()),
+    ('in_conservation_area', pa.bool_()),
+    ('school_quality_score', pa.float64()),
+    ('distance_to_nearest_primary_m', pa.int32()),
+    ('distance_to_nearest_station_m', pa.int32()),
+    ('distance_to_nearest_airport_m', pa.int32()),
+    ('nearest_airport_code', pa.string()),
+    ('imd_decile', pa.int32()),
+    ('crime_rate_percentile', pa.int32()),
+    ('flood_risk', pa.string()),
+    ('max_download_speed_mbps', pa.int32()),
+    ('planning_refusals', pa.int32()),
+    ('avm_estimate', pa.float64()),
+    ('is_undervalued', pa.bool_()),
+])
+
+
+def _property_rng(prop: Dict[str, Any]) -> random.Random:
+    """
+    Random generator seeded from the listing's external ID.
+
+    Gives every property the same mock values on every boot and in every
+    worker, without touching the global `random` state.
+    """
+    key = str(prop.get('external_id') or prop.get('listing_url') or prop.get('title') or '')
+    return random.Random(zlib.crc32(key.encode('utf-8')))
+
+
+def mock_enrichment(prop: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Deterministic mock enrichment for a scraped property.
+
+    Only used when no enriched snapshot has been built.
+    """
+    rng = _property_rng(prop)
+    price = prop.get('price')
+
+    avm_estimate = price * rng.uniform(0.92, 1.08) if price else None
+
+    return {
+        'epc_rating': rng.choice(['A', 'B', 'C', 'D']),
+        'epc_score': rng.randint(60, 95),
+        'in_conservation_area': rng.choice([True, False]),
+        'school_quality_score': round(rng.uniform(0.6, 0.95), 2),
+        'distance_to_nearest_primary_m': rng.randint(200, 2000),
+        'distance_to_nearest_station_m': rng.randint(300, 2500),
+        'distance_to_nearest_airport_m': rng.randint(8000, 40000),
+        'nearest_airport_code': rng.choice(['LHR', 'LGW', 'STN']),
+        'imd_decile': rng.randint(5, 10),
+        'crime_rate_percentile': rng.randint(10, 60),
+        'flood_risk': rng.choice(['very_low', 'low', 'medium']),
+        'max_download_speed_mbps': rng.randint(50, 500),
+        'planning_refusals': rng.randint(0, 2),
+        'avm_estimate': avm_estimate,
+        'is_undervalued': bool(avm_estimate and price and price < avm_estimate * 0.95),
+        'latitude': 51.5 + rng.uniform(-0.5, 0.5),
+        'longitude': -0.1 + rng.uniform(-0.5, 0.5),
+    }
+
+
+def build_rows(properties: List[Dict[str, Any]], agent_name: str = 'Savills') -> List[Dict[str, Any]]:
+    """Turn scraped property dicts into dataset rows"""
+    rows = []
+    for i, prop in enumerate(properties):
+        row = dict(prop)
+        row['listing_id'] = i + 1
+        row['agent_name'] = agent_name
+        row.update(mock_enrichment(prop))
+
+        # Use first image or placeholder
+        image_urls = prop.get('image_urls') or []
+        row['image_urls'] = image_urls
+        row['image_url'] = image_urls[0] if image_urls else 'property-front.jpg'
+
+        rows.append(row)
+    return rows
+
+
+def rows_to_table(rows: List[Dict[str, Any]]) -> pa.Table:
+    """Convert row dicts to a table with the dataset schema"""
+    return pa.Table.from_pylist(
+        [{name: row.get(name) for name in DATASET_SCHEMA.names} for row in rows],
+        schema=DATASET_SCHEMA
+    )
+
+
+def write_dataset(table: pa.Table, output_path: str, source_path: Optional[str] = None) -> str:
+    """
+    Write a dataset table to an Arrow IPC file.
+
+    The file is written uncompressed so readers can map it without copying,
+    and swapped into place atomically so workers booting concurrently never
+    see a partial file.
+    """
+    if source_path:
+        table = table.replace_schema_metadata({'source': os.path.abspath(source_path)})
+
+    tmp_path = f"{output_path}.tmp-{os.getpid()}"
+    with pa.OSFile(tmp_path, 'wb') as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(tmp_path, output_path)
+
+    logger.info(f"Wrote {table.num_rows} properties to {output_path}")
+    return output_path
+
+
+def compile_dataset(
+    source_path: str = DEFAULT_SOURCE_PATH,
+    output_path: str = DEFAULT_DATASET_PATH
+) -> str:
+    """
+    Compile a source file into a memory-mappable dataset file.
+
+    Args:
+        source_path: Enriched Parquet snapshot, or scraped properties JSON
+            (list of dicts, given mock enrichment)
+        output_path: Destination Arrow IPC file
+
+    Returns:
+        Path of the compiled dataset
+    """
+    if source_path.endswith('.parquet'):
+        table = pq.read_table(source_path, schema=DATASET_SCHEMA)
+    else:
+        with open(source_path, 'r', encoding='utf-8') as f:
+            properties = json.load(f)
+        table = rows_to_table(build_rows(properties))
+
+    return write_dataset(table, output_path, source_path)
+
+
+class PropertyDataset:
+    """Read-only, memory-mapped view over a compiled property dataset"""
+
+    def __init__(self, table: pa.Table, path: Optional[str] = None):
+        self.table = table
+        self.path = path
+
+    @classmethod
+    def open(cls, path: str) -> 'PropertyDataset':
+        """Memory-map a compiled dataset file (zero-copy)"""
+        source = pa.memory_map(path, 'r')
+        table = pa.ipc.open_file(source).read_all()
+        return cls(table, path)
+
+    def __len__(self) -> int:
+        return self.table.num_rows
+
+    @property
+    def source_path(self) -> Optional[str]:
+        """Source file the dataset was compiled from"""
+        metadata = self.table.schema.metadata or {}
+        source = metadata.get(b'source')
+        return source.decode('utf-8') if source else None
+
+    def rows(self, mask: Optional[pa.Array] = None) -> List[Dict[str, Any]]:
+        """
+        Materialise rows as dicts.
+
+        Args:
+            mask: Optional boolean array selecting rows
+
+        Returns:
+            Fresh dicts owned by the caller (safe to mutate)
+        """
+        table = self.table.filter(mask) if mask is not None else self.table
+        return table.to_pylist()
+
+    def get(self, listing_id: int) -> Optional[Dict[str, Any]]:
+        """Get a single row by listing_id (1-based row position)"""
+        if listing_id < 1 or listing_id > self.table.num_rows:
+            return None
+        return self.table.slice(listing_id - 1, 1).to_pylist()[0]
+
+
+def load_dataset(
+    source_path: str = DEFAULT_SOURCE_PATH,
+    dataset_path: str = DEFAULT_DATASET_PATH,
+    snapshot_path: Optional[str] = DEFAULT_SNAPSHOT_PATH
+) -> Optional[PropertyDataset]:
+    """
+    Map the compiled dataset, compiling it first if missing or stale.
+
+    The enriched snapshot is preferred over the scraped JSON when it exists.
+
+    Returns:
+        PropertyDataset, or None if neither the dataset nor a source exists
+    """
+    if snapshot_path and os.path.exists(snapshot_path):
+        source_path = snapshot_path
+
+    source_exists = os.path.exists(source_path)
+    dataset_exists = os.path.exists(dataset_path)
+
+    if not dataset_exists and not source_exists:
+        return None
+
+    if source_exists and (
+        not dataset_exists or os.path.getmtime(source_path) > os.path.getmtime(dataset_path)
+    ):
+        compile_dataset(source_path, dataset_path)
+        return PropertyDataset.open(dataset_path)
+
+    dataset = PropertyDataset.open(dataset_path)
+    if source_exists and dataset.source_path != os.path.abspath(source_path):
+        # Compiled from a different source (e.g. JSON before a snapshot was built)
+        compile_dataset(source_path, dataset_path)
+        dataset = PropertyDataset.open(dataset_path)
+
+    return dataset
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Compile the smart API property dataset")
+    parser.add_argument('--source', default=None, help='Enriched snapshot (.parquet) or scraped JSON')
+    parser.add_argument('--output', default=DEFAULT_DATASET_PATH, help='Arrow IPC output file')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    source = args.source
+    if source is None:
+        source = DEFAULT_SNAPSHOT_PATH if os.path.exists(DEFAULT_SNAPSHOT_PATH) else DEFAULT_SOURCE_PATH
+    compile_dataset(source, args.output)
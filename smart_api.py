@@ -1,17 +1,23 @@
 """
 Smart API with Real Savills Data & Intelligent Matching
 
-Loads savills_properties.json and does REAL filtering/scoring based on:
+Loads the enriched Savills snapshot (see enrichment/snapshot.py), falling back
+to savills_properties.json with mock enrichment, and does REAL filtering/scoring based on:
 - Hard filters (budget, beds, baths, location, tenure)
 - Importance-weighted scoring (1-10 scale for each criterion)
 - Returns properties ranked by match score
 """
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-import json
 import os
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 import random
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from search.property_dataset import (
+    PropertyDataset, load_dataset, DEFAULT_SOURCE_PATH, DEFAULT_SNAPSHOT_PATH, DEFAULT_DATASET_PATH
+)
 
 app = FastAPI(title="Smart Property Search API")
 
@@ -23,53 +29,36 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Load Savills properties
-PROPERTIES = []
+# Compiled, memory-mapped property dataset (shared by all workers via the page cache)
+SOURCE_PATH = os.getenv('SMART_SOURCE_PATH', DEFAULT_SOURCE_PATH)
+SNAPSHOT_PATH = os.getenv('SMART_SNAPSHOT_PATH', DEFAULT_SNAPSHOT_PATH)
+DATASET_PATH = os.getenv('SMART_DATASET_PATH', DEFAULT_DATASET_PATH)
+DATASET: Optional[PropertyDataset] = None
 
-def load_properties():
-    global PROPERTIES
-    if os.path.exists('savills_properties.json'):
-        with open('savills_properties.json', 'r', encoding='utf-8') as f:
-            PROPERTIES = json.load(f)
-        print(f"Loaded {len(PROPERTIES)} Savills properties")
-
-        # Add mock enrichment data to each
-        for i, prop in enumerate(PROPERTIES):
-            prop['listing_id'] = i + 1
-            # Mock enrichment (in real version, from S3 feature store)
-            prop['epc_rating'] = random.choice(['A', 'B', 'C', 'D'])
-            prop['epc_score'] = random.randint(60, 95)
-            prop['in_conservation_area'] = random.choice([True, False])
-            prop['school_quality_score'] = round(random.uniform(0.6, 0.95), 2)
-            prop['distance_to_nearest_primary_m'] = random.randint(200, 2000)
-            prop['distance_to_nearest_station_m'] = random.randint(300, 2500)
-            prop['distance_to_nearest_airport_m'] = random.randint(8000, 40000)
-            prop['nearest_airport_code'] = random.choice(['LHR', 'LGW', 'STN'])
-            prop['imd_decile'] = random.randint(5, 10)
-            prop['crime_rate_percentile'] = random.randint(10, 60)
-            prop['flood_risk'] = random.choice(['very_low', 'low', 'medium'])
-            prop['max_download_speed_mbps'] = random.randint(50, 500)
-            prop['planning_refusals'] = random.randint(0, 2)
-            prop['avm_estimate'] = prop['price'] * random.uniform(0.92, 1.08) if prop['price'] else None
-            prop['is_undervalued'] = prop['avm_estimate'] and prop['price'] and prop['price'] < prop['avm_estimate'] * 0.95
-            prop['agent_name'] = 'Savills'
-            prop['latitude'] = 51.5 + random.uniform(-0.5, 0.5)
-            prop['longitude'] = -0.1 + random.uniform(-0.5, 0.5)
-            # Use first image or placeholder
-            prop['image_url'] = prop['image_urls'][0] if prop['image_urls'] else 'property-front.jpg'
+FLOOD_ORDER = {'very_low': 1, 'low': 2, 'medium': 3, 'high': 4}
 
+
+def load_properties():
+    global DATASET
+    DATASET = load_dataset(SOURCE_PATH, DATASET_PATH, SNAPSHOT_PATH)
+    if DATASET is not None:
+        print(f"Loaded {len(DATASET)} Savills properties from {DATASET.path}")
     else:
         print("WARNING: savills_properties.json not found. Run scrape_savills_bulk.py first!")
-        PROPERTIES = []
 
 load_properties()
 
+
+def properties_loaded() -> int:
+    return len(DATASET) if DATASET is not None else 0
+
+
 @app.get("/")
 def root():
     return {
         "service": "Smart Property Search API",
         "status": "running",
-        "properties_loaded": len(PROPERTIES)
+        "properties_loaded": properties_loaded()
     }
 
 @app.post("/api/search")
@@ -88,44 +77,15 @@ def search(request: dict):
     weights = request.get('importance_weights', {})
     criteria = request.get('criteria', {})
 
-    # Filter properties
-    filtered = []
-
-    for prop in PROPERTIES:
-        # Hard filters
-        if prop['price'] and (prop['price'] > budget_max or prop['price'] < budget_min):
-            continue
-
-        if prop['bedrooms'] and prop['bedrooms'] < beds_min:
-            continue
-
-        if prop['bathrooms'] and prop['bathrooms'] < baths_min:
-            continue
-
-        if prop_types and prop['property_type'] and prop['property_type'] not in prop_types:
-            continue
-
-        if tenure_pref == 'freehold' and prop.get('tenure') != 'freehold':
-            continue
-
-        # Criteria filters (hard if importance > 0)
-        if criteria.get('max_station_dist_m') and weights.get('station', 0) > 0.7:
-            if prop['distance_to_nearest_station_m'] > criteria['max_station_dist_m']:
-                continue
-
-        if criteria.get('min_imd_decile') and weights.get('imd', 0) > 0.5:
-            if prop['imd_decile'] < criteria['min_imd_decile']:
-                continue
-
-        if criteria.get('max_flood_risk') and weights.get('flood', 0) > 0.5:
-            flood_order = {'very_low': 1, 'low': 2, 'medium': 3, 'high': 4}
-            max_acceptable = flood_order.get(criteria['max_flood_risk'], 4)
-            prop_flood = flood_order.get(prop['flood_risk'], 4)
-            if prop_flood > max_acceptable:
-                continue
-
-        # Passed all filters
-        filtered.append(prop)
+    # Hard filters, evaluated column-wise over the mapped dataset
+    if DATASET is None:
+        filtered = []
+    else:
+        mask = _hard_filter_mask(
+            DATASET.table, budget_min, budget_max, beds_min, baths_min,
+            prop_types, tenure_pref, weights, criteria
+        )
+        filtered = DATASET.rows(mask)
 
     # Score each property based on importance weights
     for prop in filtered:
@@ -147,6 +107,70 @@ def search(request: dict):
     }
 
 
+def _hard_filter_mask(
+    table: pa.Table,
+    budget_min: float,
+    budget_max: float,
+    beds_min: int,
+    baths_min: int,
+    prop_types: List[str],
+    tenure_pref: str,
+    weights: dict,
+    criteria: dict
+) -> pa.Array:
+    """
+    Build a boolean row mask for the hard filters.
+
+    Missing (null/zero) values pass a filter, as they did when filtering dicts.
+    """
+    def passes(condition, column):
+        missing = pc.or_kleene(pc.is_null(table[column]), pc.equal(table[column], 0))
+        return pc.fill_null(pc.or_kleene(missing, condition), True)
+
+    price = table['price']
+    mask = passes(
+        pc.and_(pc.less_equal(price, budget_max), pc.greater_equal(price, budget_min)),
+        'price'
+    )
+    mask = pc.and_(mask, passes(pc.greater_equal(table['bedrooms'], beds_min), 'bedrooms'))
+    mask = pc.and_(mask, passes(pc.greater_equal(table['bathrooms'], baths_min), 'bathrooms'))
+
+    if prop_types:
+        ptype = table['property_type']
+        type_ok = pc.or_(
+            pc.fill_null(pc.equal(ptype, ''), True),
+            pc.is_in(ptype, value_set=pa.array(prop_types, pa.string()))
+        )
+        mask = pc.and_(mask, type_ok)
+
+    if tenure_pref == 'freehold':
+        mask = pc.and_(mask, pc.fill_null(pc.equal(table['tenure'], 'freehold'), False))
+
+    # Criteria filters (hard if importance > 0)
+    if criteria.get('max_station_dist_m') and weights.get('station', 0) > 0.7:
+        station_ok = pc.less_equal(table['distance_to_nearest_station_m'], criteria['max_station_dist_m'])
+        mask = pc.and_(mask, pc.fill_null(station_ok, True))
+
+    if criteria.get('min_imd_decile') and weights.get('imd', 0) > 0.5:
+        imd_ok = pc.greater_equal(table['imd_decile'], criteria['min_imd_decile'])
+        mask = pc.and_(mask, pc.fill_null(imd_ok, True))
+
+    if criteria.get('max_flood_risk') and weights.get('flood', 0) > 0.5:
+        max_acceptable = FLOOD_ORDER.get(criteria['max_flood_risk'], 4)
+        if max_acceptable < 4:
+            acceptable = [level for level, order in FLOOD_ORDER.items() if order <= max_acceptable]
+            flood_ok = pc.is_in(table['flood_risk'], value_set=pa.array(acceptable, pa.string()))
+            mask = pc.and_(mask, flood_ok)
+
+    return mask
+
+
+def _value(prop: dict, key: str, default):
+    """Property value, or default when missing (snapshot rows may hold nulls)"""
+    value = prop.get(key)
+    return default if value is None else value
+
+
 def calculate_match_score(prop: dict, weights: dict, criteria: dict) -> float:
     """
     Calculate match score (0-1) based on importance weights
@@ -159,9 +183,9 @@ def calculate_match_score(prop: dict, weights: dict, criteria: dict) -> float:
 
     # Schools (closer & better = higher score)
     if weights.get('schools', 0) > 0:
-        school_score = prop.get('school_quality_score', 0.5)
+        school_score = _value(prop, 'school_quality_score', 0.5)
         # Distance bonus
-        dist = prop.get('distance_to_nearest_primary_m', 2000)
+        dist = _value(prop, 'distance_to_nearest_primary_m', 2000)
         if dist < 500:
             school_score = min(1.0, school_score + 0.2)
         elif dist > 2000:
@@ -172,35 +196,35 @@ def calculate_match_score(prop: dict, weights: dict, criteria: dict) -> float:
 
     # Station proximity
     if weights.get('station', 0) > 0:
-        dist = prop.get('distance_to_nearest_station_m', 2000)
+        dist = _value(prop, 'distance_to_nearest_station_m', 2000)
         station_score = max(0, 1.0 - (dist / 2000))  # 0m=1.0, 2000m=0.0
         total_score += station_score * weights['station']
         total_weight += weights['station']
 
     # Airport proximity
     if weights.get('airport', 0) > 0:
-        dist = prop.get('distance_to_nearest_airport_m', 50000)
+        dist = _value(prop, 'distance_to_nearest_airport_m', 50000)
         airport_score = max(0, 1.0 - (dist / 50000))
         total_score += airport_score * weights['airport']
         total_weight += weights['airport']
 
     # Crime (lower percentile = better)
     if weights.get('crime', 0) > 0:
-        crime_pct = prop.get('crime_rate_percentile', 50)
+        crime_pct = _value(prop, 'crime_rate_percentile', 50)
         crime_score = (100 - crime_pct) / 100.0  # Lower crime = higher score
         total_score += crime_score * weights['crime']
         total_weight += weights['crime']
 
     # IMD (higher decile = better)
     if weights.get('imd', 0) > 0:
-        imd = prop.get('imd_decile', 5)
+        imd = _value(prop, 'imd_decile', 5)
         imd_score = imd / 10.0
         total_score += imd_score * weights['imd']
         total_weight += weights['imd']
 
     # Flood risk (very_low = best)
     if weights.get('flood', 0) > 0:
-        flood = prop.get('flood_risk', 'medium')
+        flood = _value(prop, 'flood_risk', 'medium')
         flood_scores = {'very_low': 1.0, 'low': 0.7, 'medium': 0.4, 'high': 0.0}
         flood_score = flood_scores.get(flood, 0.5)
         total_score += flood_score * weights['flood']
@@ -208,13 +232,13 @@ def calculate_match_score(prop: dict, weights: dict, criteria: dict) -> float:
 
     # EPC (A=best)
     if weights.get('epc', 0) > 0:
-        epc_score = prop.get('epc_score', 50) / 100.0
+        epc_score = _value(prop, 'epc_score', 50) / 100.0
         total_score += epc_score * weights['epc']
         total_weight += weights['epc']
 
     # Broadband
     if weights.get('broadband', 0) > 0:
-        speed = prop.get('max_download_speed_mbps', 0)
+        speed = _value(prop, 'max_download_speed_mbps', 0)
         broadband_score = min(1.0, speed / 500.0)  # 500+ Mbps = perfect
         total_score += broadband_score * weights['broadband']
         total_weight += weights['broadband']
@@ -233,7 +257,7 @@ def calculate_match_score(prop: dict, weights: dict, criteria: dict) -> float:
 
     # Planning issues (no refusals = better)
     if weights.get('planning', 0) > 0:
-        refusals = prop.get('planning_refusals', 0)
+        refusals = _value(prop, 'planning_refusals', 0)
         planning_score = 1.0 if refusals == 0 else 0.5
         total_score += planning_score * weights['planning']
         total_weight += weights['planning']
@@ -241,7 +265,7 @@ def calculate_match_score(prop: dict, weights: dict, criteria: dict) -> float:
     # Coast proximity (mock - would calculate from UK coastline data)
     if weights.get('coast', 0) > 0:
         # Mock: properties with certain postcodes are "coastal"
-        is_coastal = prop.get('postcode', '').startswith(('BN', 'TR', 'PL', 'TQ'))
+        is_coastal = (prop.get('postcode') or '').startswith(('BN', 'TR', 'PL', 'TQ'))
         coast_score = 1.0 if is_coastal else 0.3
         total_score += coast_score * weights['coast']
         total_weight += weights['coast']
@@ -258,9 +282,9 @@ def calculate_match_score(prop: dict, weights: dict, criteria: dict) -> float:
 @app.get("/api/listing/{listing_id}")
 def get_listing(listing_id: int):
     """Get single listing detail"""
-    for prop in PROPERTIES:
-        if prop.get('listing_id') == listing_id:
-            return prop
+    prop = DATASET.get(listing_id) if DATASET is not None else None
+    if prop:
+        return prop
 
     return {"error": "Not found"}, 404
 
@@ -270,7 +294,7 @@ if __name__ == "__main__":
     print("="*60)
     print("SMART API SERVER WITH REAL SAVILLS DATA")
     print("="*60)
-    print(f"Loaded: {len(PROPERTIES)} properties")
+    print(f"Loaded: {properties_loaded()} properties")
     print("Running at: http://localhost:8000")
     print("="*60)
     uvicorn.run(app, host="0.0.0.0", port=8000)
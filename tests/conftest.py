@@ -0,0 +1,98 @@
+"""
+Shared fixtures: sample feature parquet files and stores built over them
+"""
+from datetime import date, timedelta
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from ingestion.loaders.s3_feature_loader import S3FeatureStore
+
+# Raw columns of each feature dataset, as published to S3
+FEATURE_SCHEMAS = {
+    "epc": pa.schema([
+        ("uprn", pa.int64()), ("current_energy_rating", pa.string()), ("current_energy_efficiency", pa.int32()),
+        ("potential_energy_rating", pa.string()), ("co2_emissions_current", pa.float64()),
+        ("energy_consumption_current", pa.float64()), ("postcode", pa.string()), ("address1", pa.string()),
+        ("address2", pa.string()), ("address3", pa.string()), ("lodgement_date", pa.date32()),
+    ]),
+    "imd": pa.schema([
+        ("postcode", pa.string()), ("imd_decile", pa.int32()), ("crime_score", pa.float64()),
+        ("crime_percentile", pa.int32()),
+    ]),
+    "flood": pa.schema([("uprn", pa.int64()), ("postcode", pa.string()), ("flood_risk_level", pa.string())]),
+    "broadband": pa.schema([("postcode", pa.string()), ("max_download_speed_mbps", pa.int32())]),
+    "planning": pa.schema([("uprn", pa.int64()), ("decision", pa.string()), ("application_date", pa.date32())]),
+}
+
+
+def _epc(uprn, rating, score, postcode, address, lodged=date(2020, 1, 1)):
+    return {
+        "uprn": uprn, "current_energy_rating": rating, "current_energy_efficiency": score,
+        "potential_energy_rating": "B", "co2_emissions_current": 2.5, "energy_consumption_current": 180.0,
+        "postcode": postcode, "address1": address, "address2": None, "address3": None, "lodgement_date": lodged,
+    }
+
+
+SAMPLE_FEATURES = {
+    "epc": [
+        _epc(1, "C", 70, "SW1A 1AA", "10 Downing Street"),
+        _epc(2, "D", 60, "SW1A 1AA", "Flat 3, 12 Downing Street"),
+        _epc(3, "D", 60, "SW1A 1AA", "Flat 4, 12 Downing Street"),
+        _epc(4, "B", 85, "E1 6AN", "Rose Cottage, Brick Lane"),
+        _epc(5, "B", 85, "E1 6AN", "Rose Cottage, Brick Lane"),
+    ],
+    "imd": [
+        {"postcode": "SW1A 1AA", "imd_decile": 9, "crime_score": 12.0, "crime_percentile": 15},
+        {"postcode": "E1 6AN", "imd_decile": 3, "crime_score": 80.0, "crime_percentile": 85},
+    ],
+    "flood": [{"uprn": 1, "postcode": "SW1A 1AA", "flood_risk_level": "low"}],
+    "broadband": [
+        {"postcode": "SW1A 1AA", "max_download_speed_mbps": 500},
+        {"postcode": "SW1A 1AA", "max_download_speed_mbps": 1000},
+        {"postcode": "N1 9GU", "max_download_speed_mbps": 300},
+    ],
+    "planning": [
+        {"uprn": 1, "decision": "Refused", "application_date": date.today()},
+        {"uprn": 1, "decision": "Approved", "application_date": date.today()},
+        {"uprn": 1, "decision": "Approved", "application_date": date.today() - timedelta(days=365 * 10)},
+    ],
+}
+
+
+def write_feature_files(root, **extra_rows):
+    """Write {root}/{dataset}/part-0.parquet: the sample rows plus any extra rows per dataset"""
+    for dataset, rows in SAMPLE_FEATURES.items():
+        (root / dataset).mkdir(parents=True, exist_ok=True)
+        table = pa.Table.from_pylist(rows + list(extra_rows.get(dataset, [])), schema=FEATURE_SCHEMAS[dataset])
+        pq.write_table(table, root / dataset / "part-0.parquet")
+
+
+@pytest.fixture
+def make_feature_store(tmp_path):
+    """Factory: an in-memory feature store over the sample files (plus extra rows)"""
+    stores = []
+
+    def make(**extra_rows):
+        root = tmp_path / f"features-{len(stores)}"
+        write_feature_files(root, **extra_rows)
+        store = S3FeatureStore(source_dir=str(root))
+        stores.append(store)
+        return store
+
+    yield make
+    for store in stores:
+        store.close()
+
+
+@pytest.fixture
+def feature_store(make_feature_store):
+    """In-memory feature store over the sample feature files"""
+    return make_feature_store()
+
+
+@pytest.fixture
+def feature_files():
+    """write_feature_files(root, **extra_rows), for tests that lay out their own directories"""
+    return write_feature_files
@@ -0,0 +1,106 @@
+"""
+Tests for the comparable-based AVM
+"""
+from datetime import date
+
+import pytest
+
+from enrichment.avm import AVMEngine, SOLD, LISTING, postcode_district, normalise_property_type
+from matching.benchmark import generate_avm_inputs
+from ingestion.loaders.price_paid_loader import parse_price_paid_row
+
+AS_OF = date(2024, 6, 1)
+
+
+def _comparable(property_id, price, lat=51.5000, lon=-0.1000, bedrooms=2,
+                postcode="SW1A 1AA", property_type="flat", source=SOLD, observed=date(2024, 1, 1)):
+    return (property_id, postcode, property_type, lat, lon, price, bedrooms, observed, source)
+
+
+def _subject(property_id=999, lat=51.5000, lon=-0.1000, bedrooms=2, postcode="SW1A 2BB", property_type="flat"):
+    return {"property_id": property_id, "postcode": postcode, "property_type": property_type,
+            "bedrooms": bedrooms, "latitude": lat, "longitude": lon}
+
+
+def test_postcode_district_and_type():
+    assert postcode_district("sw1a 1aa") == "SW1A"
+    assert postcode_district("E16AN") == "E1"
+    assert postcode_district(None) is None
+    assert normalise_property_type("Semi-Detached") == "semi_detached"
+    assert normalise_property_type("Apartment") == "flat"
+
+
+def test_estimate_from_close_comparables():
+    engine = AVMEngine([_comparable(i, 500_000 + 10_000 * (i % 3)) for i in range(1, 11)], as_of=AS_OF)
+
+    valuation = engine.value_batch([_subject()])[0]
+
+    assert 500_000 <= valuation["estimate"] <= 520_000
+    assert valuation["interval_lower"] < valuation["estimate"] < valuation["interval_upper"]
+    assert 0 < valuation["confidence_score"] <= 1
+    assert valuation["comparable_count"] == 10
+
+
+def test_nearer_and_similar_comparables_dominate():
+    engine = AVMEngine([
+        _comparable(1, 400_000, lat=51.5001),
+        _comparable(2, 410_000, lat=51.4999),
+        _comparable(3, 1_500_000, lat=51.5300, bedrooms=5),
+    ], as_of=AS_OF)
+
+    assert engine.value_batch([_subject()])[0]["estimate"] < 450_000
+
+
+def test_property_is_not_its_own_comparable():
+    engine = AVMEngine([
+        _comparable(7, 900_000, source=LISTING),
+        _comparable(1, 500_000, lat=51.502),
+        _comparable(2, 500_000, lat=51.498),
+    ], as_of=AS_OF)
+
+    assert round(engine.value_batch([_subject(property_id=7)])[0]["estimate"]) == 500_000
+
+
+def test_falls_back_to_district_and_reports_missing():
+    engine = AVMEngine([_comparable(i, 600_000, property_type="terraced") for i in range(1, 6)], as_of=AS_OF)
+
+    flat, elsewhere = engine.value_batch([_subject(), _subject(postcode="M1 1AA")])
+
+    assert round(flat["estimate"]) == 600_000
+    assert elsewhere["estimate"] is None
+    assert elsewhere["comparable_count"] == 0
+
+
+def test_dispersed_comparables_lower_confidence():
+    tight = AVMEngine([_comparable(i, 500_000) for i in range(1, 11)], as_of=AS_OF)
+    loose = AVMEngine([_comparable(i, 250_000 if i % 2 else 1_000_000) for i in range(1, 11)], as_of=AS_OF)
+
+    assert tight.value_batch([_subject()])[0]["confidence_score"] > \
+        loose.value_batch([_subject()])[0]["confidence_score"]
+
+
+def test_batch_valuation_matches_one_at_a_time():
+    """Grouped, vectorised valuation gives each subject the same result as valuing it alone"""
+    comparables, subjects = generate_avm_inputs(comparables=2_000, subjects=200, districts=5)
+    engine = AVMEngine(comparables, as_of=AS_OF)
+
+    batch = engine.value_batch(subjects)
+    single = [engine.value_batch([subject])[0] for subject in subjects]
+
+    assert all(v["estimate"] is not None for v in batch)
+    for field in ("estimate", "interval_lower", "interval_upper", "confidence_score"):
+        assert [v[field] for v in batch] == pytest.approx([v[field] for v in single], rel=1e-9)
+    assert [v["comparable_count"] for v in batch] == [v["comparable_count"] for v in single]
+
+
+def test_parse_price_paid_row():
+    row = ["{8B1B8B34-1C2A-4E9E-E053-6C04A8C0A1B2}", "525000", "2023-11-17 00:00", "SW1A 1AA", "F",
+           "N", "L", "12", "FLAT 3", "HIGH STREET", "", "LONDON", "WESTMINSTER", "GREATER LONDON", "A", "A"]
+    sale = parse_price_paid_row(row)
+    assert sale["transaction_id"] == "8B1B8B34-1C2A-4E9E-E053-6C04A8C0A1B2"
+    assert sale["property_type"] == "flat"
+    assert sale["sale_date"] == date(2023, 11, 17)
+    assert sale["address"] == "FLAT 3, 12, HIGH STREET, LONDON"
+
+    assert parse_price_paid_row(row[:4] + ["O"] + row[5:]) is None
+    assert parse_price_paid_row(row[:15] + ["D"]) is None
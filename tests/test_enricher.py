@@ -0,0 +1,307 @@
+"""
+Tests for incremental (dirty-field) re-enrichment
+"""
+import struct
+from decimal import Decimal
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from api.models.database import ListingRaw, ListingEnriched, Property
+from enrichment.avm import AVMEngine
+from enrichment.enricher import ListingEnricher, ALL_GROUPS, PROPERTY_GROUPS, enrich_listing_ids
+from enrichment.spatial_index import ReferenceDataIndex
+
+
+@pytest.fixture
+def enricher(feature_store):
+    # No DB session: dirty-field tracking and property data never reach PostgreSQL here
+    return ListingEnricher(None, feature_store=feature_store, reference_index=ReferenceDataIndex(), avm=AVMEngine([]))
+
+
+def _raw(price="450000.00", property_id=7):
+    return ListingRaw(raw_listing_id=1, matched_property_id=property_id, price_numeric=Decimal(price))
+
+
+def _previous(enricher, raw):
+    return ListingEnriched(
+        raw_listing_id=raw.raw_listing_id,
+        epc_rating="C",
+        in_conservation_area=True,
+        school_quality_score=Decimal("0.75"),
+        avm_estimate=Decimal("500000.00"),
+        avm_value_delta_pct=Decimal("-10.00"),
+        source_fingerprint=enricher._source_fingerprint(raw),
+    )
+
+
+def test_new_listing_recomputes_everything(enricher):
+    assert enricher._dirty_groups(_raw(), None) == set(ALL_GROUPS)
+
+
+def test_unchanged_listing_recomputes_nothing(enricher):
+    raw = _raw()
+    assert enricher._dirty_groups(raw, _previous(enricher, raw)) == set()
+
+
+def test_price_change_only_touches_avm_delta(enricher):
+    previous = _previous(enricher, _raw())
+    raw = _raw(price="400000.00")
+
+    groups = enricher._dirty_groups(raw, previous)
+    assert groups == {"avm_delta"}
+
+    data = enricher._reused_values(previous, groups)
+    assert data["epc_rating"] == "C"
+    assert data["in_conservation_area"] is True
+    assert data["avm_estimate"] == Decimal("500000.00")
+    assert "avm_value_delta_pct" not in data
+
+    avm = enricher._avm_values(raw, None, groups, previous)
+    assert avm == {"avm_value_delta_pct": Decimal("-20.00")}
+
+
+def test_bedrooms_or_type_change_revalues_only(enricher):
+    previous = _previous(enricher, _raw())
+
+    for field, value in (("bedrooms", 4), ("property_type", "Flat")):
+        raw = _raw()
+        setattr(raw, field, value)
+        assert enricher._dirty_groups(raw, previous) == {"avm"}
+
+
+def test_new_feature_snapshot_recomputes_property_groups(enricher):
+    raw = _raw()
+    previous = _previous(enricher, raw)
+    previous.source_fingerprint = {**previous.source_fingerprint, "feature_snapshot_version": "0"}
+
+    assert enricher._dirty_groups(raw, previous) == set(PROPERTY_GROUPS)
+
+
+def test_rematch_recomputes_location_data(enricher):
+    previous = _previous(enricher, _raw())
+    assert enricher._dirty_groups(_raw(property_id=8), previous) == set(ALL_GROUPS)
+
+
+def test_property_data_served_from_cache(monkeypatch, enricher):
+    """Cached properties skip computation; misses are computed once and stored"""
+    import enrichment.enricher as enricher_module
+
+    version = enricher.feature_store.snapshot_version
+    stored = {}
+    monkeypatch.setattr(
+        enricher_module, "get_cached_property_data",
+        lambda db, ids, v: {7: {"epc_rating": "B"}} if v == version else {}
+    )
+    monkeypatch.setattr(
+        enricher_module, "store_property_data",
+        lambda db, data, v: stored.update({(pid, v): row for pid, row in data.items()})
+    )
+    monkeypatch.setattr(enricher_module, "get_conservation_areas", lambda db, ids: {})
+
+    location = struct.pack("<BIIdd", 1, 0x20000001, 4326, -0.1276, 51.5034)
+    props = {
+        pid: Property(property_id=pid, uprn=1, postcode="SW1A 1AA", location=location) for pid in (7, 8)
+    }
+    data = enricher._get_property_data(props)
+
+    assert data[7] == {"epc_rating": "B"}
+    assert (data[8]["epc_rating"], data[8]["imd_decile"], data[8]["in_conservation_area"]) == ("C", 9, False)
+    assert list(stored) == [(8, version)]
+
+
+class _Query:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def join(self, *args):
+        return self
+
+    def filter(self, *args):
+        return self
+
+    def all(self):
+        return self.rows
+
+    fetchall = all
+
+
+class _Session:
+    """Session stand-in: canned query rows by first entity, executed statements recorded"""
+
+    def __init__(self, query_rows=None, returning=()):
+        self.query_rows = query_rows or {}
+        self.returning = list(returning)
+        self.executed = []
+        self.commits = self.rollbacks = 0
+
+    def query(self, entity, *others):
+        return _Query(self.query_rows.get(entity, []))
+
+    def execute(self, stmt):
+        self.executed.append(stmt)
+        return _Query(self.returning)
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        self.rollbacks += 1
+
+
+def _compiled(stmt):
+    return stmt.compile(dialect=postgresql.dialect())
+
+
+def test_enrich_batch_writes_one_multi_row_upsert(monkeypatch, enricher):
+    pairs = [
+        (ListingRaw(raw_listing_id=raw_id, matched_property_id=7, agent_id=3, price_numeric=Decimal("450000.00")),
+         Property(property_id=7, uprn=1, postcode="SW1A 1AA", address_normalised="10 downing street"))
+        for raw_id in (1, 2)
+    ]
+    enricher.db = _Session({ListingRaw: pairs, ListingEnriched: []}, returning=[(1, 101), (2, 102)])
+    monkeypatch.setattr(enricher, "_get_property_data", lambda props: {7: {"epc_rating": "C"}})
+
+    assert enricher.enrich_batch([1, 2, 3]) == {1: 101, 2: 102}
+    assert enricher.db.commits == 1
+
+    [stmt] = enricher.db.executed
+    compiled = _compiled(stmt)
+    sql = str(compiled)
+    assert "ON CONFLICT (raw_listing_id) DO UPDATE" in sql
+    assert "RETURNING listings_enriched.raw_listing_id, listings_enriched.listing_id" in sql
+    assert (compiled.params["raw_listing_id_m0"], compiled.params["raw_listing_id_m1"]) == (1, 2)
+    assert compiled.params["title_m0"] == "Untitled"
+    assert compiled.params["epc_rating_m1"] == "C"
+    assert compiled.params["address_m0"] == "10 downing street"
+
+
+def test_upsert_fills_columns_missing_from_some_rows(enricher):
+    enricher.db = _Session(returning=[(1, 101), (2, 102)])
+
+    result = enricher._upsert_enriched_listings([
+        {"raw_listing_id": 1, "epc_rating": "C"},
+        {"raw_listing_id": 2, "avm_estimate": Decimal("500000.00")},
+    ])
+
+    assert result == {1: 101, 2: 102}
+    params = _compiled(enricher.db.executed[0]).params
+    assert (params["epc_rating_m0"], params["avm_estimate_m0"]) == ("C", None)
+    assert (params["epc_rating_m1"], params["avm_estimate_m1"]) == (None, Decimal("500000.00"))
+
+
+class _FlakyEnricher:
+    """Batch enrichment fails for any batch holding listing 3, which also fails on its own"""
+
+    def __init__(self):
+        self.db = _Session()
+        self.single = []
+
+    def enrich_batch(self, ids):
+        if 3 in ids:
+            raise ValueError("bad row")
+        # Listing 5 is unmatched, so the batch leaves it out
+        return {i: i + 100 for i in ids if i != 5}
+
+    def enrich_listing(self, raw_listing_id):
+        self.single.append(raw_listing_id)
+        return None if raw_listing_id == 3 else raw_listing_id + 100
+
+
+def test_failed_batch_is_retried_one_listing_at_a_time():
+    flaky = _FlakyEnricher()
+
+    result = enrich_listing_ids(flaky, [1, 2, 3, 4, 5], batch_size=2)
+
+    assert result == {"enriched": 3, "failed": [3, 5]}
+    assert flaky.single == [3, 4]
+    assert flaky.db.rollbacks == 1
+
+
+def test_partitions_keep_each_property_on_one_worker():
+    from enrichment.worker_pool import partition_listings
+
+    pending = [(raw_id, raw_id % 5) for raw_id in range(1, 31)]
+    partitions = partition_listings(pending, 3)
+
+    assert all(partitions) and len(partitions) <= 3
+    assert sorted(i for part in partitions for i in part) == list(range(1, 31))
+    for property_id in range(5):
+        listings = {raw_id for raw_id, pid in pending if pid == property_id}
+        assert sum(1 for part in partitions if listings & set(part)) == 1
+
+
+def test_worker_results_and_failures_are_combined(monkeypatch):
+    from concurrent.futures import ThreadPoolExecutor
+    import enrichment.worker_pool as worker_pool
+
+    class _Executor(ThreadPoolExecutor):
+        def __init__(self, max_workers, mp_context=None):
+            super().__init__(max_workers=max_workers)
+
+    def enrich_partition(ids, batch_size):
+        # The worker holding property 0 (listing 3) crashes; elsewhere listings divisible by 4 fail
+        if 3 in ids:
+            raise RuntimeError("worker died")
+        failed = [raw_id for raw_id in ids if raw_id % 4 == 0]
+        return {"enriched": len(ids) - len(failed), "failed": failed, "pid": 1}
+
+    pending = [(raw_id, raw_id % 3) for raw_id in range(1, 13)]
+    monkeypatch.setattr(worker_pool, "ProcessPoolExecutor", _Executor)
+    monkeypatch.setattr(worker_pool, "get_pending_listings", lambda db: pending)
+    monkeypatch.setattr(worker_pool, "_enrich_partition", enrich_partition)
+
+    stats = worker_pool.enrich_with_workers(None, workers=3)
+
+    crashed = {raw_id for raw_id, pid in pending if pid == 0}
+    other_failures = {raw_id for raw_id, pid in pending if pid != 0 and raw_id % 4 == 0}
+    assert stats["failed_partitions"] == 1
+    assert sorted(stats["failed"]) == sorted(crashed | other_failures)
+    assert stats["enriched"] == len(pending) - len(crashed | other_failures)
+    assert (stats["pending"], stats["workers"]) == (12, 3)
+
+
+def test_micro_batcher_flushes_when_full_or_stale():
+    """Batches flush at batch_size or once the oldest ID has waited max_delay, first in first out"""
+    from enrichment.daemon import MicroBatcher
+
+    now = [0.0]
+    batcher = MicroBatcher(batch_size=3, max_delay=1.0, clock=lambda: now[0])
+    assert not batcher.due()
+
+    batcher.add([5, 2, 5])
+    assert not batcher.due()
+    assert batcher.timeout() == 1.0
+
+    now[0] = 0.5
+    batcher.add([9, 1, 2])
+    assert batcher.due()
+    assert batcher.drain() == [5, 2, 9]
+
+    # The leftover arrived at t=0.5, so it is due at t=1.5
+    now[0] = 1.0
+    assert not batcher.due()
+    now[0] = 1.5
+    assert batcher.due()
+    assert batcher.drain() == [1]
+    assert len(batcher) == 0
+
+
+def test_daemon_reloads_singletons_on_interval(monkeypatch):
+    import enrichment.daemon as daemon_module
+
+    resets = []
+    for name in ("reset_reference_index", "reset_avm_engine", "reset_feature_store"):
+        monkeypatch.setattr(daemon_module, name, lambda name=name: resets.append(name))
+
+    now = [0.0]
+    daemon = daemon_module.EnrichmentDaemon(None, None, reload_interval=60.0, clock=lambda: now[0])
+
+    now[0] = 59.0
+    daemon._reload_if_stale()
+    assert resets == []
+
+    now[0] = 60.0
+    daemon._reload_if_stale()
+    daemon._reload_if_stale()
+    assert resets == ["reset_reference_index", "reset_avm_engine", "reset_feature_store"]
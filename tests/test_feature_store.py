@@ -0,0 +1,285 @@
+"""
+Tests for the DuckDB feature store (no S3: stores read local parquet files, see conftest.py)
+"""
+import os
+import sys
+from datetime import date
+import shutil
+import subprocess
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+import duckdb
+import pyarrow as pa
+import pytest
+
+from ingestion.loaders.feature_mirror import FeatureMirror, FEATURE_DATASETS
+from ingestion.loaders import s3_feature_loader
+from ingestion.loaders.s3_feature_loader import S3FeatureStore, build_feature_database, reset_feature_store
+from matching.normaliser import parse_address
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+
+
+def test_postcode_features_one_row_per_postcode(feature_store):
+    rows = feature_store.get_batch_features([
+        {"property_id": 10, "uprn": 1, "postcode": "SW1A 1AA"},
+        {"property_id": 11, "uprn": 2, "postcode": "SW1A 1AA"},
+        {"property_id": 12, "uprn": 97, "postcode": "N1 9GU"},
+        {"property_id": 13, "uprn": 96, "postcode": "ZZ1 1ZZ"},
+    ])
+    by_id = {row["property_id"]: row for row in rows}
+
+    assert sorted(by_id) == [10, 11, 12, 13]
+    assert (by_id[11]["imd_decile"], by_id[11]["crime_rate_percentile"], by_id[11]["max_download_speed_mbps"]) == (
+        9, 15, 1000
+    )
+    assert (by_id[12]["imd_decile"], by_id[12]["max_download_speed_mbps"]) == (None, 300)
+    assert by_id[13]["max_download_speed_mbps"] is None
+    assert feature_store.conn.execute(
+        "SELECT COUNT(*), COUNT(DISTINCT postcode) FROM postcode_features"
+    ).fetchone() == (3, 3)
+
+
+def test_batch_features_merge_postcode_and_uprn_data(feature_store):
+    store = feature_store
+    rows = store.get_batch_features([
+        {"property_id": 10, "uprn": 1, "postcode": "SW1A 1AA"},
+        {"property_id": 11, "uprn": 99, "postcode": "E1 6AN"},
+    ])
+    by_id = {row["property_id"]: row for row in rows}
+
+    assert by_id[10]["epc_rating"] == "C"
+    assert by_id[10]["max_download_speed_mbps"] == 1000
+    assert by_id[10]["recent_planning_apps"] == 2
+    assert by_id[11]["epc_rating"] is None
+    assert by_id[11]["imd_decile"] == 3
+    assert by_id[11]["max_download_speed_mbps"] is None
+
+    single = store.get_property_features(1, "SW1A 1AA")
+    assert single == {k: v for k, v in by_id[10].items() if k not in ("property_id", "uprn")}
+
+
+def _epc_certificate(uprn, rating, lodged):
+    return {
+        "uprn": uprn, "current_energy_rating": rating, "current_energy_efficiency": 50, "potential_energy_rating": "B",
+        "co2_emissions_current": 3.0, "energy_consumption_current": 200.0, "postcode": "SW1A 1AA",
+        "address1": "10 Downing Street", "address2": None, "address3": None, "lodgement_date": lodged,
+    }
+
+
+def test_flood_risk_prefers_uprn_and_returns_one_row_per_property(make_feature_store):
+    store = make_feature_store(
+        flood=[
+            {"uprn": 1, "postcode": "SW1A 1AA", "flood_risk_level": "very low"},
+            {"uprn": 6, "postcode": "SW1A 1AA", "flood_risk_level": "high"},
+            {"uprn": None, "postcode": "E1 6AN", "flood_risk_level": "medium"},
+            {"uprn": None, "postcode": "E1 6AN", "flood_risk_level": "low"},
+        ],
+        # Re-certified property: only the latest certificate is served
+        epc=[_epc_certificate(1, "B", date(2023, 5, 1)), _epc_certificate(1, "E", date(2012, 5, 1))],
+    )
+    properties = [
+        {"property_id": 10, "uprn": 1, "postcode": "SW1A 1AA"},
+        {"property_id": 11, "uprn": 99, "postcode": "E1 6AN"},
+        {"property_id": 12, "uprn": 98, "postcode": "SW1A 1AA"},
+        {"property_id": 13, "uprn": 97, "postcode": "N1 9GU"},
+    ]
+    rows = store.get_batch_features(properties)
+
+    assert sorted(row["property_id"] for row in rows) == [10, 11, 12, 13]
+    flood = {row["property_id"]: row["flood_risk"] for row in rows}
+    # UPRN-level risk wins (worst of its records); others fall back to the postcode's worst
+    assert flood == {10: "low", 11: "medium", 12: "high", 13: None}
+    assert store.get_property_features(98, "SW1A 1AA")["flood_risk"] == "high"
+
+    by_id = {row["property_id"]: row for row in rows}
+    assert by_id[10]["epc_rating"] == "B"
+    assert store.get_property_features(1, "SW1A 1AA") == {
+        k: v for k, v in by_id[10].items() if k not in ("property_id", "uprn")
+    }
+
+
+def test_property_features_bind_postcode_as_a_parameter(make_feature_store):
+    store = make_feature_store(imd=[
+        {"postcode": "O'B 1AA", "imd_decile": 4, "crime_score": 30.0, "crime_percentile": 40},
+    ])
+
+    assert store.get_property_features(99, "O'B 1AA")["imd_decile"] == 4
+    assert store.get_property_features(1, "SW1A 1AA' OR '1'='1")["imd_decile"] is None
+
+
+def test_property_features_cache_recent_lookups(feature_store):
+    store = feature_store
+    store.recent_size = 2
+
+    first = store.get_property_features(1, "SW1A 1AA")
+    first["epc_rating"] = "Z"
+    assert store.get_property_features(1, "SW1A 1AA")["epc_rating"] == "C"
+    assert (store.recent_hits, store.recent_misses) == (1, 1)
+
+    store.get_property_features(2, "SW1A 1AA")
+    store.get_property_features(99, "E1 6AN")
+    assert list(store._recent) == [(2, "SW1A 1AA"), (99, "E1 6AN")]
+
+    # Rebuilding feature tables invalidates cached lookups
+    store.refresh_postcode_features()
+    assert not store._recent
+    store.get_property_features(1, "SW1A 1AA")
+    assert store.recent_misses == 4
+
+
+def test_batch_feature_table_takes_and_returns_arrow(feature_store):
+    store = feature_store
+    table = store.get_batch_feature_table(pa.table({
+        "property_id": [10, 11], "uprn": [1, 99], "postcode": ["SW1A 1AA", "E1 6AN"],
+    }))
+
+    assert isinstance(table, pa.Table)
+    by_id = {row["property_id"]: row for row in table.to_pylist()}
+    assert (by_id[10]["epc_rating"], by_id[10]["imd_decile"]) == ("C", 9)
+    assert (by_id[11]["epc_rating"], by_id[11]["imd_decile"]) == (None, 3)
+    assert "batch_properties" not in {row[0] for row in store.conn.execute("SHOW TABLES").fetchall()}
+
+
+def test_concurrent_lookups_use_pooled_cursors(feature_store):
+    store = feature_store
+    expected = store.get_property_features(1, "SW1A 1AA")
+
+    def lookup(i):
+        if i % 2:
+            return store.get_property_features(1, "SW1A 1AA")
+        rows = store.get_batch_features([{"property_id": i, "uprn": 1, "postcode": "SW1A 1AA"}])
+        return {k: v for k, v in rows[0].items() if k not in ("property_id", "uprn")}
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(lookup, range(64)))
+
+    assert all(result == expected for result in results)
+    stats = store.pool.stats()
+    assert stats["created"] <= store.pool.size and stats["in_use"] == 0
+    # Repeated single lookups are served from the recent-lookup LRU
+    assert stats["acquisitions"] + store.recent_hits == 65
+
+
+def test_reset_closes_the_global_store(monkeypatch, feature_store):
+    monkeypatch.setattr(s3_feature_loader, "_feature_store", feature_store)
+
+    reset_feature_store()
+
+    assert s3_feature_loader._feature_store is None
+    with pytest.raises(duckdb.ConnectionException):
+        feature_store.conn.execute("SELECT 1")
+    reset_feature_store()  # nothing left to close
+
+
+def test_resolve_uprns_via_epc_register(feature_store):
+    resolved = feature_store.resolve_uprns([
+        ("SW1A1AA", parse_address("10 Downing Street, London").normalised),
+        ("SW1A1AA", parse_address("Flat 3, 12 Downing St").normalised),
+        ("SW1A1AA", parse_address("12 Downing Street").normalised),
+        ("E16AN", parse_address("Rose Cottage, Brick Lane").normalised),
+        ("N19GU", parse_address("10 Downing Street").normalised),
+    ])
+
+    assert resolved[0] == (1, 1.0)
+    assert resolved[1][0] == 2
+    # Whole building vs flats, and two UPRNs for one address, stay unresolved
+    assert resolved[2] is None
+    assert resolved[3] is None
+    assert resolved[4] is None
+
+
+class _FakeS3:
+    """list_objects_v2 / download_file over a local directory standing in for the bucket"""
+
+    def __init__(self, root):
+        self.root = root
+        self.downloads = []
+
+    def get_paginator(self, _name):
+        return self
+
+    def paginate(self, Bucket, Prefix):
+        contents = []
+        for path in sorted((self.root / Prefix).glob("*")):
+            data = path.read_bytes()
+            contents.append({"Key": f"{Prefix}{path.name}", "ETag": f'"{hash(data)}"', "Size": len(data)})
+        yield {"Contents": contents}
+
+    def download_file(self, Bucket, Key, Filename):
+        self.downloads.append(Key)
+        shutil.copy(self.root / Key, Filename)
+
+
+def test_mirror_syncs_changes_and_store_reads_locally(tmp_path, feature_files):
+    remote, cache = tmp_path / "bucket", tmp_path / "cache"
+    feature_files(remote)
+    s3 = _FakeS3(remote)
+
+    mirror = FeatureMirror("bucket", str(cache), s3_client=s3)
+    assert mirror.sync() == {"downloaded": 5, "unchanged": 0, "removed": 0}
+    assert FeatureMirror("bucket", str(cache), s3_client=s3).sync() == {"downloaded": 0, "unchanged": 5, "removed": 0}
+
+    (remote / "planning" / "part-0.parquet").unlink()
+    assert mirror.sync(["planning"]) == {"downloaded": 0, "unchanged": 0, "removed": 1}
+    assert mirror.local_glob("planning") is None
+    assert mirror.local_glob("epc") == str(cache / "epc" / "*.parquet")
+
+    feature_files(remote)
+    mirror.sync(["planning"])
+    store = S3FeatureStore(cache_dir=str(cache))
+    assert not store._httpfs_loaded
+    features = store.get_property_features(1, "SW1A 1AA")
+    assert features["epc_rating"] == "C" and features["planning_refusals"] == 1
+    assert features["max_download_speed_mbps"] == 1000
+
+
+def _read_in_subprocess(db_path, cache):
+    """Open the feature database from another process (as an API or enrichment worker would)"""
+    script = (
+        "import sys; from ingestion.loaders.s3_feature_loader import S3FeatureStore; "
+        "store = S3FeatureStore(db_path=sys.argv[1], cache_dir=sys.argv[2]); "
+        "print(store.get_property_features(1, 'SW1A 1AA')['imd_decile'])"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", script, db_path, cache],
+        cwd=REPO_ROOT, capture_output=True, text=True
+    )
+    assert result.returncode == 0, result.stderr
+    return result.stdout.strip()
+
+
+def test_feature_database_built_once_and_shared_read_only(tmp_path, feature_files):
+    remote, cache = tmp_path / "bucket", tmp_path / "cache"
+    feature_files(remote)
+    mirror = FeatureMirror("bucket", str(cache), s3_client=_FakeS3(remote))
+    mirror.sync()
+    db_path = str(tmp_path / "features.duckdb")
+
+    assert build_feature_database(db_path, cache_dir=str(cache)) == list(FEATURE_DATASETS)
+    assert build_feature_database(db_path, cache_dir=str(cache)) == []
+
+    # Any number of processes can serve from the file at once
+    first = S3FeatureStore(db_path=db_path, cache_dir=str(cache))
+    second = S3FeatureStore(db_path=db_path, cache_dir=str(cache))
+    assert first.read_only and second.read_only
+    indexes = {row[0] for row in first.conn.execute("SELECT index_name FROM duckdb_indexes()").fetchall()}
+    assert {"idx_epc_data_uprn", "idx_flood_data_postcode", "idx_planning_data_uprn"} <= indexes
+    assert first.get_property_features(1, "SW1A 1AA")["planning_refusals"] == 1
+    assert second.get_batch_features([{"property_id": 1, "uprn": 1, "postcode": "SW1A 1AA"}])[0]["imd_decile"] == 9
+    assert _read_in_subprocess(db_path, str(cache)) == "9"
+
+    # A rebuild while readers are open only redoes the changed dataset
+    conn = duckdb.connect()
+    conn.execute(f"COPY (SELECT 'SW1A 1AA' AS postcode, 2 AS imd_decile, 50.0 AS crime_score, "
+                 f"60 AS crime_percentile) TO '{remote / 'imd' / 'part-0.parquet'}' (FORMAT PARQUET)")
+    mirror.sync(["imd"])
+    assert build_feature_database(db_path, cache_dir=str(cache)) == ["imd"]
+    assert not os.path.exists(f"{db_path}.build-{os.getpid()}")
+
+    # Open stores keep reading the file they opened; new ones see the rebuild
+    assert first.get_batch_features([{"property_id": 1, "uprn": 1, "postcode": "SW1A 1AA"}])[0]["imd_decile"] == 9
+    assert _read_in_subprocess(db_path, str(cache)) == "2"
+    first.close()
+    second.close()
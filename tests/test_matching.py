@@ -0,0 +1,327 @@
+"""
+Tests for address matching (in-memory parts; no database)
+"""
+from decimal import Decimal
+
+from sqlalchemy.dialects import postgresql
+
+from matching.trigram import trigrams, similarity
+from matching.normaliser import parse_address, normalise_address
+from matching.candidate_cache import PostcodeCandidateCache, PropertyCandidate, normalise_postcode
+from matching.matchers import address_matcher
+from matching.matchers.address_matcher import AddressMatcher, match_listing_to_property
+from matching.matchers.batch_matcher import BatchAddressMatcher
+from matching.match_cache import MatchCache, match_cache_key
+from matching.matchers.geo_matcher import GeoCandidate, rank_geo_candidates
+from matching.benchmark import BenchmarkCase, generate_universe, generate_cases, score_results
+
+
+def test_trigrams_follow_pg_trgm():
+    """show_trgm('word') and similarity('word', 'two words') as computed by pg_trgm"""
+    assert trigrams("word") == {"  w", " wo", "wor", "ord", "rd "}
+    assert trigrams("Flat 3, 12-14 High St.") == trigrams("flat 3 12 14 high st")
+    assert round(similarity(trigrams("word"), trigrams("two words")), 6) == 0.363636
+    assert similarity(trigrams(""), trigrams("word")) == 0.0
+
+
+def _cache(candidates, **kwargs):
+    """Candidate cache whose loads come from a dict and are recorded"""
+    cache = PostcodeCandidateCache(**kwargs)
+    cache.loads = []
+
+    def load(db, postcodes):
+        cache.loads.append(sorted(postcodes))
+        return {
+            pc: [PropertyCandidate(*c) for c in cands]
+            for pc, cands in candidates.items() if pc in postcodes
+        }
+
+    cache._load = load
+    return cache
+
+
+class _MemoryMatchCache(MatchCache):
+    """Match cache backed by a dict instead of address_match_cache"""
+
+    def __init__(self):
+        super().__init__(db=None)
+        self.rows = {}
+
+    def lookup(self, keys):
+        return {key: self.rows[key][1] for key in keys if key in self.rows}
+
+    def store(self, results):
+        self.rows.update(results)
+        return len(results)
+
+
+def _matcher(candidates):
+    matcher = BatchAddressMatcher(db=None)
+    matcher.candidates = _cache(candidates)
+    matcher.match_cache = _MemoryMatchCache()
+    return matcher
+
+
+def test_batch_matching_by_number_then_fuzzy():
+    matcher = _matcher({
+        "SW1A1AA": [(1, "10", "10 downing london"), (2, "12", "12 downing london")],
+        "E16AN": [(3, None, "the old bakery brick london")],
+    })
+
+    matches = matcher.match_addresses([
+        ("a", "12 Downing Street, London", "sw1a 1aa"),
+        ("b", "The Old Bakery, Brick Lane, London", "E1 6AN"),
+        ("c", "Rose Cottage, Brick Lane", "E1 6AN"),
+        ("d", "12 Downing Street", None),
+        ("e", "1 Nowhere Road", "ZZ1 1ZZ"),
+    ])
+
+    assert matches["a"] == (2, Decimal("0.95"), "postcode_number")
+    assert matches["b"][0] == 3 and matches["b"][2] == "address_fuzzy"
+    assert matches["b"][1] >= Decimal("0.7")
+    assert set(matches) == {"a", "b"}
+
+
+def test_flat_matches_only_its_own_flat():
+    """A flat's building number is shared by the whole building, so the flat must match too"""
+    matcher = _matcher({
+        "SW1A1AA": [(1, "12", "flat 3 12 downing london"), (2, "12", "flat 4 12 downing london")],
+    })
+
+    matches = matcher.match_addresses([
+        ("a", "Flat 4, 12 Downing Street, London", "SW1A 1AA"),
+        ("b", "Flat 3, 12 Downing Street, London", "SW1A 1AA"),
+        ("c", "Flat 9, 12 Downing Street, London", "SW1A 1AA"),
+    ])
+
+    assert matches["a"][0] == 2 and matches["b"][0] == 1
+    assert all(match[2] == "postcode_number" for match in (matches["a"], matches["b"]))
+    assert matches.get("c", (None, None, None))[2] != "postcode_number"
+
+
+class _UpdateSession:
+    def __init__(self):
+        self.executed = []
+        self.commits = 0
+
+    def execute(self, stmt):
+        self.executed.append(stmt)
+        return type("Result", (), {"rowcount": 2})()
+
+    def commit(self):
+        self.commits += 1
+
+
+def test_listing_matches_written_with_one_update_from_values():
+    matcher = BatchAddressMatcher(db=_UpdateSession())
+
+    assert matcher.write_listing_matches({
+        5: (1, Decimal("0.95"), "postcode_number"),
+        6: (2, Decimal("0.80"), "fuzzy_address"),
+    }) == 2
+
+    [stmt] = matcher.db.executed
+    sql = str(stmt.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+    assert sql.startswith("UPDATE listings_raw SET matched_property_id=matched.property_id")
+    assert (
+        "FROM (VALUES (5, 1, 0.95, 'postcode_number'), (6, 2, 0.80, 'fuzzy_address')) "
+        "AS matched (raw_listing_id, property_id, confidence, method) "
+        "WHERE listings_raw.raw_listing_id = matched.raw_listing_id"
+    ) in sql
+    assert matcher.db.commits == 1
+
+    # No matches: nothing to update, but the batch's match cache rows still commit
+    matcher = BatchAddressMatcher(db=_UpdateSession())
+    assert matcher.write_listing_matches({}) == 0
+    assert (matcher.db.executed, matcher.db.commits) == ([], 1)
+
+
+def test_normalise_postcode():
+    assert normalise_postcode(" sw1a 1aa") == "SW1A1AA"
+    assert normalise_postcode("") is None
+
+
+def test_candidate_cache_is_lru_by_postcode():
+    now = [0.0]
+    cache = _cache(
+        {"A1": [(1, "1", "1 a")], "B1": [(2, "2", "2 b")], "C1": [(3, "3", "3 c")]},
+        max_postcodes=2, max_age_s=60, clock=lambda: now[0], empty_max_age_s=5
+    )
+
+    assert [c.property_id for c in cache.get(None, "A1")] == [1]
+    cache.get_many(None, ["A1", "B1"])
+    assert cache.loads == [["A1"], ["B1"]]
+
+    # C1 evicts the least recently used postcode (A1)
+    cache.get(None, "B1")
+    cache.get(None, "C1")
+    cache.get(None, "A1")
+    assert cache.loads[-2:] == [["C1"], ["A1"]]
+    assert len(cache) == 2
+
+    # Expired shards are reloaded; unknown postcodes are only trusted briefly
+    now[0] = 61
+    assert cache.get(None, "ZZ1") == []
+    cache.get(None, "A1")
+    assert cache.loads[-2:] == [["ZZ1"], ["A1"]]
+    now[0] = 65
+    cache.get(None, "ZZ1")
+    assert cache.loads[-1] == ["A1"]
+    now[0] = 66
+    cache.get(None, "ZZ1")
+    assert cache.loads[-1] == ["ZZ1"]
+
+    # Postcodes that gained properties are dropped at once
+    cache.invalidate_many(["A1"])
+    cache.get_many(None, ["A1", "ZZ1"])
+    assert cache.loads[-1] == ["A1"]
+
+
+def test_single_matcher_fuzzy_uses_candidate_cache(monkeypatch):
+    cache = _cache({"E16AN": [(3, None, "the old bakery brick london")]})
+    monkeypatch.setattr("matching.matchers.address_matcher.get_candidate_cache", lambda: cache)
+    matcher = AddressMatcher(db=None)
+
+    result = matcher._match_by_fuzzy_address("The Old Bakery, Brick Lane, London", "e1 6an")
+    assert result[0] == 3 and result[2] == "address_fuzzy"
+    assert matcher._match_by_fuzzy_address("Rose Cottage, Brick Lane", "E1 6AN") is None
+    assert cache.loads == [["E16AN"]]
+
+
+def test_parse_address_components():
+    parsed = parse_address("Flat 3, 12-14 High Street, Camden")
+    assert parsed.sub_building == "flat 3"
+    assert parsed.building_number == "12-14"
+    assert parsed.street == "high street" and parsed.locality == "camden"
+    assert parsed.normalised == "flat 3 12 14 high camden"
+
+    assert parse_address("Flat 3 12 High St").building_number == "12"
+    assert parse_address("12 - 14 High St").building_number == "12-14"
+    assert parse_address("42a Mill Lane").building_number == "42a"
+
+    named = parse_address("Rose Cottage, Brick Lane, London")
+    assert (named.building_name, named.building_number, named.street) == ("rose cottage", None, "brick lane")
+    assert parse_address("Brick Lane, London").building_name is None
+
+
+def test_normalise_address_drops_suffixes_and_punctuation():
+    assert normalise_address("12, Downing Street. London") == "12 downing london"
+    assert normalise_address("The Old-Bakery, Brick Lane") == "the old bakery brick"
+
+
+def test_batch_matcher_reuses_cached_hits_and_misses():
+    matcher = _matcher({"SW1A1AA": [(1, "10", "10 downing london")]})
+    addresses = [
+        ("a", "10 Downing Street", "SW1A 1AA"),
+        ("b", "Rose Cottage", "SW1A 1AA"),
+    ]
+
+    assert set(matcher.match_addresses(addresses)) == {"a"}
+    assert matcher.match_cache.rows[match_cache_key("Rose Cottage", "sw1a1aa")] == ("SW1A1AA", None)
+
+    # Second run: both addresses come from the cache, no candidate lookups
+    matcher.candidates.invalidate()
+    assert set(matcher.match_addresses(addresses)) == {"a"}
+    assert matcher.candidates.loads == [["SW1A1AA"]]
+
+
+class _Session:
+    """Session stand-in: match cache rows become visible to other sessions on commit"""
+
+    def __init__(self, committed):
+        self.committed = committed
+        self.pending = {}
+
+    def commit(self):
+        self.committed.update(self.pending)
+        self.pending.clear()
+
+
+class _SessionMatchCache(MatchCache):
+    def lookup(self, keys):
+        rows = {**self.db.committed, **self.db.pending}
+        return {key: rows[key][1] for key in keys if key in rows}
+
+    def store(self, results):
+        self.db.pending.update(results)
+        return len(results)
+
+
+def test_single_match_cached_across_sessions(monkeypatch):
+    calls = []
+    monkeypatch.setattr(address_matcher, "MatchCache", _SessionMatchCache)
+    monkeypatch.setattr(
+        AddressMatcher, "_match_by_postcode_and_number",
+        lambda self, raw_address, postcode: calls.append(raw_address) or (1, Decimal("0.95"), "postcode_number")
+    )
+    committed = {}
+
+    expected = (1, Decimal("0.95"), "postcode_number")
+    assert match_listing_to_property(_Session(committed), "10 Downing Street", "SW1A 1AA") == expected
+    assert AddressMatcher(_Session(committed)).match("10 downing street", "sw1a1aa") == expected
+    assert calls == ["10 Downing Street"]
+
+
+def test_blank_postcode_is_never_cached(monkeypatch):
+    monkeypatch.setattr(address_matcher, "MatchCache", _SessionMatchCache)
+    session = _Session({})
+
+    # A whitespace-only postcode takes the no-postcode path, which isn't cached
+    assert AddressMatcher(session).match("10 Downing Street", "   ") is None
+    assert session.pending == {}
+    # and the cache itself drops rows it has no postcode for (address_match_cache.postcode is NOT NULL)
+    assert MatchCache(db=None).store({match_cache_key("10 Downing Street", " "): (" ", None)}) == 0
+
+
+def test_match_cache_key_ignores_case_and_spacing():
+    assert match_cache_key("10  Downing Street", "sw1a 1aa") == match_cache_key("10 downing street", "SW1A1AA")
+    assert match_cache_key("10 Downing Street", "SW1A1AA") != match_cache_key("12 Downing Street", "SW1A1AA")
+
+
+def test_geo_ranking_prefers_number_then_name():
+    candidates = [
+        GeoCandidate(1, "10", None, "Park Road", 40.0),
+        GeoCandidate(2, "12", None, "Park Road", 60.0),
+        GeoCandidate(3, None, "The Quadrangle", "Park Road", 90.0),
+        GeoCandidate(4, "12", None, "Park Lane", 5.0),
+    ]
+
+    assert rank_geo_candidates("12 Park Road, Marylebone", candidates) == (2, Decimal("0.90"), "geo_fuzzy")
+    assert rank_geo_candidates("The Quadrangle, Park Road, Marylebone", candidates)[:2] == (3, Decimal("0.85"))
+
+    # A different number is a different property; a street alone or another street never matches
+    assert rank_geo_candidates("Park Road, Marylebone", candidates) is None
+    assert rank_geo_candidates("14 Park Road", candidates) is None
+    assert rank_geo_candidates("Baker Street, Marylebone", candidates) is None
+
+
+def test_benchmark_cases_and_scoring():
+    properties = generate_universe(postcodes=20, per_postcode=10, seed=1)
+    cases = generate_cases(properties, cases=200, seed=1)
+    assert cases == generate_cases(properties, cases=200, seed=1)
+    assert all(c.expected_uprn is None for c in cases if c.kind in ("missing_number", "decoy"))
+    assert all(c.postcode is None for c in cases if c.kind == "no_postcode")
+
+    # Flat cases expect that flat's own property, which shares its building number with its neighbours
+    by_uprn = {p["uprn"]: p for p in properties}
+    flats = [c for c in cases if c.kind == "flat"]
+    assert flats
+    for case in flats:
+        flat = by_uprn[case.expected_uprn]
+        siblings = [p for p in properties if p["postcode"] == flat["postcode"]
+                    and p["building_number"] == flat["building_number"]]
+        assert flat["property_type"] == "flat" and len(siblings) > 1
+        assert parse_address(case.raw_address).sub_building in flat["address_normalised"]
+
+    uprns = {10: 100, 11: 101}
+    bench = [
+        BenchmarkCase("exact", "1 a", "ZZ1 0AA", 0, 0, 100),
+        BenchmarkCase("exact", "3 a", "ZZ1 0AA", 0, 0, 101),
+        BenchmarkCase("decoy", "9 a", "ZZ1 0AA", 0, 0, None),
+    ]
+    results = [(10, Decimal("0.95"), "postcode_number"), None, (11, Decimal("0.8"), "address_fuzzy")]
+
+    report = score_results(bench, results, uprns)
+    assert report["precision"] == 0.5 and report["recall"] == 0.5
+    assert report["by_method"]["address_fuzzy"]["precision"] == 0.0
+    assert report["by_kind"]["exact"]["rate"] == 0.5
@@ -0,0 +1,99 @@
+"""
+Tests for the compiled smart API property dataset
+"""
+import json
+import pytest
+import pyarrow.parquet as pq
+
+from search.property_dataset import (
+    compile_dataset, load_dataset, PropertyDataset, mock_enrichment, build_rows, rows_to_table
+)
+
+
+SAMPLE_PROPERTIES = [
+    {
+        "external_id": "abc123",
+        "title": "4 bedroom house",
+        "price": 1595000.0,
+        "price_text": "£1,595,000",
+        "bedrooms": 4,
+        "bathrooms": 3,
+        "property_type": None,
+        "address": "Elton Road",
+        "postcode": None,
+        "description": "A family home",
+        "tenure": None,
+        "image_urls": ["https://example.com/1.jpg"],
+        "listing_url": "https://example.com/abc123"
+    },
+    {
+        "external_id": "def456",
+        "title": "2 bedroom flat",
+        "price": 450000.0,
+        "price_text": "£450,000",
+        "bedrooms": 2,
+        "bathrooms": 1,
+        "property_type": "flat",
+        "address": "Meredyth Road",
+        "postcode": "SW13 0DS",
+        "description": None,
+        "tenure": "leasehold",
+        "image_urls": [],
+        "listing_url": "https://example.com/def456"
+    },
+]
+
+
+@pytest.fixture
+def source_path(tmp_path):
+    path = tmp_path / "properties.json"
+    path.write_text(json.dumps(SAMPLE_PROPERTIES), encoding="utf-8")
+    return str(path)
+
+
+def test_compile_and_map_dataset(source_path, tmp_path):
+    """Compiled dataset maps back to the same rows"""
+    dataset_path = str(tmp_path / "properties.arrow")
+    compile_dataset(source_path, dataset_path)
+
+    dataset = PropertyDataset.open(dataset_path)
+    assert len(dataset) == 2
+
+    first = dataset.get(1)
+    assert first["external_id"] == "abc123"
+    assert first["image_url"] == "https://example.com/1.jpg"
+    assert dataset.get(2)["image_url"] == "property-front.jpg"
+    assert dataset.get(3) is None
+
+
+def test_enrichment_is_deterministic(source_path, tmp_path):
+    """Every worker (and every boot) sees the same enrichment values"""
+    a = load_dataset(source_path, str(tmp_path / "a.arrow"), snapshot_path=None)
+    b = load_dataset(source_path, str(tmp_path / "b.arrow"), snapshot_path=None)
+    assert a.rows() == b.rows()
+    assert mock_enrichment(SAMPLE_PROPERTIES[0]) == mock_enrichment(SAMPLE_PROPERTIES[0])
+
+
+def test_snapshot_preferred_over_json(source_path, tmp_path):
+    """An enriched snapshot replaces the mock-enriched JSON"""
+    rows = build_rows(SAMPLE_PROPERTIES)
+    rows[0]["epc_rating"] = "G"
+    rows[1]["imd_decile"] = None
+    snapshot_path = str(tmp_path / "enriched.parquet")
+    pq.write_table(rows_to_table(rows), snapshot_path)
+
+    dataset_path = str(tmp_path / "c.arrow")
+    load_dataset(source_path, dataset_path, snapshot_path=None)
+
+    dataset = load_dataset(source_path, dataset_path, snapshot_path)
+    assert dataset.get(1)["epc_rating"] == "G"
+    assert dataset.get(2)["imd_decile"] is None
+
+
+def test_load_dataset_missing_source(tmp_path):
+    """No dataset and no source yields None"""
+    assert load_dataset(
+        str(tmp_path / "missing.json"),
+        str(tmp_path / "missing.arrow"),
+        str(tmp_path / "missing.parquet")
+    ) is None
@@ -0,0 +1,91 @@
+"""
+Tests for the in-process reference POI index
+"""
+import random
+import struct
+
+from enrichment.avm import AVMEngine
+from enrichment.enricher import ListingEnricher
+from enrichment.spatial_index import (
+    GridIndex, PointOfInterest, ReferenceDataIndex, haversine_m, point_coordinates, AIRPORT, STATION
+)
+from ingestion.loaders.naptan_loader import parse_naptan_row
+
+
+def _brute_force(points, lat, lon, k):
+    return sorted(
+        (haversine_m(lat, lon, p.latitude, p.longitude), p["id"]) for p in points
+    )[:k]
+
+
+def test_haversine_known_distance():
+    """London to Paris is roughly 344 km"""
+    assert abs(haversine_m(51.5074, -0.1278, 48.8566, 2.3522) - 343_500) < 1_500
+
+
+def test_nearest_matches_brute_force():
+    """Grid search returns exactly the brute-force nearest points"""
+    rng = random.Random(42)
+    points = [
+        PointOfInterest(rng.uniform(49.9, 58.7), rng.uniform(-6.0, 1.8), {"id": i})
+        for i in range(2000)
+    ]
+    index = GridIndex(points)
+
+    for _ in range(200):
+        lat, lon = rng.uniform(49.0, 60.0), rng.uniform(-8.0, 3.0)
+        result = index.nearest(lat, lon, k=3)
+        assert [p["id"] for _, p in result] == [i for _, i in _brute_force(points, lat, lon, 3)]
+
+
+def test_sparse_and_empty_indexes():
+    """Single-point and empty indexes behave"""
+    single = GridIndex([PointOfInterest(51.47, -0.45, {"id": "LHR"})])
+    distance, point = single.nearest(55.95, -3.19)[0]
+    assert point["id"] == "LHR"
+    assert distance > 500_000
+
+    assert GridIndex([]).nearest(51.5, -0.1) == []
+
+    index = ReferenceDataIndex({AIRPORT: single})
+    assert index.nearest_one("station", 51.5, -0.1) == (None, None)
+
+
+def test_point_coordinates_from_ewkb():
+    """Coordinates are read from EWKB (as returned by PostGIS)"""
+    ewkb = struct.pack("<BIIdd", 1, 0x20000001, 4326, -0.1278, 51.5074)
+    assert point_coordinates(ewkb.hex()) == (51.5074, -0.1278)
+
+    wkb = struct.pack(">BIdd", 0, 1, -0.1, 51.0)
+    assert point_coordinates(wkb) == (51.0, -0.1)
+
+
+def test_transport_metrics_include_nearest_station(feature_store):
+    """Nearest station distance comes from the reference index"""
+    reference_index = ReferenceDataIndex({
+        STATION: GridIndex([
+            PointOfInterest(51.5308, -0.1238, {"atco_code": "9100KNGX", "name": "London Kings Cross"}),
+            PointOfInterest(51.5033, -0.1145, {"atco_code": "9100WATRLMN", "name": "London Waterloo"}),
+        ])
+    })
+    enricher = ListingEnricher(None, feature_store=feature_store, reference_index=reference_index, avm=AVMEngine([]))
+    prop = type("Prop", (), {"location": struct.pack("<BIIdd", 1, 0x20000001, 4326, -0.1200, 51.5300)})()
+
+    metrics = enricher._calculate_transport_metrics(prop)
+
+    assert 200 < metrics["distance_to_nearest_station_m"] < 400
+    assert metrics["distance_to_nearest_airport_m"] is None
+
+
+def test_parse_naptan_row():
+    """Only active rail/metro access areas with coordinates become stations"""
+    row = {"ATCOCode": "9100KNGX", "CommonName": "London Kings Cross Rail Station", "StopType": "RLY",
+           "Latitude": "51.5308", "Longitude": "-0.1238", "Status": "active"}
+
+    station = parse_naptan_row(row)
+    assert station["station_type"] == "rail"
+    assert station["location"] == "SRID=4326;POINT(-0.1238 51.5308)"
+
+    assert parse_naptan_row({**row, "StopType": "BCT"}) is None
+    assert parse_naptan_row({**row, "Status": "inactive"}) is None
+    assert parse_naptan_row({**row, "Latitude": ""}) is None